@@ -0,0 +1,89 @@
+"""
+Concurrent load test for the JSON API endpoints.
+
+Run it against the same app served both ways and compare the numbers:
+
+    gunicorn carehome_project.wsgi:application --workers 3 --bind 127.0.0.1:8000
+    gunicorn --config gunicorn.conf.py --bind 127.0.0.1:8000
+
+    python benchmarks/api_concurrency.py --base-url http://127.0.0.1:8000 \
+        --username manager --password secret --carehome 1 --clients 50 --requests 20
+"""
+import argparse
+import re
+import statistics
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+ENDPOINTS = [
+    "/api/carehomes/",
+    "/api/staff/?carehome={carehome}",
+    "/api/service-users/?carehome={carehome}",
+    "/api/rota-events/?carehome={carehome}",
+]
+
+
+def login(base_url, username, password):
+    """Log in through the normal form and return a cookie-aware opener"""
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    page = opener.open(base_url + "/").read().decode()
+    token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+    data = urllib.parse.urlencode({
+        "csrfmiddlewaretoken": token,
+        "username": username,
+        "password": password,
+    }).encode()
+    request = urllib.request.Request(base_url + "/", data=data, headers={"Referer": base_url + "/"})
+    opener.open(request).read()
+    return opener
+
+
+def run_client(opener, urls, count):
+    timings = []
+    errors = 0
+    for i in range(count):
+        url = urls[i % len(urls)]
+        start = time.perf_counter()
+        try:
+            with opener.open(url, timeout=30) as response:
+                response.read()
+        except Exception:
+            errors += 1
+        timings.append(time.perf_counter() - start)
+    return timings, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--carehome", default="1")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    opener = login(base_url, args.username, args.password)
+    urls = [base_url + path.format(carehome=args.carehome) for path in ENDPOINTS]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results = list(pool.map(lambda _: run_client(opener, urls, args.requests), range(args.clients)))
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(t for client_timings, _ in results for t in client_timings)
+    errors = sum(client_errors for _, client_errors in results)
+    quantiles = statistics.quantiles(timings, n=100)
+
+    print(f"clients={args.clients} requests={len(timings)} errors={errors}")
+    print(f"throughput: {len(timings) / elapsed:.1f} req/s over {elapsed:.2f}s")
+    print(f"latency ms: p50={quantiles[49] * 1000:.1f} p95={quantiles[94] * 1000:.1f} p99={quantiles[98] * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Import-time profile of a cold worker boot: django.setup() plus loading the URLconf
+(which imports every view module).
+
+    python benchmarks/import_time.py            # top 25 imports by cumulative time
+    python benchmarks/import_time.py --top 50
+
+Uses ``python -X importtime`` in a fresh interpreter, so nothing is cached.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+BOOT = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "carehome_project.settings")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode:
+        sys.exit(result.stderr)
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()[1:]))
+
+    top_level = [row for row in rows if not row[2].startswith(" ")]
+    heavy = ("weasyprint", "xhtml2pdf", "reportlab", "imgkit", "PIL", "requests")
+    loaded = sorted({name.strip().split(".")[0] for _, _, name in rows} & set(heavy))
+
+    print(f"wall time: {elapsed:.2f}s  imports: {len(rows)}  "
+          f"import time: {sum(row[0] for row in top_level) / 1e6:.2f}s")
+    print(f"heavy libraries loaded at boot: {', '.join(loaded) or 'none'}")
+    print()
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
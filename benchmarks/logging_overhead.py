@@ -0,0 +1,123 @@
+"""
+Request-thread cost of logging: the old setup against core.logconfig.
+
+"before" is what a request used to do: print() a few debug lines (stdout is
+unbuffered in the Docker image) and send every django record, SQL included,
+through a synchronous FileHandler at DEBUG. "after" is the QueuedHandler
+with JSON output and django.db.backends sampled at --db-sample-rate. Both
+write to temporary files. Only the time spent on the calling thread is
+measured; the listener's drain time is reported separately.
+
+On a fast local disk a synchronous write is cheap. The cost shows up when the
+sink blocks, e.g. a container stdout pipe behind a busy log shipper or a
+network volume. --sink-latency-us adds that much delay to every write.
+
+    python benchmarks/logging_overhead.py
+    python benchmarks/logging_overhead.py --requests 20000 --sink-latency-us 0,50,200
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.logconfig import QueuedHandler, SamplingFilter  # noqa: E402
+
+PRINTS_PER_REQUEST = 3  # what login_view printed on every POST
+
+
+class SlowStream:
+    """Wraps a file so every write blocks for ``latency`` seconds first"""
+
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, data):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def fake_request(db_logger, request_logger, queries, print_lines):
+    if print_lines:
+        print("Login view accessed")
+        print("Attempting auth for someone@example.com")
+        print("User object:", None)
+    for i in range(queries):
+        db_logger.debug("(0.001) SELECT * FROM core_customuser WHERE id = %s; args=(%s,)", i, i)
+    request_logger.info("GET /dashboard/ 200")
+
+
+def measure(handler, requests, queries, print_lines):
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.DEBUG)
+    db_logger = logging.getLogger("django.db.backends")
+    request_logger = logging.getLogger("django.request")
+
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        fake_request(db_logger, request_logger, queries, print_lines)
+        samples.append(time.perf_counter() - started)
+
+    drain_started = time.perf_counter()
+    handler.close()
+    drain = time.perf_counter() - drain_started
+    root.handlers[:] = []
+    return samples, drain
+
+
+def report(name, samples, drain):
+    samples = sorted(samples)
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    print(f"{name:<8}{statistics.mean(samples) * 1e6:>10.1f}{cuts[49] * 1e6:>10.1f}"
+          f"{cuts[98] * 1e6:>10.1f}{sum(samples):>10.2f}{drain:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--queries-per-request", type=int, default=20)
+    parser.add_argument("--db-sample-rate", type=float, default=0.01)
+    parser.add_argument("--sink-latency-us", default="0,100",
+                        help="comma-separated per-write delays to try")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.queries_per_request} SQL debug records + "
+          f"{PRINTS_PER_REQUEST} prints (before only) each, "
+          f"django.db.backends sampled at {args.db_sample_rate} (after)")
+    for latency_us in (int(value) for value in args.sink_latency_us.split(",")):
+        latency = latency_us / 1e6
+        with tempfile.TemporaryDirectory() as tmp:
+            real_stdout = sys.stdout
+            sys.stdout = SlowStream(open(os.path.join(tmp, "stdout.log"), "w", buffering=1), latency)
+            try:
+                before = logging.FileHandler(os.path.join(tmp, "django_debug.log"))
+                before.stream = SlowStream(before.stream, latency)
+                before_result = measure(before, args.requests, args.queries_per_request, print_lines=True)
+
+                after = QueuedHandler(filename=os.path.join(tmp, "app.jsonl"))
+                after.target.stream = SlowStream(after.target.stream, latency)
+                after.addFilter(SamplingFilter({"django.db.backends": args.db_sample_rate}))
+                after_result = measure(after, args.requests, args.queries_per_request, print_lines=False)
+            finally:
+                sys.stdout.close()
+                sys.stdout = real_stdout
+
+        print(f"\nsink latency {latency_us} us per write")
+        print(f"{'':<8}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'total s':>10}{'drain s':>10}")
+        report("before", *before_result)
+        report("after", *after_result)
+
+
+if __name__ == "__main__":
+    main()
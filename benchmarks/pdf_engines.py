@@ -0,0 +1,115 @@
+"""
+Shift log PDF (pdf_templates/log_pdf.html) rendered by each engine in core/rendering.py.
+
+Every engine runs in a fresh interpreter so their libraries don't share memory.
+Reported per engine: the first render (includes importing the library), mean
+and p95 of the following renders, peak RSS of the process, peak Python
+allocations during one render (tracemalloc; misses Cairo/Pango's C memory) and
+the PDF size. No database is needed: the log is built from unsaved models.
+
+xhtml2pdf (what render_pdf_view uses) can't parse the template's calc() width,
+so it gets the template with that one declaration replaced by "auto".
+
+    python benchmarks/pdf_engines.py
+    python benchmarks/pdf_engines.py --renders 200 --words 80 --engines reportlab,weasyprint
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ENGINES = ("weasyprint", "xhtml2pdf", "reportlab")
+
+CHILD = """
+import json, statistics, time, tracemalloc
+from datetime import date, time as datetime_time
+import django
+django.setup()
+from django.template.loader import render_to_string
+from core.models import CareHome, CustomUser, LatestLogEntry, LogEntry, ServiceUser
+from core.rendering import ENGINES, html_to_pdf_xhtml2pdf
+
+TEMPLATE = 'pdf_templates/log_pdf.html'
+latest_log = LatestLogEntry(
+    carehome=CareHome(name='Benchmark House'),
+    service_user=ServiceUser(first_name='Ada', last_name='Lovelace'),
+    user=CustomUser(first_name='Sam', last_name='Staff'),
+    date=date(2026, 1, 5), day_of_week='Monday', shift='morning', staff_name='Sam Staff',
+)
+words = ('Resident settled well and ate breakfast with support from staff. ' * 20).split()[:{words}]
+context = {{
+    'latest_log': latest_log,
+    'log_entries': [LogEntry(time_slot=datetime_time(8 + hour), content=' '.join(words)) for hour in range(12)],
+}}
+
+def render():
+    if {engine!r} == 'xhtml2pdf':
+        html = render_to_string(TEMPLATE, context).replace('calc(100% - 1in)', 'auto')
+        return html_to_pdf_xhtml2pdf(html)
+    return ENGINES[{engine!r}].render(TEMPLATE, context)
+
+started = time.perf_counter()
+pdf = render()
+first = time.perf_counter() - started
+
+tracemalloc.start()
+render()
+traced_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+
+samples = []
+for _ in range({renders}):
+    started = time.perf_counter()
+    render()
+    samples.append(time.perf_counter() - started)
+
+peak_rss_kb = 0
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmHWM:'):
+            peak_rss_kb = int(line.split()[1])
+print(json.dumps({{
+    'first': first,
+    'mean': statistics.mean(samples),
+    'p95': statistics.quantiles(samples, n=20)[18] if len(samples) > 1 else samples[0],
+    'peak_rss_kb': peak_rss_kb,
+    'traced_peak': traced_peak,
+    'size': len(pdf),
+}}))
+"""
+
+
+def run(engine, renders, words):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="carehome_project.settings", LOG_LEVEL="CRITICAL")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD.format(engine=engine, renders=renders, words=words)],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=50)
+    parser.add_argument("--words", type=int, default=30, help="words per log entry (12 entries)")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    args = parser.parse_args()
+
+    print(f"{args.renders} renders of a 12-entry shift log, {args.words} words per entry")
+    print(f"{'engine':<12}{'first s':>10}{'mean ms':>10}{'p95 ms':>10}{'peak RSS MB':>13}"
+          f"{'py alloc KB':>13}{'bytes':>9}")
+    for engine in args.engines.split(","):
+        result = run(engine, args.renders, args.words)
+        if "error" in result:
+            print(f"{engine:<12}failed: {result['error']}")
+            continue
+        print(f"{engine:<12}{result['first']:>10.2f}{result['mean'] * 1e3:>10.1f}{result['p95'] * 1e3:>10.1f}"
+              f"{result['peak_rss_kb'] / 1024:>13.1f}{result['traced_peak'] / 1024:>13.0f}{result['size']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cold-start cost of a worker: boot Django and serve one request, in a fresh interpreter.
+
+Compares the lazy URLconf against importing every view module up front (what
+the old single core/views.py did), reporting time to first response and
+resident memory.
+
+    python benchmarks/startup.py                 # POST /api/token/
+    python benchmarks/startup.py --path /search/ --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import importlib, json, os, pkgutil, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+if {eager!r}:
+    import core.views
+    for module in pkgutil.iter_modules(core.views.__path__):
+        importlib.import_module('core.views.' + module.name)
+from django.test import Client
+response = Client().{method}({path!r})
+elapsed = time.perf_counter() - start
+rss_kb = 0
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_kb': rss_kb,
+    'status': response.status_code,
+    'modules': len(sys.modules),
+    'view_modules': sorted(m for m in sys.modules if m.startswith('core.views.')),
+}}))
+"""
+
+
+def measure(path, method, eager, runs, root):
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "carehome_project.settings")
+    script = CHILD.format(eager=eager, path=path, method=method)
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", script], cwd=root, env=env,
+                             capture_output=True, text=True)
+        if out.returncode:
+            sys.exit(out.stderr)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/api/token/")
+    parser.add_argument("--method", default="post", choices=["get", "post"])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{args.method.upper()} {args.path}, {args.runs} runs each")
+    for label, eager in (("lazy", False), ("eager", True)):
+        results = measure(args.path, args.method, eager, args.runs, root)
+        seconds = statistics.median(r["seconds"] for r in results)
+        rss_mb = statistics.median(r["rss_kb"] for r in results) / 1024
+        last = results[-1]
+        print(f"{label:>5}: first response {seconds * 1000:7.1f} ms  rss {rss_mb:6.1f} MB  "
+              f"modules {last['modules']}  status {last['status']}  "
+              f"view modules loaded: {', '.join(m.split('.')[-1] for m in last['view_modules']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
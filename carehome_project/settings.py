@@ -1,6 +1,7 @@
 # settings.py (modified: Prometheus LOCAL only + Postgres on Render, SQLite fallback locally)
 
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -17,8 +18,10 @@ SECRET_KEY = os.environ.get(
 
 DEBUG = os.environ.get("DEBUG", "False") == "True"
 
-# Prometheus: LOCAL/DEBUG only (you said it's free on local only)
-USE_PROMETHEUS = DEBUG
+# Prometheus: on by default. Outside DEBUG, /metrics needs "Authorization: Bearer <METRICS_TOKEN>"
+# (or a superuser session) - see core/metrics.py
+USE_PROMETHEUS = os.environ.get("USE_PROMETHEUS", "True") == "True"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
 
 # Hosts / CSRF
 ALLOWED_HOSTS = ["*"]  # OK for testing; for production, restrict this.
@@ -58,8 +61,10 @@ if USE_PROMETHEUS:
 
 # MIDDLEWARE
 MIDDLEWARE = [
+    "core.profiling.SQLProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.routers.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -72,7 +77,7 @@ MIDDLEWARE = [
 
 if USE_PROMETHEUS:
     MIDDLEWARE = (
-        ["django_prometheus.middleware.PrometheusBeforeMiddleware"]
+        ["django_prometheus.middleware.PrometheusBeforeMiddleware", "core.metrics.QueryCountMiddleware"]
         + MIDDLEWARE
         + ["django_prometheus.middleware.PrometheusAfterMiddleware"]
     )
@@ -117,12 +122,26 @@ TEMPLATES = [
 # - Locally: if DATABASE_URL not set -> SQLite
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
+# PgBouncer in transaction pooling mode hands each transaction whatever server connection
+# is free, so set PGBOUNCER_TRANSACTION_POOLING=True behind it. That turns off the
+# server-side cursors QuerySet.iterator() opens (core/mediagc.py, core/warehouse.py) and
+# the session-level advisory locks in core/scheduler.py, neither of which survives a
+# change of server connection. Set CONN_MAX_AGE=0 too when PgBouncer runs next to the
+# app, so idle Django connections don't sit on its client slots.
+PGBOUNCER_TRANSACTION_POOLING = os.environ.get("PGBOUNCER_TRANSACTION_POOLING", "False") == "True"
+DISABLE_SERVER_SIDE_CURSORS = os.environ.get(
+    "DISABLE_SERVER_SIDE_CURSORS", str(PGBOUNCER_TRANSACTION_POOLING)
+) == "True"
+CONN_MAX_AGE = int(os.environ.get("CONN_MAX_AGE", "600"))
+
 if DATABASE_URL:
     # Render / production (Postgres)
     DATABASES = {
         "default": dj_database_url.parse(
             DATABASE_URL,
-            conn_max_age=600,
+            conn_max_age=CONN_MAX_AGE,
+            conn_health_checks=True,
+            disable_server_side_cursors=DISABLE_SERVER_SIDE_CURSORS,
             ssl_require=not DEBUG,
         )
     }
@@ -135,6 +154,22 @@ else:
         }
     }
 
+# Optional read replica: GET requests read from it unless the user wrote recently
+# (core/routers.py). Tests use the primary for both aliases.
+REPLICA_DATABASE_URL = os.environ.get("REPLICA_DATABASE_URL")
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+
+if REPLICA_DATABASE_URL:
+    DATABASES["replica"] = dj_database_url.parse(
+        REPLICA_DATABASE_URL,
+        conn_max_age=CONN_MAX_AGE,
+        conn_health_checks=True,
+        disable_server_side_cursors=DISABLE_SERVER_SIDE_CURSORS,
+        ssl_require=not DEBUG,
+        test_options={"MIRROR": "default"},
+    )
+    DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
 # PASSWORD VALIDATION
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -160,26 +195,118 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 # MEDIA
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+# Orphaned files (`manage.py gc_media`, core/mediagc.py) are only collected once older than
+# MEDIA_GC_MIN_AGE_HOURS, and stay in MEDIA_ROOT/.quarantine for MEDIA_GC_QUARANTINE_DAYS.
+MEDIA_GC_MIN_AGE_HOURS = int(os.environ.get("MEDIA_GC_MIN_AGE_HOURS", "24"))
+MEDIA_GC_QUARANTINE_DAYS = int(os.environ.get("MEDIA_GC_QUARANTINE_DAYS", "30"))
 
 # DEFAULT PK
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# CACHE
+# Care home / resident picker lists (core/listcache.py) and per home-day compliance rows
+# (core/compliance.py). Local memory by default; CACHE_BACKEND=file shares one cache between
+# worker processes on a host, so a change seen by one worker invalidates the lists for all
+# of them (gunicorn.conf.py sets this).
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+CACHES = {
+    "default": {
+        "BACKEND": {
+            "locmem": "django.core.cache.backends.locmem.LocMemCache",
+            "file": "django.core.cache.backends.filebased.FileBasedCache",
+        }[CACHE_BACKEND],
+        "LOCATION": os.environ.get("CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "carehome_cache")),
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    }
+}
+LIST_CACHE_SECONDS = int(os.environ.get("LIST_CACHE_SECONDS", "3600"))
+COMPLIANCE_CACHE_SECONDS = int(os.environ.get("COMPLIANCE_CACHE_SECONDS", str(7 * 24 * 3600)))
+
+# PDF
+# Engine for shift log PDFs (core/rendering.py): "reportlab" draws them directly (core/pdf_layouts.py),
+# "weasyprint" lays out pdf_templates/log_pdf.html. Everything else uses WeasyPrint.
+LOG_PDF_ENGINE = os.environ.get("LOG_PDF_ENGINE", "reportlab")
+# Size of WeasyPrint output (core/pdf_optimise.py; `manage.py optimise_pdfs` applies the same to stored files):
+# embedded photos are resampled to PDF_IMAGE_DPI at their printed size and capped at PDF_MAX_IMAGE_PX.
+PDF_OPTIMISE = os.environ.get("PDF_OPTIMISE", "True") == "True"
+PDF_IMAGE_DPI = int(os.environ.get("PDF_IMAGE_DPI", "150"))
+PDF_MAX_IMAGE_PX = int(os.environ.get("PDF_MAX_IMAGE_PX", "1600"))
+PDF_JPEG_QUALITY = int(os.environ.get("PDF_JPEG_QUALITY", "75"))
+
+# SQL PROFILING
+# Off unless SQL_PROFILING=True. Profiles a sample of requests (query count, DB time,
+# slowest queries with their call site) into a per-worker ring buffer; staff can read
+# it at /debug/sql-profiles/ (core/profiling.py)
+SQL_PROFILING = os.environ.get("SQL_PROFILING", "False") == "True"
+SQL_PROFILING_SAMPLE_RATE = float(os.environ.get("SQL_PROFILING_SAMPLE_RATE", "0.01"))
+SQL_PROFILING_BUFFER_SIZE = int(os.environ.get("SQL_PROFILING_BUFFER_SIZE", "200"))
+SQL_PROFILING_SLOWEST = int(os.environ.get("SQL_PROFILING_SLOWEST", "5"))
+
+# OUTBOX
+# Side effects queued in the same transaction as the change, run by `manage.py process_outbox`
+# (core/outbox.py). OUTBOX_RUN_ON_COMMIT=True runs them in-process after commit when no worker is running.
+OUTBOX_RUN_ON_COMMIT = os.environ.get("OUTBOX_RUN_ON_COMMIT", "False") == "True"
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", "300"))
+
+# SCHEDULER
+# Periodic jobs (core/scheduler.py) run by `manage.py run_scheduler`; each run is kept as a JobRun
+# for SCHEDULER_KEEP_RUNS_DAYS.
+SCHEDULER_KEEP_RUNS_DAYS = int(os.environ.get("SCHEDULER_KEEP_RUNS_DAYS", "30"))
+
+# AUTO-LOCK
+# `manage.py auto_lock_logs` (core/autolock.py, run every few minutes) locks shift logs left incomplete
+# AUTO_LOCK_GRACE_MINUTES after their shift ended, looking back AUTO_LOCK_LOOKBACK_DAYS, and renders
+# missing PDFs, trying each up to AUTO_LOCK_RENDER_ATTEMPTS times per run.
+AUTO_LOCK_GRACE_MINUTES = int(os.environ.get("AUTO_LOCK_GRACE_MINUTES", "30"))
+AUTO_LOCK_LOOKBACK_DAYS = int(os.environ.get("AUTO_LOCK_LOOKBACK_DAYS", "7"))
+AUTO_LOCK_RENDER_ATTEMPTS = int(os.environ.get("AUTO_LOCK_RENDER_ATTEMPTS", "2"))
+
+# LOG ARCHIVAL
+# Locked shifts older than this are moved into compressed LogArchive rows (manage.py archive_logs)
+LOG_ARCHIVE_AFTER_DAYS = int(os.environ.get("LOG_ARCHIVE_AFTER_DAYS", "90"))
+
+# ANALYTICS WAREHOUSE
+# Reporting dashboards read a separate SQLite file filled nightly by `manage.py sync_warehouse`
+# (core/warehouse.py) from rows changed since the last run, less ANALYTICS_OVERLAP_MINUTES.
+ANALYTICS_DB_PATH = os.environ.get("ANALYTICS_DB_PATH", str(BASE_DIR / "analytics.sqlite3"))
+ANALYTICS_OVERLAP_MINUTES = int(os.environ.get("ANALYTICS_OVERLAP_MINUTES", "10"))
+
+# LOGGING
+# JSON lines to stdout (or LOG_FILE), written by a background thread - request
+# threads only enqueue (core/logconfig.py).
+#   LOG_LEVEL=INFO                    root level
+#   LOG_LEVELS=django.db.backends=DEBUG,core=DEBUG
+#   LOG_SAMPLING=django.db.backends=0.01   keep 1% of that logger's records below WARNING
+def _env_pairs(name):
+    """"a=1,b=2" in the environment -> {"a": "1", "b": "2"}"""
+    pairs = (item.split("=", 1) for item in os.environ.get(name, "").split(",") if "=" in item)
+    return {key.strip(): value.strip() for key, value in pairs}
+
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "sampling": {
+            "()": "core.logconfig.SamplingFilter",
+            "rates": _env_pairs("LOG_SAMPLING"),
+        },
+    },
     "handlers": {
-        "file": {
-            "level": "DEBUG",
-            "class": "logging.FileHandler",
-            "filename": "django_debug.log",
+        "queue": {
+            "()": "core.logconfig.QueuedHandler",
+            "filename": os.environ.get("LOG_FILE") or None,
+            "filters": ["sampling"],
         },
     },
+    "root": {
+        "handlers": ["queue"],
+        "level": LOG_LEVEL,
+    },
     "loggers": {
-        "django": {
-            "handlers": ["file"],
-            "level": "DEBUG",
-            "propagate": True,
-        },
+        name: {"level": level.upper()} for name, level in _env_pairs("LOG_LEVELS").items()
     },
 }
-
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import lazy_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
-    path("", include("django_prometheus.urls")),
+    path('metrics', lazy_view('core.metrics.metrics_view'), name='prometheus-django-metrics'),
 ]
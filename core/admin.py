@@ -6,7 +6,8 @@ from django.core.exceptions import FieldError
 from django.utils import timezone
 
 from .models import CustomUser, CareHome, ServiceUser, LogEntry, Mapping, IncidentReport, ABCForm, LatestLogEntry, \
-    MissedLog ,Rota, Shift, RotaApproval, ShiftChangeLog, Notification
+    MissedLog ,Rota, Shift, RotaApproval, ShiftChangeLog, Notification, BehaviourDailyCount, \
+    OutboxMessage, ScheduledJob, JobRun
 
 
 @admin.register(CustomUser)
@@ -107,6 +108,12 @@ class ABCFormAdmin(admin.ModelAdmin):
 
     updated_by_display.short_description = "Last Updated By"
 
+@admin.register(BehaviourDailyCount)
+class BehaviourDailyCountAdmin(admin.ModelAdmin):
+    list_display = ('date', 'carehome', 'service_user', 'behaviour', 'count')
+    list_filter = ('carehome', 'behaviour')
+    date_hierarchy = 'date'
+
 @admin.register(LatestLogEntry)
 class LatestLogEntryAdmin(admin.ModelAdmin):
     list_display = ('user', 'carehome', 'service_user', 'shift', 'date', 'status', 'created_at')
@@ -165,3 +172,25 @@ class ShiftChangeLogAdmin(admin.ModelAdmin):
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'title', 'notif_type', 'is_read', 'created_at')
     list_filter = ('notif_type', 'is_read')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'created_at', 'attempts', 'available_at', 'processed_at')
+    list_filter = ('topic', ('processed_at', admin.EmptyFieldListFilter))
+    search_fields = ('last_error',)
+
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'schedule', 'next_run_at', 'last_started_at', 'last_duration', 'last_succeeded',
+                    'lease_owner')
+    readonly_fields = ('lease_owner', 'lease_expires_at', 'last_started_at', 'last_duration', 'last_succeeded',
+                       'last_error')
+
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ('job', 'started_at', 'duration', 'succeeded', 'owner')
+    list_filter = ('job', 'succeeded')
+    date_hierarchy = 'started_at'
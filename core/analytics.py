@@ -0,0 +1,123 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .models import ABCForm, BehaviourDailyCount, ServiceUser
+
+
+def form_day(date_time):
+    return timezone.localdate(date_time) if timezone.is_aware(date_time) else date_time.date()
+
+
+def count_behaviours(rows):
+    """
+    Count target behaviours from (service_user_id, carehome_id, date_time, target_behaviours) rows.
+    Returns a Counter keyed by (service_user_id, carehome_id, date, behaviour).
+    """
+    counts = Counter()
+    for service_user_id, carehome_id, date_time, behaviours in rows:
+        day = form_day(date_time)
+        for behaviour in set(behaviours or []):
+            counts[(service_user_id, carehome_id, day, behaviour)] += 1
+    return counts
+
+
+def _to_rows(counts):
+    return [
+        BehaviourDailyCount(
+            service_user_id=service_user_id,
+            carehome_id=carehome_id,
+            date=day,
+            behaviour=behaviour,
+            count=count,
+        )
+        for (service_user_id, carehome_id, day, behaviour), count in counts.items()
+    ]
+
+
+def refresh_behaviour_counts(service_user_id, day):
+    """
+    Recompute the rollup rows for one service user on one day. Call it after the
+    form changes have committed (core.signals does, with on_commit).
+    """
+    forms = ABCForm.objects.filter(service_user_id=service_user_id).values_list(
+        'service_user_id', 'service_user__carehome_id', 'date_time', 'target_behaviours'
+    )
+
+    with transaction.atomic():
+        # One refresh per resident at a time, so two can't insert the same day's rows;
+        # the one that waited counts again once the other has committed
+        ServiceUser.objects.select_for_update().filter(pk=service_user_id).first()
+        # date_time__date follows the current time zone, same as form_day
+        counts = count_behaviours(forms.filter(date_time__date=day))
+        BehaviourDailyCount.objects.filter(service_user_id=service_user_id, date=day).delete()
+        BehaviourDailyCount.objects.bulk_create(_to_rows(counts))
+
+
+def rebuild_behaviour_counts(since=None, chunk_size=2000, progress=None):
+    """
+    Recompute the rollups from ABCForm history, reading forms in pk-ordered chunks.
+    Only days on or after ``since`` are replaced when it is given.
+    """
+    forms = ABCForm.objects.order_by('pk')
+    if since:
+        forms = forms.filter(date_time__date__gte=since)
+
+    counts = Counter()
+    last_pk = 0
+    processed = 0
+    while True:
+        chunk = list(forms.filter(pk__gt=last_pk).values_list(
+            'pk', 'service_user_id', 'service_user__carehome_id', 'date_time', 'target_behaviours'
+        )[:chunk_size])
+        if not chunk:
+            break
+        counts.update(count_behaviours(row[1:] for row in chunk))
+        last_pk = chunk[-1][0]
+        processed += len(chunk)
+        if progress:
+            progress(processed)
+
+    with transaction.atomic():
+        stale = BehaviourDailyCount.objects.all()
+        if since:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+        BehaviourDailyCount.objects.bulk_create(_to_rows(counts), batch_size=chunk_size)
+
+    return processed, len(counts)
+
+
+def behaviour_trends(queryset, period='day', date_from=None, date_to=None):
+    """
+    Chart data from the rollups: one point per (period, behaviour).
+    ``queryset`` is a BehaviourDailyCount queryset already scoped to the caller.
+    """
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+
+    if period == 'week':
+        queryset = queryset.annotate(period=TruncWeek('date'))
+    else:
+        queryset = queryset.annotate(period=F('date'))
+
+    rows = (
+        queryset.values('period', 'behaviour')
+        .annotate(total=Sum('count'))
+        .order_by('period', 'behaviour')
+    )
+    labels = dict(ABCForm.TARGET_BEHAVIOUR_CHOICES)
+    return [
+        {
+            'period': row['period'].isoformat(),
+            'behaviour': row['behaviour'],
+            'label': labels.get(row['behaviour'], row['behaviour']),
+            'count': row['total'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,120 @@
+import json
+import zlib
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LatestLogEntry, LogArchive, LogEntry
+
+
+def pack_entries(latest_log, entries):
+    """Serialise a shift's entries into one zlib-compressed JSON blob"""
+    payload = {
+        'carehome_id': latest_log.carehome_id,
+        'service_user_id': latest_log.service_user_id,
+        'shift': latest_log.shift,
+        'date': latest_log.date.isoformat(),
+        'entries': [
+            [entry.id, entry.user_id, entry.time_slot.isoformat(), entry.content]
+            for entry in entries
+        ],
+    }
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def unpack_entries(latest_log, data):
+    """Rebuild (unsaved) LogEntry objects from an archive blob, ordered by time slot"""
+    payload = json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+    entries = [
+        LogEntry(
+            id=entry_id,
+            user_id=user_id,
+            carehome_id=payload['carehome_id'],
+            service_user_id=payload['service_user_id'],
+            shift=payload['shift'],
+            date=latest_log.date,
+            time_slot=time.fromisoformat(time_slot),
+            content=content,
+            latest_log=latest_log,
+            is_locked=True,
+        )
+        for entry_id, user_id, time_slot, content in payload['entries']
+    ]
+    entries.sort(key=lambda entry: entry.time_slot)
+    return entries
+
+
+def get_log_entries(latest_log):
+    """Entries for a shift, read from the archive once it has been archived"""
+    if latest_log.archived_at:
+        return unpack_entries(latest_log, latest_log.archive.data)
+    return LogEntry.objects.filter(
+        service_user=latest_log.service_user,
+        date=latest_log.date,
+        shift=latest_log.shift
+    )
+
+
+def delete_entries(entry_ids, keep_search_documents=False):
+    """
+    Delete hourly LogEntry rows. With keep_search_documents the rows are deleted
+    without post_delete signals, so their search documents aren't dropped.
+    Returns the number of rows deleted.
+    """
+    entries = LogEntry.objects.filter(pk__in=entry_ids)
+    if keep_search_documents:
+        # Nothing references LogEntry, so skipping the collector only skips the signals
+        return entries._raw_delete(entries.db)
+    return entries.delete()[0]
+
+
+def archive_shift(latest_log):
+    """Move one locked shift's LogEntry rows into a LogArchive. Returns the number of entries moved."""
+    with transaction.atomic():
+        latest_log = LatestLogEntry.objects.select_for_update().get(pk=latest_log.pk)
+        if latest_log.archived_at or latest_log.status != 'locked':
+            return 0
+
+        entries = list(LogEntry.objects.filter(latest_log=latest_log).order_by('time_slot'))
+        LogArchive.objects.create(
+            latest_log=latest_log,
+            entry_count=len(entries),
+            data=pack_entries(latest_log, entries),
+        )
+        LatestLogEntry.objects.filter(pk=latest_log.pk).update(archived_at=timezone.now())
+
+        # Search documents stay so archived shifts remain searchable
+        delete_entries([entry.pk for entry in entries], keep_search_documents=True)
+
+        return len(entries)
+
+
+def archivable_logs(days=None):
+    days = settings.LOG_ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.localdate() - timedelta(days=days)
+    return LatestLogEntry.objects.filter(
+        status='locked',
+        archived_at__isnull=True,
+        date__lt=cutoff,
+    ).order_by('pk')
+
+
+def archive_old_logs(days=None, batch_size=200, progress=None):
+    """Archive every eligible shift, one transaction per shift, reading candidates in batches"""
+    shifts = 0
+    entries = 0
+    last_pk = 0
+    queryset = archivable_logs(days)
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        for latest_log in batch:
+            entries += archive_shift(latest_log)
+            shifts += 1
+        last_pk = batch[-1].pk
+        if progress:
+            progress(shifts, entries)
+    return shifts, entries
@@ -0,0 +1,229 @@
+"""
+End-of-shift auto-lock (manage.py auto_lock_logs).
+
+Staff lock their own shift log (core.views.logs.lock_log_entries); logs nobody
+locked used to stay incomplete, without a PDF and with their hourly entries
+still counted as missing. This job, run every few minutes, locks every
+incomplete log whose shift ended more than AUTO_LOCK_GRACE_MINUTES ago at its
+care home, in bulk, then renders the PDFs across a process pool.
+
+Rendering is keyed on state, not on what this run locked: every locked log in
+the window without a PDF (and without a log.render_pdf outbox message still
+waiting to do it) gets one, written as log_pdfs/log_<id>.pdf like the outbox
+handler does. A log whose render failed, or a run that was killed halfway, is
+therefore simply picked up again by the next run.
+"""
+import logging
+import os
+from collections import defaultdict
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.utils import timezone
+
+from .archive import unpack_entries
+from .models import CareHome, LatestLogEntry, LogEntry, MissedLog, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE = 'pdf_templates/log_pdf.html'
+CHUNK_SIZE = 500
+
+# What the log forms assume when a care home has no shift times set
+DEFAULT_MORNING_END = time(20)
+DEFAULT_NIGHT_START = time(20)
+DEFAULT_NIGHT_END = time(8)
+
+
+def last_ended(carehome, now, grace):
+    """
+    (morning, night): the latest log date of each shift that ended at least
+    ``grace`` before ``now`` at this care home. A night log is dated the day it
+    starts, so a night that runs past midnight ends the next day.
+    """
+    local = timezone.localtime(now - grace)
+    today, yesterday = local.date(), local.date() - timedelta(days=1)
+
+    morning_end = carehome.morning_shift_end or DEFAULT_MORNING_END
+    morning = today if local.time() >= morning_end else yesterday
+
+    night_start = carehome.night_shift_start or DEFAULT_NIGHT_START
+    night_end = carehome.night_shift_end or DEFAULT_NIGHT_END
+    night = today if local.time() >= night_end else yesterday
+    if night_end <= night_start:
+        night -= timedelta(days=1)
+    return morning, night
+
+
+def ended_logs(now, grace, lookback_days):
+    """Logs (any status) of shifts that have ended, dated within the last ``lookback_days``"""
+    # Homes mostly share shift times: one pair of conditions per distinct end, not per home
+    homes_by_end = defaultdict(list)
+    carehomes = CareHome.objects.only('morning_shift_end', 'night_shift_start', 'night_shift_end')
+    for carehome in carehomes:
+        homes_by_end[last_ended(carehome, now, grace)].append(carehome.pk)
+    if not homes_by_end:
+        return LatestLogEntry.objects.none()
+
+    ended = Q()
+    for (morning, night), carehome_ids in homes_by_end.items():
+        ended |= Q(carehome_id__in=carehome_ids, shift='morning', date__lte=morning)
+        ended |= Q(carehome_id__in=carehome_ids, shift='night', date__lte=night)
+    earliest = timezone.localtime(now).date() - timedelta(days=lookback_days)
+    return LatestLogEntry.objects.filter(ended, date__gte=earliest)
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def lock_logs(log_ids, now):
+    """Lock the still incomplete logs among ``log_ids`` as lock_log_entries would. Returns how many."""
+    locked = 0
+    for chunk in _chunks(log_ids):
+        with transaction.atomic():
+            locked += LatestLogEntry.objects.filter(pk__in=chunk, status='incomplete').update(
+                status='locked', updated_at=now
+            )
+            LogEntry.objects.filter(latest_log_id__in=chunk, is_locked=False).update(is_locked=True)
+            # The log.resolve_missed handler, for the whole chunk at once
+            MissedLog.objects.filter(
+                Exists(LatestLogEntry.objects.filter(
+                    pk__in=chunk,
+                    carehome_id=OuterRef('carehome_id'),
+                    service_user_id=OuterRef('service_user_id'),
+                    date=OuterRef('date'),
+                    shift=OuterRef('shift'),
+                )),
+                resolved_at__isnull=True,
+            ).update(resolved_at=now)
+    return locked
+
+
+def _queued_renders():
+    """Logs whose PDF an outbox worker is still going to render"""
+    payloads = OutboxMessage.objects.filter(
+        topic='log.render_pdf', processed_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS
+    ).values_list('payload', flat=True)
+    return {payload.get('latest_log_id') for payload in payloads}
+
+
+def render_jobs(log_ids, engine):
+    """(log id, picklable context, target path, engine) for each log, fetched a chunk at a time"""
+    directory = os.path.join(settings.MEDIA_ROOT, 'log_pdfs')
+    os.makedirs(directory, exist_ok=True)
+    entries = Prefetch('log_entries', queryset=LogEntry.objects.order_by('time_slot'))
+    for chunk in _chunks(log_ids):
+        logs = LatestLogEntry.objects.filter(pk__in=chunk).select_related(
+            'carehome', 'service_user', 'user', 'archive'
+        ).prefetch_related(entries)
+        jobs = []
+        for latest_log in logs:
+            if latest_log.archived_at:
+                log_entries = unpack_entries(latest_log, latest_log.archive.data)
+            else:
+                log_entries = list(latest_log.log_entries.all())
+            # Workers get the rows themselves; they never touch the database
+            latest_log._prefetched_objects_cache = {}
+            context = {'latest_log': latest_log, 'log_entries': log_entries}
+            jobs.append((latest_log.pk, context, os.path.join(directory, f'log_{latest_log.pk}.pdf'), engine))
+        yield jobs
+
+
+def render_log(job):
+    """Worker: render one log's PDF atomically. Returns (log id, storage name, error)."""
+    from .rendering import render_pdf
+
+    latest_log_id, context, path, engine = job
+    partial = f'{path}.{os.getpid()}.tmp'
+    try:
+        render_pdf(TEMPLATE, context, partial, engine=engine)
+        # A log.render_pdf handler writing the same log can't leave half a file behind
+        os.replace(partial, path)
+        return latest_log_id, f'log_pdfs/{os.path.basename(path)}', None
+    except Exception as exc:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        return latest_log_id, None, f"{type(exc).__name__}: {exc}"
+
+
+def _setup_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:  # spawned rather than forked
+        django.setup()
+
+
+def render_pdfs(log_ids, workers=None, attempts=2, progress=None):
+    """
+    Render PDFs for ``log_ids`` across a process pool, retrying failures up to
+    ``attempts`` times in all. Returns {'rendered', 'errors': [(log id, error)]}.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    totals = {'rendered': 0, 'errors': []}
+    if not log_ids:
+        return totals
+
+    def run(pool, ids):
+        failed = []
+        for jobs in render_jobs(ids, settings.LOG_PDF_ENGINE):
+            done = []
+            for latest_log_id, name, error in pool.map(render_log, jobs, chunksize=8):
+                if error:
+                    failed.append((latest_log_id, error))
+                else:
+                    done.append(LatestLogEntry(pk=latest_log_id, log_pdf=name))
+            LatestLogEntry.objects.bulk_update(done, ['log_pdf'])
+            totals['rendered'] += len(done)
+            if progress:
+                progress(totals)
+        return failed
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        failed = run(pool, log_ids)
+        for _ in range(attempts - 1):
+            if not failed:
+                break
+            logger.warning("Retrying %d log PDFs that failed to render", len(failed))
+            failed = run(pool, [latest_log_id for latest_log_id, _ in failed])
+    totals['errors'] = failed
+    return totals
+
+
+def auto_lock(now=None, grace_minutes=None, lookback_days=None, workers=None, dry_run=False, progress=None):
+    """
+    Lock ended shifts and render the PDFs they're missing.
+    Returns {'locked', 'to_render', 'rendered', 'errors': [(log id, error)]}.
+    """
+    now = now or timezone.now()
+    if grace_minutes is None:
+        grace_minutes = settings.AUTO_LOCK_GRACE_MINUTES
+    if lookback_days is None:
+        lookback_days = settings.AUTO_LOCK_LOOKBACK_DAYS
+    logs = ended_logs(now, timedelta(minutes=grace_minutes), lookback_days)
+
+    to_lock = list(logs.filter(status='incomplete').order_by('pk').values_list('pk', flat=True))
+    if dry_run:
+        without_pdf = logs.filter(Q(log_pdf='') | Q(log_pdf__isnull=True)).count()
+        return {'locked': len(to_lock), 'to_render': without_pdf, 'rendered': 0, 'errors': []}
+    locked = lock_logs(to_lock, now)
+
+    queued = _queued_renders()
+    to_render = [
+        latest_log_id for latest_log_id in logs.filter(
+            Q(log_pdf='') | Q(log_pdf__isnull=True), status='locked'
+        ).order_by('pk').values_list('pk', flat=True)
+        if latest_log_id not in queued
+    ]
+    totals = render_pdfs(to_render, workers=workers, attempts=settings.AUTO_LOCK_RENDER_ATTEMPTS, progress=progress)
+
+    logger.info(
+        "Auto-lock: %d logs locked, %d of %d PDFs rendered, %d failed",
+        locked, totals['rendered'], len(to_render), len(totals['errors'])
+    )
+    return {'locked': locked, 'to_render': len(to_render), **totals}
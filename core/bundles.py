@@ -0,0 +1,206 @@
+"""
+Monthly per-resident PDF bundles.
+
+A bundle is everything recorded for one resident in one month - locked shift
+logs, incident reports and ABC forms - made from the PDFs already stored for
+them. pypdf concatenates them in chronological order behind a generated
+contents page and adds an outline (per day, then per document). Nothing is
+re-rendered.
+
+Built bundles are kept in storage under bundles/, named by a fingerprint of
+their members: which documents, and each stored file's name, size and
+modification time. When any member changes, is added or is removed, the
+fingerprint changes, so the next request builds a new bundle and deletes the
+old one.
+"""
+import calendar
+import hashlib
+import logging
+import os
+import tempfile
+from collections import namedtuple
+from contextlib import ExitStack
+from datetime import date, datetime, time
+from html import escape
+from io import BytesIO
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ABCForm, IncidentReport, LatestLogEntry
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = 'bundles'
+
+# file is the model's FieldFile; stamp is (size, modified time) of the stored PDF
+Member = namedtuple('Member', 'when kind title file stamp')
+
+
+def _month_bounds(year, month):
+    first = date(year, month, 1)
+    last = date(year, month, calendar.monthrange(year, month)[1])
+    return first, last, (
+        timezone.make_aware(datetime.combine(first, time.min)),
+        timezone.make_aware(datetime.combine(last, time.max)),
+    )
+
+
+def _stamp(field_file):
+    """(size, mtime) of a stored file, or None if it's gone"""
+    try:
+        return field_file.size, field_file.storage.get_modified_time(field_file.name).timestamp()
+    except (OSError, NotImplementedError):
+        return None
+
+
+def _no_file(field):
+    return Q(**{field: ''}) | Q(**{f'{field}__isnull': True})
+
+
+def bundle_members(service_user, year, month):
+    """The month's stored PDFs for this resident, oldest first. Missing files are left out."""
+    first, last, (start, end) = _month_bounds(year, month)
+    candidates = []
+
+    logs = LatestLogEntry.objects.filter(
+        service_user=service_user, status='locked', date__range=(first, last)
+    ).exclude(_no_file('log_pdf')).select_related('carehome')
+    for log in logs:
+        if log.shift == 'morning':
+            starts = log.carehome.morning_shift_start or time(8)
+        else:
+            starts = log.carehome.night_shift_start or time(20)
+        when = timezone.make_aware(datetime.combine(log.date, starts))
+        candidates.append((when, 'Shift log', f"{log.get_shift_display()} shift - {log.staff_name}", log.log_pdf))
+
+    incidents = IncidentReport.objects.filter(
+        service_user=service_user, incident_datetime__range=(start, end)
+    ).exclude(_no_file('pdf_file'))
+    for incident in incidents:
+        candidates.append((incident.incident_datetime, 'Incident report', incident.location, incident.pdf_file))
+
+    abc_forms = ABCForm.objects.filter(
+        service_user=service_user, date_time__range=(start, end)
+    ).exclude(_no_file('pdf_file'))
+    for form in abc_forms:
+        candidates.append((form.date_time, 'ABC form', form.setting_location, form.pdf_file))
+
+    members = []
+    for when, kind, title, field_file in candidates:
+        stamp = _stamp(field_file)
+        if stamp is None:
+            logger.warning("Leaving %s out of the bundle: file missing", field_file.name)
+            continue
+        members.append(Member(timezone.localtime(when), kind, title, field_file, stamp))
+    members.sort(key=lambda member: (member.when, member.kind))
+    return members
+
+
+def fingerprint(members):
+    digest = hashlib.sha256()
+    for member in members:
+        digest.update(repr((member.kind, member.file.name, member.stamp)).encode())
+    return digest.hexdigest()[:16]
+
+
+def contents_page(service_user, year, month, members, first_pages):
+    """The contents page(s) as PDF bytes; first_pages[i] is where members[i] starts (1-based)"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    rows = [['Date', 'Time', 'Document', '', 'Page']]
+    for member, page in zip(members, first_pages):
+        rows.append([
+            member.when.strftime('%a %d %b'), member.when.strftime('%H:%M'),
+            member.kind, Paragraph(escape(member.title or ''), styles['BodyText']), str(page),
+        ])
+
+    heading = f"{service_user} - {calendar.month_name[month]} {year}"
+    output = BytesIO()
+    document = SimpleDocTemplate(
+        output, pagesize=A4, title=heading,
+        leftMargin=0.75 * inch, rightMargin=0.75 * inch, topMargin=0.75 * inch, bottomMargin=0.75 * inch,
+    )
+    table = Table(rows, colWidths=[0.9 * inch, 0.6 * inch, 1.2 * inch, None, 0.5 * inch], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f2f2f2')),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (-1, 0), (-1, -1), 'RIGHT'),
+    ]))
+    document.build([
+        Paragraph(escape(heading), styles['Title']),
+        Paragraph(f"{escape(str(service_user.carehome))} &middot; {len(members)} documents", styles['Normal']),
+        Spacer(1, 12),
+        table,
+    ])
+    return output.getvalue()
+
+
+def build_bundle(service_user, year, month, members, output):
+    """Write the bundle PDF for ``members`` to the binary file ``output``"""
+    from pypdf import PdfReader, PdfWriter
+
+    with ExitStack() as stack:
+        readers = [PdfReader(stack.enter_context(member.file.open('rb'))) for member in members]
+
+        # Page numbers depend on how long the contents are; settle it in a pass or two
+        contents_length = 1
+        while True:
+            first_pages, page = [], contents_length + 1
+            for reader in readers:
+                first_pages.append(page)
+                page += len(reader.pages)
+            contents = contents_page(service_user, year, month, members, first_pages)
+            length = len(PdfReader(BytesIO(contents)).pages)
+            if length == contents_length:
+                break
+            contents_length = length
+
+        writer = PdfWriter()
+        writer.append(BytesIO(contents), import_outline=False)
+        writer.add_outline_item('Contents', 0)
+        day_item, day = None, None
+        for member, reader, first_page in zip(members, readers, first_pages):
+            writer.append(reader, import_outline=False)
+            if member.when.date() != day:
+                day = member.when.date()
+                day_item = writer.add_outline_item(member.when.strftime('%A %d %B'), first_page - 1)
+            writer.add_outline_item(f"{member.when:%H:%M} {member.kind}", first_page - 1, parent=day_item)
+        writer.add_metadata({'/Title': f"{service_user} - {calendar.month_name[month]} {year}"})
+        writer.write(output)
+
+
+def get_bundle(service_user, year, month):
+    """
+    Storage name of the bundle for this resident and month, built if it isn't
+    cached yet. None if there's nothing to bundle.
+    """
+    members = bundle_members(service_user, year, month)
+    if not members:
+        return None
+
+    directory = f"{BUNDLE_DIR}/{service_user.pk}"
+    prefix = f"{year}-{month:02d}-"
+    name = f"{directory}/{prefix}{fingerprint(members)}.pdf"
+    if default_storage.exists(name):
+        return name
+
+    with tempfile.TemporaryFile() as output:
+        build_bundle(service_user, year, month, members, output)
+        output.seek(0)
+        name = default_storage.save(name, File(output))
+
+    # Bundles for the same month built before a member changed
+    for filename in default_storage.listdir(directory)[1]:
+        if filename.startswith(prefix) and filename != os.path.basename(name):
+            default_storage.delete(f"{directory}/{filename}")
+    return name
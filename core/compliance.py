@@ -0,0 +1,119 @@
+"""
+Shift log compliance heatmap: residents x days of missed shifts for one care home.
+
+A shift is missed when CareHome.check_missed_logs recorded a MissedLog for
+it - resolved later or not, it wasn't logged in time. Each day's missed
+counts per resident are cached per care home and day; saving or deleting a
+MissedLog (core.signals) and check_missed_logs drop that day's entry once the
+write commits, so a heatmap read mid-transaction can't re-cache the old
+counts. The matrix and the percentages are then worked out with NumPy.
+
+Only past days are cached. The check runs for the current day, from the
+scheduler process, whose cache the web workers don't share, so today's
+row is always read fresh.
+
+Bulk writes (bulk_create, queryset.update) send no signals; call
+invalidate_day()/invalidate_home() after they commit.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .listcache import residents_for
+from .models import MissedLog
+
+SHIFTS_PER_DAY = 2  # morning and night; afternoons aren't checked
+
+
+def _version_key(carehome_id):
+    return f'compliance:{carehome_id}:version'
+
+
+def _home_version(carehome_id):
+    version = cache.get(_version_key(carehome_id))
+    if version is None:
+        version = time.time_ns()
+        cache.set(_version_key(carehome_id), version, timeout=None)
+    return version
+
+
+def _day_key(carehome_id, version, day):
+    return f'compliance:{carehome_id}:{version}:{day.isoformat()}'
+
+
+def invalidate_day(carehome_id, day):
+    cache.delete(_day_key(carehome_id, _home_version(carehome_id), day))
+
+
+def invalidate_home(carehome_id):
+    # The next read starts a new version, so every cached day is dropped at once
+    cache.delete(_version_key(carehome_id))
+
+
+def missed_by_day(carehome_id, days):
+    """{day: {service_user_id: missed shifts}} for ``days``; one query for the days not cached"""
+    version = _home_version(carehome_id)
+    today = timezone.localdate()
+    keys = {day: _day_key(carehome_id, version, day) for day in days if day < today}
+    cached = cache.get_many(keys.values())
+    by_day = {day: cached[key] for day, key in keys.items() if key in cached}
+
+    missing = [day for day in days if day not in by_day]
+    if missing:
+        fresh = {day: {} for day in missing}
+        shifts = set(MissedLog.objects.filter(
+            carehome_id=carehome_id, date__range=(min(missing), max(missing))
+        ).values_list('service_user_id', 'date', 'shift'))
+        for service_user_id, day, _ in shifts:
+            if day in fresh:
+                fresh[day][service_user_id] = fresh[day].get(service_user_id, 0) + 1
+        cache.set_many({keys[day]: fresh[day] for day in missing if day in keys}, settings.COMPLIANCE_CACHE_SECONDS)
+        by_day.update(fresh)
+    return by_day
+
+
+def _percent(missed, expected):
+    return (100 * (1 - missed / expected)).round(1) if expected else None
+
+
+def heatmap(carehome, date_from, date_to):
+    """Missed shifts per day and resident, with compliance per home, resident and day"""
+    import numpy as np
+
+    days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    residents = residents_for([carehome.pk])
+    column = {service_user.pk: index for index, service_user in enumerate(residents)}
+
+    by_day = missed_by_day(carehome.pk, days)
+    cells = [
+        (row, column[service_user_id], count)
+        for row, day in enumerate(days)
+        for service_user_id, count in by_day[day].items()
+        if service_user_id in column  # moved to another home since
+    ]
+    missed = np.zeros((len(days), len(residents)), dtype=np.int16)
+    if cells:
+        rows, columns, counts = np.array(cells).T
+        missed[rows, columns] = counts
+
+    per_resident = _percent(missed.sum(axis=0), SHIFTS_PER_DAY * len(days))
+    per_day = _percent(missed.sum(axis=1), SHIFTS_PER_DAY * len(residents))
+    home = _percent(missed.sum(), SHIFTS_PER_DAY * missed.size)
+    return {
+        'carehome': {'id': carehome.pk, 'name': carehome.name},
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'dates': [day.isoformat() for day in days],
+        'residents': [{'id': service_user.pk, 'name': str(service_user)} for service_user in residents],
+        # missed[d][r]: shifts missed on dates[d] by residents[r]
+        'missed': missed.tolist(),
+        'compliance': {
+            'home': None if home is None else float(home),
+            'residents': per_resident.tolist(),
+            'days': [None] * len(days) if per_day is None else per_day.tolist(),
+        },
+        'total_missed': int(missed.sum()),
+    }
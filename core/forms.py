@@ -3,6 +3,7 @@ import datetime
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.core.validators import RegexValidator
+from .listcache import all_residents, carehome_list, use_cached_choices
 from .models import ServiceUser, CareHome, CustomUser, ABCForm, IncidentReport, LogEntry, Mapping
 # forms.py
 from django import forms
@@ -91,6 +92,7 @@ class StaffCreationForm(UserCreationForm):
 
         # Populate carehome dropdown safely at runtime
         self.fields['carehome'].queryset = CareHome.objects.all()
+        use_cached_choices(self.fields['carehome'], carehome_list)
 
         # Optional: add Bootstrap classes to role choices for consistency
         self.fields['role'].widget.attrs.update({'class': 'form-check-input'})
@@ -142,27 +144,11 @@ class MappingForm(forms.ModelForm):
             'staff': forms.Select(attrs={'class': 'form-control'}),
         }
 
-
-def __init__(self, *args, **kwargs):
-    super().__init__(*args, **kwargs)
-
-    # Only show users with staff role
-    self.fields['staff'].queryset = CustomUser.objects.filter(role='staff')
-
-    self.fields['carehomes'].queryset = CareHome.objects.all()
-    self.fields['service_users'].queryset = ServiceUser.objects.none()
-
-    self.fields['carehomes'].widget.attrs.update({'id': 'id_carehomes'})
-    self.fields['service_users'].widget.attrs.update({'id': 'id_service_users'})
-
-    if 'carehomes' in self.data:
-        try:
-            carehome_ids = self.data.getlist('carehomes')
-            self.fields['service_users'].queryset = ServiceUser.objects.filter(carehome_id__in=carehome_ids)
-        except (ValueError, TypeError):
-            pass
-    elif self.instance.pk:
-        self.fields['service_users'].queryset = self.instance.service_users.all()
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Options come from the list cache; the querysets only validate what was posted
+        use_cached_choices(self.fields['carehomes'], carehome_list)
+        use_cached_choices(self.fields['service_users'], all_residents)
 
 
 class ABCFormForm(forms.ModelForm):
@@ -251,7 +237,12 @@ class ABCFormForm(forms.ModelForm):
 
     class Meta:
         model = ABCForm
-        fields = ['service_user', 'date_of_birth', 'staff', 'date_time', 'target_behaviours']
+        fields = [
+            'service_user', 'date_of_birth', 'staff', 'date_time', 'target_behaviours',
+            'setting_location', 'setting_present', 'setting_activity', 'setting_environment',
+            'antecedent_description', 'antecedent_change', 'antecedent_noise', 'antecedent_waiting',
+            'behaviour_description', 'consequence_immediate', 'reflection_learnings',
+        ]
         widgets = {
             'service_user': forms.Select(attrs={
                 'class': 'form-control select2',
@@ -277,75 +268,6 @@ class ABCFormForm(forms.ModelForm):
         # Order service users by last name
         self.fields['service_user'].label_from_instance = lambda obj: obj.get_formatted_name()
 
-        # Parse existing instance data for edit view
-        if self.instance and self.instance.pk:
-            self.parse_instance_data()
-
-    def parse_instance_data(self):
-        """Parse the combined fields into individual form fields"""
-        # Parse setting
-        setting_data = self.parse_field_text(self.instance.setting)
-        self.initial.update({
-            'setting_location': setting_data.get('Location', ''),
-            'setting_present': setting_data.get('Present', ''),
-            'setting_activity': setting_data.get('Activity', ''),
-            'setting_environment': setting_data.get('Environment', '')
-        })
-
-        # Parse antecedent
-        antecedent_data = self.parse_field_text(self.instance.antecedent)
-        self.initial.update({
-            'antecedent_description': antecedent_data.get('Description', ''),
-            'antecedent_change': antecedent_data.get('Routine change', 'no'),
-            'antecedent_noise': antecedent_data.get('Unexpected noise', 'no'),
-            'antecedent_waiting': antecedent_data.get('Waiting for', '')
-        })
-
-        # Parse other fields
-        behaviour_data = self.parse_field_text(self.instance.behaviour)
-        self.initial['behaviour_description'] = behaviour_data.get('Description', '')
-
-        consequences_data = self.parse_field_text(self.instance.consequences)
-        self.initial['consequence_immediate'] = consequences_data.get('Immediate', '')
-
-        reflection_data = self.parse_field_text(self.instance.reflection)
-        self.initial['reflection_learnings'] = reflection_data.get('Learnings', '')
-
-    @staticmethod
-    def parse_field_text(text):
-        """Helper method to parse field text into dictionary"""
-        if not text:
-            return {}
-        return dict(line.split(':', 1) for line in text.split('\n') if ':' in line)
-
-    def save(self, commit=True):
-        instance = super().save(commit=False)
-
-        # Combine individual fields into model's text fields
-        instance.setting = "\n".join([
-            f"Location: {self.cleaned_data.get('setting_location', '')}",
-            f"Present: {self.cleaned_data.get('setting_present', '')}",
-            f"Activity: {self.cleaned_data.get('setting_activity', '')}",
-            f"Environment: {self.cleaned_data.get('setting_environment', '')}"
-        ])
-
-        instance.antecedent = "\n".join([
-            f"Description: {self.cleaned_data.get('antecedent_description', '')}",
-            f"Routine change: {self.cleaned_data.get('antecedent_change', 'no')}",
-            f"Unexpected noise: {self.cleaned_data.get('antecedent_noise', 'no')}",
-            f"Waiting for: {self.cleaned_data.get('antecedent_waiting', '')}"
-        ])
-
-        instance.behaviour = f"Description: {self.cleaned_data.get('behaviour_description', '')}"
-        instance.consequences = f"Immediate: {self.cleaned_data.get('consequence_immediate', '')}"
-        instance.reflection = f"Learnings: {self.cleaned_data.get('reflection_learnings', '')}"
-
-        if commit:
-            instance.save()
-            self.save_m2m()
-
-        return instance
-
 
 from django.contrib.auth import get_user_model
 User = get_user_model()
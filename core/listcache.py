@@ -0,0 +1,124 @@
+"""
+Cached care home and resident lists for the pickers and JSON lookups.
+
+Lists are stored in Django's cache under keys that include a version number.
+Saving or deleting a CareHome/ServiceUser bumps the version once the write
+commits (core.signals), so the old entry is never read again and simply
+expires. Bumping it any earlier would let a concurrent request cache the
+pre-write rows under the new version. Residents are cached per care home, so
+editing one home's residents leaves the other homes cached.
+
+Bulk writes (bulk_create, queryset.update) send no signals; call
+invalidate_carehomes()/invalidate_residents() after they commit.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.forms.models import ModelChoiceIterator
+
+from .models import CareHome, ServiceUser
+
+CAREHOMES_VERSION = 'lists:carehomes:version'
+
+
+def _residents_version_key(carehome_id):
+    return f'lists:residents:{carehome_id}:version'
+
+
+def _new_version():
+    # Not 1: if a version key is evicted, restarting the count could make old lists current again
+    return time.time_ns()
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:  # not set (or evicted)
+        cache.set(key, _new_version(), timeout=None)
+
+
+def _versions(keys):
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return versions
+
+
+def invalidate_carehomes():
+    _bump(CAREHOMES_VERSION)
+
+
+def invalidate_residents(*carehome_ids):
+    for carehome_id in set(carehome_ids):
+        if carehome_id is not None:
+            _bump(_residents_version_key(carehome_id))
+
+
+def carehome_list():
+    """All care homes, as CareHome.objects.all() would return them"""
+    version = _versions([CAREHOMES_VERSION])[CAREHOMES_VERSION]
+    key = f'lists:carehomes:{version}'
+    carehomes = cache.get(key)
+    if carehomes is None:
+        carehomes = list(CareHome.objects.all())
+        cache.set(key, carehomes, settings.LIST_CACHE_SECONDS)
+    return carehomes
+
+
+def residents_for(carehome_ids):
+    """Service users of the given care homes, in id order; one query for the homes not cached"""
+    carehome_ids = {int(carehome_id) for carehome_id in carehome_ids}
+    if not carehome_ids:
+        return []
+    versions = _versions([_residents_version_key(carehome_id) for carehome_id in carehome_ids])
+    list_keys = {
+        carehome_id: f'lists:residents:{carehome_id}:{versions[_residents_version_key(carehome_id)]}'
+        for carehome_id in carehome_ids
+    }
+    cached = cache.get_many(list_keys.values())
+
+    by_home = {carehome_id: cached[key] for carehome_id, key in list_keys.items() if key in cached}
+    missing = carehome_ids - by_home.keys()
+    if missing:
+        for carehome_id in missing:
+            by_home[carehome_id] = []
+        for service_user in ServiceUser.objects.filter(carehome_id__in=missing).order_by('pk'):
+            by_home[service_user.carehome_id].append(service_user)
+        cache.set_many(
+            {list_keys[carehome_id]: by_home[carehome_id] for carehome_id in missing},
+            settings.LIST_CACHE_SECONDS
+        )
+    return sorted((su for residents in by_home.values() for su in residents), key=lambda su: su.pk)
+
+
+def all_residents():
+    return residents_for(carehome.pk for carehome in carehome_list())
+
+
+class CachedChoiceIterator(ModelChoiceIterator):
+    """
+    Renders a ModelChoiceField's options from load() (e.g. carehome_list)
+    instead of querying field.queryset. Validation still uses the queryset.
+    """
+
+    def __init__(self, field, load):
+        super().__init__(field)
+        self.load = load
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.load():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.load()) + (self.field.empty_label is not None)
+
+
+def use_cached_choices(field, load):
+    """Make a form's (already copied) field render its options from load()"""
+    field.iterator = lambda field: CachedChoiceIterator(field, load)
+    field.widget.choices = field.choices
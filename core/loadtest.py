@@ -0,0 +1,168 @@
+"""
+In-process load harness: replays the main staff and manager flows through the
+Django test client against whatever DATABASES points at (PostgreSQL or SQLite)
+and reports latency percentiles and queries per request for each step.
+
+Pair it with generate_synthetic_data so the accounts and volumes exist.
+"""
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import CustomUser, LatestLogEntry, LogEntry, Mapping
+from .synthetic import EMAIL_DOMAIN
+
+
+class StepStats:
+    def __init__(self):
+        self.seconds = []
+        self.queries = []
+        self.errors = 0
+
+    def add(self, seconds, queries, ok):
+        self.seconds.append(seconds)
+        self.queries.append(queries)
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        samples = sorted(self.seconds)
+        if len(samples) > 1:
+            cuts = statistics.quantiles(samples, n=100, method='inclusive')
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = samples[0] if samples else 0
+        return {
+            'requests': len(samples),
+            'errors': self.errors,
+            'p50_ms': round(p50 * 1000, 1),
+            'p95_ms': round(p95 * 1000, 1),
+            'p99_ms': round(p99 * 1000, 1),
+            'queries_avg': round(statistics.mean(self.queries), 1) if self.queries else 0,
+            'queries_max': max(self.queries, default=0),
+        }
+
+
+class LoadTest:
+    def __init__(self, password, users=10, iterations=5, concurrency=1, seed=1):
+        self.users = users
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.password = password
+        self.random = random.Random(seed)
+        self.stats = {}
+
+    # ------------------------------------------------------------------
+    def request(self, client, step, method, path, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data or {})
+            elapsed = time.perf_counter() - started
+        self.stats.setdefault(step, StepStats()).add(elapsed, len(queries), response.status_code < 500)
+        return response
+
+    def login(self, client, email):
+        response = self.request(client, 'login', 'post', '/', {'username': email, 'password': self.password})
+        if response.status_code != 302:
+            raise RuntimeError(f"Login failed for {email}; was the data generated with this password?")
+
+    # ------------------------------------------------------------------
+    def staff_flow(self, email, seed):
+        rand = random.Random(seed)
+        client = Client(raise_request_exception=False)
+        self.login(client, email)
+        user = CustomUser.objects.get(email=email)
+        mapping = Mapping.objects.filter(staff=user).first()
+        residents = list(mapping.service_users.values_list('id', 'carehome_id')) if mapping else []
+
+        for _ in range(self.iterations):
+            self.request(client, 'staff dashboard', 'get', '/staff/')
+            self.request(client, 'open log form', 'get', '/create-log/')
+            if not residents:
+                continue
+            resident_id, carehome_id = rand.choice(residents)
+            shift = rand.choice(['morning', 'night'])
+            self.request(client, 'create log', 'post', '/create-log/', {
+                'carehome': carehome_id, 'service_user': resident_id, 'shift': shift,
+            })
+            latest_log = LatestLogEntry.objects.filter(
+                user=user, service_user_id=resident_id, shift=shift, date=timezone.localdate()
+            ).first()
+            if latest_log is None:
+                continue
+            self.request(client, 'log entry form', 'get', f'/log-entry/{latest_log.pk}/')
+            entry = LogEntry.objects.filter(latest_log=latest_log).order_by('time_slot').first()
+            if entry is not None:
+                self.request(client, 'save slot', 'post', f'/save-log/{entry.pk}/', {
+                    'content': f"Load test note {rand.randint(0, 10 ** 6)}",
+                })
+            if latest_log.status != 'locked':
+                self.request(client, 'lock log', 'get', f'/lock-log/{latest_log.pk}/')
+            self.request(client, 'my logs', 'get', '/my-logs/')
+
+        connection.close()
+
+    def manager_flow(self, email, carehome_ids, seed):
+        rand = random.Random(seed)
+        client = Client(raise_request_exception=False)
+        self.login(client, email)
+        for _ in range(self.iterations):
+            self.request(client, 'manager dashboard', 'get', '/dashboard/')
+            self.request(client, 'rota events', 'get', f'/api/rota-events/?carehome={rand.choice(carehome_ids)}')
+            self.request(client, 'missed logs', 'get', '/missed-logs/')
+            self.request(client, 'incident list', 'get', '/incident-reports/')
+        connection.close()
+
+    # ------------------------------------------------------------------
+    def run(self):
+        staff_emails = list(
+            CustomUser.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}', role=CustomUser.STAFF)
+            .order_by('pk').values_list('email', flat=True)
+        )
+        if not staff_emails:
+            raise RuntimeError("No synthetic staff accounts found - run generate_synthetic_data first")
+        chosen = self.random.sample(staff_emails, min(self.users, len(staff_emails)))
+        carehome_ids = sorted({
+            carehome_id for carehome_id in CustomUser.objects.filter(email__in=chosen)
+            .values_list('carehome_id', flat=True) if carehome_id
+        })
+
+        jobs = [(self.staff_flow, (email, self.random.random())) for email in chosen]
+        manager = f'manager@{EMAIL_DOMAIN}'
+        if CustomUser.objects.filter(email=manager).exists() and carehome_ids:
+            jobs.append((self.manager_flow, (manager, carehome_ids, self.random.random())))
+        connection.close()  # worker threads open their own connections
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for future in [pool.submit(flow, *args) for flow, args in jobs]:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        total = sum(len(stats.seconds) for stats in self.stats.values())
+        return {
+            'seconds': round(elapsed, 2),
+            'requests': total,
+            'throughput': round(total / elapsed, 1) if elapsed else 0,
+            'steps': {step: stats.summary() for step, stats in self.stats.items()},
+        }
+
+
+def format_report(report):
+    lines = [
+        f"{report['requests']} requests in {report['seconds']}s ({report['throughput']} req/s)",
+        "",
+        f"{'step':<20}{'reqs':>6}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q avg':>8}{'q max':>7}",
+    ]
+    for step, row in report['steps'].items():
+        lines.append(
+            f"{step:<20}{row['requests']:>6}{row['errors']:>6}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+            f"{row['p99_ms']:>10}{row['queries_avg']:>8}{row['queries_max']:>7}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+"""
+Logging plumbing used by settings.LOGGING.
+
+Request threads only put records on an in-memory queue (QueuedHandler); a
+QueueListener thread formats them as JSON lines and does the actual I/O.
+SamplingFilter drops a share of low-level records per logger before they are
+even queued, so chatty loggers (e.g. django.db.backends at DEBUG) can stay on.
+"""
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, source, extra fields, exception"""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'source': f"{record.module}:{record.lineno}",
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps ``rate`` of the records below WARNING for each configured logger
+    (and its children; the longest matching name wins). Warnings and errors
+    always pass.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = {name: float(rate) for name, rate in (rates or {}).items()}
+        self._cache = {}
+
+    def rate_for(self, name):
+        if name not in self._cache:
+            rate = 1.0
+            for prefix in sorted(self.rates, key=len):
+                if name == prefix or name.startswith(prefix + '.'):
+                    rate = self.rates[prefix]
+            self._cache[name] = rate
+        return self._cache[name]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Enqueues records for a background QueueListener that writes them to stdout
+    (or ``filename``) as JSON. The listener is started on creation; close()
+    (called by logging.shutdown at exit) drains the queue and stops it.
+    """
+
+    def __init__(self, filename=None):
+        super().__init__(queue.SimpleQueue())
+        if filename:
+            target = logging.FileHandler(filename, encoding='utf-8')
+        else:
+            target = logging.StreamHandler(sys.stdout)
+        target.setFormatter(JSONFormatter())
+        self.target = target
+        self.listener = QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Resolve the message and traceback now (the args/frames may change or
+        # go away), but leave the JSON formatting to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+        super().close()
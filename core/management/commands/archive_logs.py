@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archive import archivable_logs, archive_old_logs
+
+
+class Command(BaseCommand):
+    help = 'Moves locked shift logs older than the retention window into compressed archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.LOG_ARCHIVE_AFTER_DAYS,
+                            help='Archive locked shifts older than this many days')
+        parser.add_argument('--batch-size', type=int, default=200, help='Shifts read per query')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many shifts qualify')
+
+    def handle(self, *args, **options):
+        days = options['days']
+
+        if options['dry_run']:
+            count = archivable_logs(days).count()
+            self.stdout.write(f"{count} locked shifts older than {days} days would be archived")
+            return
+
+        self.stdout.write(f"Archiving locked shifts older than {days} days")
+        shifts, entries = archive_old_logs(
+            days=days,
+            batch_size=options['batch_size'],
+            progress=lambda done, moved: self.stdout.write(f"  {done} shifts, {moved} entries"),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {entries} entries from {shifts} shifts"))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.autolock import auto_lock
+
+
+class Command(BaseCommand):
+    help = 'Locks shift logs left incomplete after their shift ended and renders their PDFs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Render processes (default: one per CPU)')
+        parser.add_argument('--grace-minutes', type=int, default=settings.AUTO_LOCK_GRACE_MINUTES,
+                            help='How long after a shift ends its log stays open')
+        parser.add_argument('--lookback-days', type=int, default=settings.AUTO_LOCK_LOOKBACK_DAYS,
+                            help='Oldest log date to consider (raise it once to catch up on old logs)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be locked and rendered')
+
+    def handle(self, *args, **options):
+        totals = auto_lock(
+            grace_minutes=options['grace_minutes'],
+            lookback_days=options['lookback_days'],
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+            progress=lambda totals: self.stdout.write(f"  {totals['rendered']} PDFs rendered"),
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"Would lock {totals['locked']} logs and render {totals['to_render']} PDFs")
+            return
+        for latest_log_id, error in totals['errors']:
+            self.stderr.write(f"  log {latest_log_id}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Locked {totals['locked']} logs; rendered {totals['rendered']} of {totals['to_render']} PDFs, "
+            f"{len(totals['errors'])} failed (retried on the next run)"
+        ))
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.mediagc import collect, purge_quarantine
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = 'Quarantines (or deletes) media files no longer referenced by any FileField/ImageField'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Delete orphans instead of quarantining them')
+        parser.add_argument('--min-age-hours', type=float, default=settings.MEDIA_GC_MIN_AGE_HOURS,
+                            help='Only collect files last modified at least this long ago')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Report orphans without touching them')
+
+    def handle(self, *args, **options):
+        quarantine = not options['delete']
+        totals = collect(
+            settings.MEDIA_ROOT,
+            min_age_hours=options['min_age_hours'],
+            quarantine=quarantine,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            progress=lambda totals: self.stdout.write(
+                f"  {totals['scanned']} scanned, {totals['orphans']} orphaned"
+            ),
+        )
+
+        for name, error in totals['errors']:
+            self.stderr.write(f"  {name}: {error}")
+        if options['dry_run']:
+            verb = 'Would collect'
+        else:
+            verb = 'Quarantined' if quarantine else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['orphans']} orphaned files ({_mb(totals['bytes'])}) of {totals['scanned']} scanned; "
+            f"{totals['kept']} referenced since the scan started, {len(totals['errors'])} failed"
+        ))
+
+        if not options['dry_run']:
+            purged = purge_quarantine(settings.MEDIA_ROOT, settings.MEDIA_GC_QUARANTINE_DAYS)
+            if purged:
+                self.stdout.write(f"Purged {purged} quarantine days older than {settings.MEDIA_GC_QUARANTINE_DAYS} days")
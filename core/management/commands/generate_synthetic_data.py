@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import EMAIL_DOMAIN, SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generates care homes, staff, residents and shift history for load testing (use a scratch database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--carehomes', type=int, default=200)
+        parser.add_argument('--residents-per-home', type=int, default=10)
+        parser.add_argument('--staff-per-home', type=int, default=8, help='Care staff per home, plus one team lead')
+        parser.add_argument('--days', type=int, default=90, help='Days of log/rota history, e.g. 730 for two years')
+        parser.add_argument('--coverage', type=float, default=0.9,
+                            help='Share of shifts that get a log; the rest become missed logs')
+        parser.add_argument('--incidents-per-resident-month', type=float, default=0.5)
+        parser.add_argument('--abc-forms-per-resident-month', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT')
+        parser.add_argument('--allow-non-debug', action='store_true',
+                            help='Run even though DEBUG is off (make sure DATABASE_URL is a scratch database)')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_non_debug']:
+            raise CommandError(
+                "DEBUG is off, so this may be a production database. "
+                "Pass --allow-non-debug if it really is a scratch one."
+            )
+        generator = SyntheticDataGenerator(
+            carehomes=options['carehomes'],
+            residents_per_home=options['residents_per_home'],
+            staff_per_home=options['staff_per_home'],
+            days=options['days'],
+            coverage=options['coverage'],
+            incidents_per_resident_month=options['incidents_per_resident_month'],
+            abc_forms_per_resident_month=options['abc_forms_per_resident_month'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=lambda message: self.stdout.write(f"  {message}"),
+        )
+        counts = generator.run()
+
+        for model, count in counts.items():
+            self.stdout.write(f"{model}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Accounts created by this run are *@{EMAIL_DOMAIN} with password '{generator.password}'. "
+            f"Run rebuild_search_index and rebuild_behaviour_counts if those features are under test."
+        ))
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import LoadTest, format_report
+
+
+class Command(BaseCommand):
+    help = 'Replays login, log form, save slot, lock, dashboard and rota flows and reports p50/p95/p99 and queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--password', required=True,
+                            help='Password generate_synthetic_data printed for the accounts')
+        parser.add_argument('--users', type=int, default=10, help='Synthetic staff accounts to drive')
+        parser.add_argument('--iterations', type=int, default=5, help='Flow repetitions per account')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Worker threads; keep at 1 on SQLite to avoid lock errors')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        load_test = LoadTest(
+            password=options['password'],
+            users=options['users'],
+            iterations=options['iterations'],
+            concurrency=options['concurrency'],
+            seed=options['seed'],
+        )
+        try:
+            report = load_test.run()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(report, indent=2) if options['json'] else format_report(report))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.pdf_optimise import STORED_PDF_DIRS, optimise_stored_pdfs, stored_pdfs
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = 'Re-optimises stored log, incident and ABC PDFs in place and reports the space reclaimed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dirs', nargs='+', default=list(STORED_PDF_DIRS),
+                            help='Directories under MEDIA_ROOT to process')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+        parser.add_argument('--max-image-px', type=int, default=settings.PDF_MAX_IMAGE_PX)
+        parser.add_argument('--jpeg-quality', type=int, default=settings.PDF_JPEG_QUALITY)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without writing')
+
+    def handle(self, *args, **options):
+        paths = list(stored_pdfs(settings.MEDIA_ROOT, options['dirs']))
+        self.stdout.write(f"Optimising {len(paths)} PDFs in {', '.join(options['dirs'])}")
+
+        totals = optimise_stored_pdfs(
+            paths,
+            workers=options['workers'],
+            max_image_px=options['max_image_px'],
+            jpeg_quality=options['jpeg_quality'],
+            dry_run=options['dry_run'],
+            progress=lambda totals: self.stdout.write(
+                f"  {totals['files']} files, {_mb(totals['before'] - totals['after'])} reclaimed"
+            ),
+        )
+
+        for path, error in totals['errors']:
+            self.stderr.write(f"  {path}: {error}")
+        reclaimed = totals['before'] - totals['after']
+        verb = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {_mb(reclaimed)} ({_mb(totals['before'])} -> {_mb(totals['after'])}) "
+            f"by rewriting {totals['rewritten']} of {totals['files']} files; {len(totals['errors'])} failed"
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Runs queued side effects (log PDFs, missed-log resolution, notifications) from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process everything due now, then exit')
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages claimed per round')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when nothing is due')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                processed, failed = process_outbox(batch_size=options['batch_size'])
+                if processed or failed:
+                    self.stdout.write(f"processed {processed}, failed {failed}")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
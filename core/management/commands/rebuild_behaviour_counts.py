@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.analytics import rebuild_behaviour_counts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily ABC behaviour rollups from the ABC form history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='ABC forms read per query')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--since must be in YYYY-MM-DD format")
+
+        self.stdout.write(f"Rebuilding behaviour counts{f' since {since}' if since else ''}")
+
+        processed, rows = rebuild_behaviour_counts(
+            since=since,
+            chunk_size=options['chunk_size'],
+            progress=lambda done: self.stdout.write(f"  processed {done} forms"),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily counts from {processed} ABC forms"))
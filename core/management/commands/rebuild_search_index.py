@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Re-indexes log entries, incident reports and ABC forms for full-text search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows read per query')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding search index")
+
+        total = rebuild_index(
+            chunk_size=options['chunk_size'],
+            progress=lambda kind, done: self.stdout.write(f"  {kind}: {done} rows"),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} rows"))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.models import ScheduledJob
+from core.scheduler import JOBS, instance_name, run_due, run_job, seconds_until_due, sync_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs the periodic jobs in core/scheduler.py when they are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run whatever is due now, then exit')
+        parser.add_argument('--run', metavar='JOB', help='Run this job now, whatever its schedule')
+        parser.add_argument('--list', action='store_true', help='Show the jobs and their last runs')
+
+    def handle(self, *args, **options):
+        owner = instance_name()
+        sync_jobs(timezone.now())
+
+        if options['list']:
+            for row in ScheduledJob.objects.filter(name__in=JOBS):
+                last = 'never run'
+                if row.last_started_at:
+                    outcome = 'ok' if row.last_succeeded else f'failed: {row.last_error}'
+                    last = f"last {row.last_started_at:%Y-%m-%d %H:%M} ({row.last_duration:.1f}s, {outcome})"
+                self.stdout.write(f"{row.name:<20}{row.schedule:<16}next {row.next_run_at:%Y-%m-%d %H:%M}  {last}")
+            return
+
+        if options['run']:
+            if options['run'] not in JOBS:
+                raise CommandError(f"Unknown job {options['run']!r}; known: {', '.join(JOBS)}")
+            run = run_job(JOBS[options['run']], owner, force=True)
+            if run is None:
+                raise CommandError(f"{options['run']} is running on another instance")
+            self.report(run)
+            return
+
+        self.stdout.write(f"Scheduler {owner} running {len(JOBS)} jobs")
+        try:
+            while True:
+                close_old_connections()
+                for run in run_due(owner):
+                    self.report(run)
+                if options['once']:
+                    break
+                time.sleep(seconds_until_due())
+        except KeyboardInterrupt:
+            pass
+
+    def report(self, run):
+        if run.succeeded:
+            self.stdout.write(f"{run.job.name} ran in {run.duration:.1f}s")
+        else:
+            self.stderr.write(f"{run.job.name} failed after {run.duration:.1f}s: {run.error}")
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.warehouse import sync
+
+
+class Command(BaseCommand):
+    help = 'Loads rows changed since the last run into the analytics warehouse (ANALYTICS_DB_PATH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Reload every fact instead of only changed rows')
+        parser.add_argument('--path', default=None, help='Warehouse file to write instead of ANALYTICS_DB_PATH')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.ANALYTICS_DB_PATH
+        self.stdout.write(f"{'Rebuilding' if options['full'] else 'Updating'} {path}")
+        totals = sync(
+            path=path,
+            full=options['full'],
+            progress=lambda table, counts: self.stdout.write(
+                f"  {table}: {counts['loaded']} loaded, {counts['deleted']} deleted"
+            ),
+        )
+        loaded = sum(counts['loaded'] for counts in totals.values())
+        deleted = sum(counts['deleted'] for counts in totals.values())
+        self.stdout.write(self.style.SUCCESS(f"Warehouse synced: {loaded} rows loaded, {deleted} removed"))
@@ -0,0 +1,159 @@
+"""
+Garbage collection of orphaned media files.
+
+Requests never delete replaced or removed uploads and PDFs themselves (a new
+log PDF, an edited ABC form, a changed profile picture, a deleted care home
+all leave the old file behind). `manage.py gc_media` collects them later:
+
+1. index every name stored in any FileField/ImageField of any model,
+2. walk MEDIA_ROOT, one directory at a time,
+3. take each file that isn't in the index and is older than the grace period,
+4. re-check each batch against the database, then quarantine or delete it.
+
+The grace period keeps files that were written just before their row was
+saved (generate_pdf renders first, saves the name after) or that are still
+being uploaded. Quarantined files go to .quarantine/<date>/ under MEDIA_ROOT,
+keeping their path, and are deleted for good after MEDIA_GC_QUARANTINE_DAYS.
+bundles/ is left alone: core.bundles names and expires those files itself.
+"""
+import logging
+import os
+import shutil
+import time
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.db import models
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_DIR = '.quarantine'
+SKIP_DIRS = {QUARANTINE_DIR, 'bundles'}
+
+
+def file_fields():
+    """(model, field name) for every concrete FileField (ImageField included)"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+def _stored_names(queryset, name):
+    return queryset.exclude(**{name: ''}).exclude(**{f'{name}__isnull': True}).values_list(name, flat=True)
+
+
+def referenced_files():
+    """Every media name that a row still points at"""
+    referenced = set()
+    for model, name in file_fields():
+        referenced.update(_stored_names(model._default_manager.all(), name).iterator(chunk_size=2000))
+    return referenced
+
+
+def still_referenced(names):
+    """Which of ``names`` are referenced now (one query per file field)"""
+    found = set()
+    for model, name in file_fields():
+        found.update(_stored_names(model._default_manager.filter(**{f'{name}__in': names}), name))
+    return found
+
+
+def walk_media(root, skip=SKIP_DIRS):
+    """Yield (storage name, os.DirEntry) for each file under ``root``, without listing it all first"""
+    pending = ['']
+    while pending:
+        relative = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, relative))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{relative}/{entry.name}' if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in skip:
+                        pending.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry
+
+
+def _quarantine(root, name, today):
+    target = os.path.join(root, QUARANTINE_DIR, today.strftime('%Y%m%d'), name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(os.path.join(root, name), target)
+
+
+def _remove(root, name, today):
+    os.remove(os.path.join(root, name))
+
+
+def purge_quarantine(root, keep_days, today=None):
+    """Delete quarantine days older than ``keep_days``; returns how many were removed"""
+    today = today or date.today()
+    quarantine = os.path.join(root, QUARANTINE_DIR)
+    if not os.path.isdir(quarantine):
+        return 0
+    cutoff = (today - timedelta(days=keep_days)).strftime('%Y%m%d')
+    purged = 0
+    for day in sorted(os.listdir(quarantine)):
+        if day.isdigit() and day < cutoff:
+            shutil.rmtree(os.path.join(quarantine, day), ignore_errors=True)
+            purged += 1
+    return purged
+
+
+def collect(root, min_age_hours=24, quarantine=True, batch_size=500, dry_run=False, progress=None):
+    """
+    Quarantine (or delete) unreferenced files under ``root``.
+    Returns {'scanned', 'orphans', 'bytes', 'removed', 'kept', 'errors': [(name, error)]}.
+    """
+    totals = {'scanned': 0, 'orphans': 0, 'bytes': 0, 'removed': 0, 'kept': 0, 'errors': []}
+    referenced = referenced_files()
+    cutoff = time.time() - min_age_hours * 3600
+    today = date.today()
+    dispose = _quarantine if quarantine else _remove
+
+    def flush(batch):
+        # Anything saved since the index was built is spared
+        rescued = still_referenced([name for name, _ in batch])
+        totals['kept'] += len(rescued)
+        for name, size in batch:
+            if name in rescued:
+                continue
+            totals['orphans'] += 1
+            totals['bytes'] += size
+            if dry_run:
+                continue
+            try:
+                dispose(root, name, today)
+                totals['removed'] += 1
+            except OSError as exc:
+                totals['errors'].append((name, str(exc)))
+        if progress:
+            progress(totals)
+
+    batch = []
+    for name, entry in walk_media(root):
+        totals['scanned'] += 1
+        if name in referenced:
+            continue
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime > cutoff:
+            continue
+        batch.append((name, stat.st_size))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    logger.info(
+        "Media GC: %d files scanned, %d orphaned (%d bytes), %d %s",
+        totals['scanned'], totals['orphans'], totals['bytes'], totals['removed'],
+        'quarantined' if quarantine else 'deleted'
+    )
+    return totals
@@ -0,0 +1,139 @@
+"""
+Prometheus metrics.
+
+django_prometheus already records request counts and per-view latency
+histograms; the app-specific metrics live here. Under gunicorn every worker
+writes its samples to PROMETHEUS_MULTIPROC_DIR (set up in gunicorn.conf.py) and
+/metrics adds them up, so a scrape sees the whole server rather than one worker.
+"""
+import hmac
+import os
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+PDF_RENDER_SECONDS = Histogram(
+    'carehome_pdf_render_seconds', 'Time spent rendering a PDF', ['engine'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+PDF_SIZE_BYTES = Histogram(
+    'carehome_pdf_size_bytes', 'Size of rendered PDFs', ['engine'],
+    buckets=(10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000, 20_000_000),
+)
+MISSED_LOG_CHECK_SECONDS = Histogram(
+    'carehome_missed_log_check_seconds', 'Time taken by CareHome.check_missed_logs for one home',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LAST_ACTIVE_WRITES = Counter(
+    'carehome_last_active_writes', 'last_active UPDATEs issued by UpdateLastActiveMiddleware',
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'carehome_db_queries_per_request', 'Database queries run while handling one request', ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+
+# ---------------------------------------------------------------------------
+# Recording helpers
+# ---------------------------------------------------------------------------
+
+def record_pdf(engine, seconds, size=None):
+    PDF_RENDER_SECONDS.labels(engine).observe(seconds)
+    if size is not None:
+        PDF_SIZE_BYTES.labels(engine).observe(size)
+
+
+# ---------------------------------------------------------------------------
+# Queries per request
+# ---------------------------------------------------------------------------
+
+# A one-item list rather than an int: sync_to_async runs the ORM in a copy of
+# the request's context, so the count has to be mutated in place to be seen here
+_query_count = ContextVar('query_count', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+connection_created.connect(_install_counter, dispatch_uid='core.metrics.count_queries')
+
+
+class QueryCountMiddleware:
+    """Observes DB_QUERIES_PER_REQUEST, labelled with the URL name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _query_count.set([0])
+        try:
+            return self.get_response(request)
+        finally:
+            self.observe(request, token)
+
+    async def __acall__(self, request):
+        token = _query_count.set([0])
+        try:
+            return await self.get_response(request)
+        finally:
+            self.observe(request, token)
+
+    @staticmethod
+    def observe(request, token):
+        count = _query_count.get()[0]
+        _query_count.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else '') or '<unresolved>'
+        DB_QUERIES_PER_REQUEST.labels(view).observe(count)
+
+
+# ---------------------------------------------------------------------------
+# /metrics
+# ---------------------------------------------------------------------------
+
+def _authorised(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.headers.get('Authorization', '')
+        if hmac.compare_digest(header.encode(), f"Bearer {token}".encode()):
+            return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_superuser:
+        return True
+    # Open locally when no token is configured
+    return settings.DEBUG and not token
+
+
+def metrics_view(request):
+    """Prometheus exposition. Needs the METRICS_TOKEN bearer token (or a superuser session)."""
+    if not _authorised(request):
+        return HttpResponse("Forbidden", status=403, content_type='text/plain')
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -1,15 +1,36 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.utils import timezone
+from .metrics import LAST_ACTIVE_WRITES
 from .models import CustomUser
 
 
 class UpdateLastActiveMiddleware:
+    # Runs natively under ASGI so async views don't get pushed back onto a thread
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
         response = self.get_response(request)
+        self.touch(request)
+        return response
 
-        if request.user.is_authenticated and isinstance(request.user, CustomUser):
-            CustomUser.objects.filter(pk=request.user.pk).update(last_active=timezone.now())
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        await sync_to_async(self.touch)(request)
+        return response
 
-        return response
\ No newline at end of file
+    @staticmethod
+    def touch(request):
+        if request.user.is_authenticated and isinstance(request.user, CustomUser):
+            # Straight to the primary: bookkeeping shouldn't pin the user's reads to it (core/routers.py)
+            CustomUser.objects.using('default').filter(pk=request.user.pk).update(last_active=timezone.now())
+            LAST_ACTIVE_WRITES.inc()
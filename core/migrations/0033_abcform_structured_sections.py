@@ -0,0 +1,68 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_alter_logentry_options_remove_customuser_date_joined_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abcform',
+            name='antecedent_change',
+            field=models.CharField(choices=[('yes', 'Yes'), ('no', 'No')], default='no', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='antecedent_description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='antecedent_noise',
+            field=models.CharField(choices=[('yes', 'Yes'), ('no', 'No')], default='no', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='antecedent_waiting',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='behaviour_description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='consequence_immediate',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='reflection_learnings',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='setting_activity',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='setting_environment',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='setting_location',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='abcform',
+            name='setting_present',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+# Section text column -> {label written by the old form: structured field}
+SECTION_FIELDS = {
+    'setting': {
+        'Location': 'setting_location',
+        'Present': 'setting_present',
+        'Activity': 'setting_activity',
+        'Environment': 'setting_environment',
+    },
+    'antecedent': {
+        'Description': 'antecedent_description',
+        'Routine change': 'antecedent_change',
+        'Unexpected noise': 'antecedent_noise',
+        'Waiting for': 'antecedent_waiting',
+    },
+    'behaviour': {'Description': 'behaviour_description'},
+    'consequences': {'Immediate': 'consequence_immediate'},
+    'reflection': {'Learnings': 'reflection_learnings'},
+}
+
+STRUCTURED_FIELDS = [field for labels in SECTION_FIELDS.values() for field in labels.values()]
+
+
+def parse_section(text, labels):
+    """
+    Split "Key: value" text into a dict keyed by structured field name.
+    Lines without a known label belong to the previous value (multi-line textareas).
+    """
+    values = {}
+    current = None
+    for line in (text or '').split('\n'):
+        label, sep, rest = line.partition(':')
+        if sep and label.strip() in labels:
+            current = labels[label.strip()]
+            values[current] = rest.strip()
+        elif current:
+            values[current] = f"{values[current]}\n{line}".strip()
+    return values
+
+
+def populate_structured_sections(apps, schema_editor):
+    ABCForm = apps.get_model('core', 'ABCForm')
+
+    last_pk = 0
+    while True:
+        batch = list(ABCForm.objects.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            break
+
+        for form in batch:
+            for column, labels in SECTION_FIELDS.items():
+                for field, value in parse_section(getattr(form, column), labels).items():
+                    setattr(form, field, value)
+            for field in ('antecedent_change', 'antecedent_noise'):
+                value = getattr(form, field).lower()
+                setattr(form, field, value if value in ('yes', 'no') else 'no')
+
+        ABCForm.objects.bulk_update(batch, STRUCTURED_FIELDS)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_abcform_structured_sections'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_structured_sections, migrations.RunPython.noop),
+    ]
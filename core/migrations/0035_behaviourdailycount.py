@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_populate_abcform_structured_sections'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BehaviourDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('behaviour', models.CharField(choices=[('physical_aggression', 'Physical aggressive behaviour towards other people'), ('property_destruction', 'Property destruction e.g., ripping clothes'), ('self_injury', 'Self-injurious behaviours e.g., hitting the wall'), ('verbal_aggression', 'Verbal aggression'), ('other', 'Other / stereotyped behaviours e.g., screaming')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('carehome', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='behaviour_counts', to='core.carehome')),
+                ('service_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='behaviour_counts', to='core.serviceuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['carehome', 'date'], name='core_behavi_carehom_f8c767_idx')],
+                'unique_together': {('service_user', 'date', 'behaviour')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:53
+
+from django.conf import settings
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_behaviourdailycount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('log', 'Log Entry'), ('incident', 'Incident Report'), ('abc', 'ABC Form')], max_length=16)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('date', models.DateField(blank=True, null=True)),
+                ('title', models.CharField(max_length=255)),
+                ('url', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('carehome', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.carehome')),
+                ('service_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.serviceuser')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='search_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['carehome', 'date'], name='core_search_carehom_7db220_idx')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX core_searchdocument_search_vector_gin ON core_searchdocument USING gin (search_vector)",
+    """
+    CREATE TRIGGER core_searchdocument_search_vector_update
+    BEFORE INSERT OR UPDATE OF body ON core_searchdocument
+    FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.english', body)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_searchdocument_search_vector_update ON core_searchdocument",
+    "DROP INDEX IF EXISTS core_searchdocument_search_vector_gin",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE core_searchdocument_fts USING fts5(
+        body, content='core_searchdocument', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_fts_insert AFTER INSERT ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_fts_delete AFTER DELETE ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER core_searchdocument_fts_update AFTER UPDATE OF body ON core_searchdocument BEGIN
+        INSERT INTO core_searchdocument_fts(core_searchdocument_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO core_searchdocument_fts(rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS core_searchdocument_fts_update",
+    "DROP TRIGGER IF EXISTS core_searchdocument_fts_delete",
+    "DROP TRIGGER IF EXISTS core_searchdocument_fts_insert",
+    "DROP TABLE IF EXISTS core_searchdocument_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """Full-text index for SearchDocument: tsvector trigger + GIN on PostgreSQL, FTS5 on SQLite"""
+
+    dependencies = [
+        ('core', '0036_searchdocument'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}),
+        ),
+    ]
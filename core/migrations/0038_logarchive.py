@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-19 01:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_searchdocument_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='latestlogentry',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='LogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('latest_log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='core.latestlogentry')),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.27 on 2026-10-19 02:22
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_logarchive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notif_type',
+            field=models.CharField(choices=[('rota_submit', 'Rota Submitted'), ('rota_publish', 'Rota Published'), ('rota_reject', 'Rota Rejected'), ('rota_update', 'Rota Updated'), ('log_locked', 'Log Locked'), ('generic', 'Generic')], default='generic', max_length=32),
+        ),
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=64)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('available_at', 'id'),
+                'indexes': [models.Index(fields=['processed_at', 'available_at'], name='core_outbox_process_f1af66_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-19 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_scheduledjob_jobrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='abcform',
+            index=models.Index(fields=['service_user', 'date_time'], name='core_abcfor_service_3a238b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentreport',
+            index=models.Index(fields=['service_user', 'incident_datetime'], name='core_incide_service_478176_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='missedlog',
+            index=models.Index(fields=['service_user', 'date'], name='core_missed_service_36f13e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['service_user', 'date'], name='core_shift_service_b6122e_idx'),
+        ),
+    ]
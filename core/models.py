@@ -1,13 +1,12 @@
+import logging
 import os
 
 from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_save, post_delete
-from django.dispatch import receiver
-from django.template.loader import render_to_string
 from django.utils import timezone
 from datetime import timedelta
 
 from django.contrib.auth.base_user import AbstractBaseUser
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, Group, Permission, PermissionsMixin
 from django.core.validators import RegexValidator
@@ -16,9 +15,11 @@ from django.contrib.auth.base_user import BaseUserManager
 
 from django.db import models
 from django.utils.timezone import now
-from weasyprint import HTML
 
 from carehome_project import settings
+from .metrics import MISSED_LOG_CHECK_SECONDS
+
+logger = logging.getLogger(__name__)
 
 
 class CareHome(models.Model):
@@ -63,20 +64,7 @@ class CareHome(models.Model):
     def get_staff_members(self):
         return self.customuser_set.filter(role='staff')
 
-    def save(self, *args, **kwargs):
-        if self.pk:
-            try:
-                old = CareHome.objects.get(pk=self.pk)
-                if old.picture != self.picture:
-                    old.picture.delete(save=False)
-            except CareHome.DoesNotExist:
-                pass
-        super().save(*args, **kwargs)
-
-    def delete(self, *args, **kwargs):
-        self.picture.delete(save=False)
-        super().delete(*args, **kwargs)
-
+    @MISSED_LOG_CHECK_SECONDS.time()
     def check_missed_logs(self, date=None):
         """
         Check for service users who don't have shift logs for the given date
@@ -85,46 +73,34 @@ class CareHome(models.Model):
         if date is None:
             date = timezone.now().date()
 
-        missed_logs = []
+        # One query for the shifts already logged instead of two per service user
+        logged = set(
+            LatestLogEntry.objects.filter(carehome=self, date=date, shift__in=['morning', 'night'])
+            .values_list('service_user_id', 'shift')
+        )
 
+        missed_logs = []
         for service_user in self.service_users.all():
-            # Check morning shift
-            if not LatestLogEntry.objects.filter(
-                    carehome=self,
-                    service_user=service_user,
-                    date=date,
-                    shift='morning'
-            ).exists():
-                missed_logs.append(
-                    MissedLog(
-                        carehome=self,
-                        service_user=service_user,
-                        date=date,
-                        shift='morning'
-                    )
-                )
-
-            # Check night shift (not afternoon!)
-            if not LatestLogEntry.objects.filter(
-                    carehome=self,
-                    service_user=service_user,
-                    date=date,
-                    shift='night'
-            ).exists():
-                missed_logs.append(
-                    MissedLog(
-                        carehome=self,
-                        service_user=service_user,
-                        date=date,
-                        shift='night'
+            # Only morning and night shifts (not afternoon!)
+            for shift in ('morning', 'night'):
+                if (service_user.pk, shift) not in logged:
+                    missed_logs.append(
+                        MissedLog(
+                            carehome=self,
+                            service_user=service_user,
+                            date=date,
+                            shift=shift
+                        )
                     )
-                )
 
         # Bulk create missed logs, ignoring duplicates
         MissedLog.objects.bulk_create(
             missed_logs,
             ignore_conflicts=True
         )
+        if missed_logs:
+            from .compliance import invalidate_day
+            transaction.on_commit(lambda: invalidate_day(self.pk, date))
 
         return MissedLog.objects.filter(
             carehome=self,
@@ -232,6 +208,25 @@ class ABCForm(models.Model):
         help_text="List of selected target behaviours"
     )
 
+    YES_NO_CHOICES = [
+        ('yes', 'Yes'),
+        ('no', 'No'),
+    ]
+
+    # Structured sections - these are the source of truth and can be queried directly
+    setting_location = models.TextField(blank=True)
+    setting_present = models.TextField(blank=True)
+    setting_activity = models.TextField(blank=True)
+    setting_environment = models.TextField(blank=True)
+    antecedent_description = models.TextField(blank=True)
+    antecedent_change = models.CharField(max_length=3, choices=YES_NO_CHOICES, default='no')
+    antecedent_noise = models.CharField(max_length=3, choices=YES_NO_CHOICES, default='no')
+    antecedent_waiting = models.TextField(blank=True)
+    behaviour_description = models.TextField(blank=True)
+    consequence_immediate = models.TextField(blank=True)
+    reflection_learnings = models.TextField(blank=True)
+
+    # Display text for the detail page and PDF, rebuilt from the structured fields on save
     setting = models.TextField(blank=True)
     antecedent = models.TextField(blank=True)
     behaviour = models.TextField(blank=True)
@@ -250,9 +245,54 @@ class ABCForm(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['service_user', 'date_time']),
+        ]
+
     def __str__(self):
         return f"ABC Form - {self.service_user} ({self.date_time.date()})"
 
+    def save(self, *args, **kwargs):
+        self.build_section_text()
+        super().save(*args, **kwargs)
+
+    def build_section_text(self):
+        """Render the structured fields into the "Key: value" display text"""
+        self.setting = "\n".join([
+            f"Location: {self.setting_location}",
+            f"Present: {self.setting_present}",
+            f"Activity: {self.setting_activity}",
+            f"Environment: {self.setting_environment}"
+        ])
+        self.antecedent = "\n".join([
+            f"Description: {self.antecedent_description}",
+            f"Routine change: {self.antecedent_change}",
+            f"Unexpected noise: {self.antecedent_noise}",
+            f"Waiting for: {self.antecedent_waiting}"
+        ])
+        self.behaviour = f"Description: {self.behaviour_description}"
+        self.consequences = f"Immediate: {self.consequence_immediate}"
+        self.reflection = f"Learnings: {self.reflection_learnings}"
+
+
+class BehaviourDailyCount(models.Model):
+    """Pre-aggregated ABC target behaviour counts per service user per day (see core.analytics)"""
+    carehome = models.ForeignKey('CareHome', on_delete=models.CASCADE, related_name='behaviour_counts')
+    service_user = models.ForeignKey(ServiceUser, on_delete=models.CASCADE, related_name='behaviour_counts')
+    date = models.DateField()
+    behaviour = models.CharField(max_length=50, choices=ABCForm.TARGET_BEHAVIOUR_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['service_user', 'date', 'behaviour']
+        indexes = [
+            models.Index(fields=['carehome', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.service_user} - {self.behaviour} ({self.count})"
+
 
 class IncidentReport(models.Model):
     staff = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
@@ -296,6 +336,9 @@ class IncidentReport(models.Model):
     pdf_file = models.FileField(upload_to='incident_reports/', blank=True, null=True)
 
     # created_at = models.DateTimeField(auto_now_add=True)
+    # Change watermark for the analytics warehouse (core/warehouse.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def get_images(self):
         """Return a list of non-empty images"""
         images = []
@@ -307,6 +350,11 @@ class IncidentReport(models.Model):
             images.append(self.image3)
         return images
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['service_user', 'incident_datetime']),
+        ]
+
     def __str__(self):
         return f"Incident - {self.service_user} - {self.incident_datetime.strftime('%Y-%m-%d %H:%M')}"
 
@@ -406,25 +454,6 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
             return CareHome.objects.all()
         return CareHome.objects.none()
 
-    @receiver(pre_save, sender=CustomUser)
-    def delete_old_image(sender, instance, **kwargs):
-        if instance.pk:
-            try:
-                old_instance = CustomUser.objects.get(pk=instance.pk)
-                if old_instance.image and old_instance.image != instance.image:
-                    # Delete the old file if it exists
-                    if os.path.isfile(old_instance.image.path):
-                        os.remove(old_instance.image.path)
-            except CustomUser.DoesNotExist:
-                pass
-
-    # Signal to delete image file when user is deleted
-    @receiver(post_delete, sender=CustomUser)
-    def delete_user_image(sender, instance, **kwargs):
-        if instance.image:
-            if os.path.isfile(instance.image.path):
-                os.remove(instance.image.path)
-
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
@@ -525,6 +554,8 @@ class LatestLogEntry(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set once the hourly LogEntry rows have been moved into a LogArchive
+    archived_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.date} - {self.service_user} - {self.get_shift_display()} ({self.status})"
@@ -582,9 +613,6 @@ class LatestLogEntry(models.Model):
                 'log_entries': log_entries,
             }
 
-            # Render HTML template
-            html_string = render_to_string('pdf_templates/log_pdf.html', context)
-
             # Ensure PDF directory exists
             pdf_dir = os.path.join(settings.MEDIA_ROOT, 'log_pdfs')
             os.makedirs(pdf_dir, exist_ok=True)
@@ -595,22 +623,16 @@ class LatestLogEntry(models.Model):
             pdf_path = os.path.join(pdf_dir, pdf_filename)
 
             # Generate PDF
-            HTML(string=html_string).write_pdf(pdf_path)
-
-            # Delete old PDF if exists
-            if self.log_pdf:
-                try:
-                    os.remove(self.log_pdf.path)
-                except (ValueError, OSError):
-                    pass
+            from .rendering import render_pdf
+            render_pdf('pdf_templates/log_pdf.html', context, pdf_path, engine=settings.LOG_PDF_ENGINE)
 
-            # Save new PDF reference
+            # Save new PDF reference (the old file is left for `manage.py gc_media`)
             self.log_pdf.name = f'log_pdfs/{pdf_filename}'
             self.save()
 
             return True
-        except Exception as e:
-            print(f"Error generating PDF for log {self.id}: {str(e)}")
+        except Exception:
+            logger.exception("Error generating PDF for log %s", self.id)
             return False
 
     @property
@@ -652,6 +674,17 @@ class LatestLogEntry(models.Model):
         ]
 
 
+class LogArchive(models.Model):
+    """Compressed JSON copy of a locked shift's LogEntry rows (see core.archive)"""
+    latest_log = models.OneToOneField(LatestLogEntry, on_delete=models.CASCADE, related_name='archive')
+    entry_count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archive of {self.latest_log} ({self.entry_count} entries)"
+
+
 class MissedLog(models.Model):
     SHIFT_CHOICES = [
         ('morning', 'Morning'),
@@ -672,6 +705,51 @@ class MissedLog(models.Model):
     class Meta:
         verbose_name = "Missed Shift"
         verbose_name_plural = "Missed Shifts"
+        indexes = [
+            models.Index(fields=['service_user', 'date']),
+        ]
+
+
+class SearchDocument(models.Model):
+    """
+    Flattened text of a log entry, incident report or ABC form for full-text search.
+    Kept in step by signals (core.search); the database keeps the FTS index current
+    (tsvector trigger + GIN index on PostgreSQL, FTS5 table on SQLite).
+    """
+    KIND_LOG = 'log'
+    KIND_INCIDENT = 'incident'
+    KIND_ABC = 'abc'
+    KIND_CHOICES = [
+        (KIND_LOG, 'Log Entry'),
+        (KIND_INCIDENT, 'Incident Report'),
+        (KIND_ABC, 'ABC Form'),
+    ]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    carehome = models.ForeignKey('CareHome', on_delete=models.CASCADE, null=True, blank=True)
+    service_user = models.ForeignKey('ServiceUser', on_delete=models.CASCADE, null=True, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='search_documents'
+    )
+    date = models.DateField(null=True, blank=True)
+    title = models.CharField(max_length=255)
+    url = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)  # PostgreSQL only
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        indexes = [
+            models.Index(fields=['carehome', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}"
 
 
 User = settings.AUTH_USER_MODEL
@@ -683,6 +761,7 @@ class Notification(models.Model):
         ('rota_publish', 'Rota Published'),
         ('rota_reject', 'Rota Rejected'),
         ('rota_update', 'Rota Updated'),
+        ('log_locked', 'Log Locked'),
         ('generic', 'Generic'),
     ]
 
@@ -859,6 +938,9 @@ class Shift(models.Model):
     class Meta:
         unique_together = ('rota', 'date', 'shift_type', 'service_user')
         ordering = ('date', 'shift_type')
+        indexes = [
+            models.Index(fields=['service_user', 'date']),
+        ]
 
     def __str__(self):
         return f"{self.rota.carehome.name} {self.date} {self.get_shift_type_display()}"
@@ -916,3 +998,68 @@ class RotaApproval(models.Model):
         return f"{self.rota} - {self.action} by {self.by_user}"
 
 
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect recorded in the same transaction as the change that caused it,
+    carried out after commit by the outbox worker (core.outbox, manage.py process_outbox).
+    """
+    topic = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not picked up before this time: retry backoff, or the lease while a worker has it
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('available_at', 'id')
+        indexes = [
+            models.Index(fields=['processed_at', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
+
+
+class ScheduledJob(models.Model):
+    """
+    State of one periodic job run by the scheduler (core.scheduler, manage.py run_scheduler).
+    The lease columns stand in for PostgreSQL's advisory locks on other databases.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    schedule = models.CharField(max_length=100)
+    next_run_at = models.DateTimeField()
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)
+    last_succeeded = models.BooleanField(null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('name',)
+
+    def __str__(self):
+        return f"{self.name} ({self.schedule})"
+
+
+class JobRun(models.Model):
+    """One run of a ScheduledJob, kept for monitoring how long jobs take"""
+    job = models.ForeignKey(ScheduledJob, on_delete=models.CASCADE, related_name='runs')
+    started_at = models.DateTimeField()
+    duration = models.FloatField()
+    succeeded = models.BooleanField()
+    owner = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('-started_at',)
+        indexes = [
+            models.Index(fields=['job', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.job.name} at {self.started_at}"
@@ -0,0 +1,177 @@
+"""
+Transactional outbox.
+
+enqueue() adds an OutboxMessage inside the caller's transaction, so the side
+effect is recorded exactly when the change commits and never otherwise. The
+worker (manage.py process_outbox) claims due messages with a lease, runs the
+topic's handler and marks the message processed in the same transaction as the
+handler's own writes. A crashed worker's lease simply runs out and another
+worker picks the message up; a failing handler is retried with backoff until
+OUTBOX_MAX_ATTEMPTS. Handlers therefore have to be idempotent.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .archive import get_log_entries
+from .models import CustomUser, LatestLogEntry, MissedLog, Notification, OutboxMessage
+from .rendering import render_pdf
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(topic):
+    def register(func):
+        HANDLERS[topic] = func
+        return func
+    return register
+
+
+def enqueue(topic, coalesce=False, **payload):
+    """
+    Record a side effect in the current transaction. With coalesce=True nothing is
+    added if the same message is already waiting and no worker has claimed it yet.
+    """
+    if topic not in HANDLERS:
+        raise ValueError(f"No outbox handler for {topic!r}")
+    if coalesce:
+        waiting = OutboxMessage.objects.filter(
+            topic=topic, payload=payload, processed_at__isnull=True, available_at__lte=timezone.now()
+        ).first()
+        if waiting:
+            return waiting
+    message = OutboxMessage.objects.create(topic=topic, payload=payload)
+    if settings.OUTBOX_RUN_ON_COMMIT:
+        # No worker running (local dev): do it straight after commit instead
+        transaction.on_commit(lambda: process_message(message.pk))
+    return message
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+
+def claim(batch_size):
+    """Lease up to batch_size due messages to this worker. Returns their ids."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboxMessage.objects.filter(
+            processed_at__isnull=True,
+            available_at__lte=now,
+            attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+        ).order_by('available_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('pk', flat=True)[:batch_size])
+        OutboxMessage.objects.filter(pk__in=ids).update(
+            available_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        )
+    return ids
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(2 ** attempts * 5, 3600))
+
+
+def process_message(message_id):
+    """Run one message's handler. Returns True once it is processed."""
+    try:
+        with transaction.atomic():
+            message = OutboxMessage.objects.select_for_update().get(pk=message_id)
+            if message.processed_at:
+                return True
+            HANDLERS[message.topic](message.payload)
+            message.processed_at = timezone.now()
+            message.save(update_fields=['processed_at'])
+        return True
+    except Exception as exc:
+        logger.exception("Outbox message %s failed", message_id)
+        message = OutboxMessage.objects.filter(pk=message_id)
+        with transaction.atomic():
+            # Incremented in SQL so a worker whose lease expired mid-run can't lose a count
+            message.update(attempts=F('attempts') + 1, last_error=f"{type(exc).__name__}: {exc}")
+            attempts = message.values_list('attempts', flat=True).first() or 0
+            message.update(available_at=timezone.now() + retry_delay(attempts))
+        return False
+
+
+def process_outbox(batch_size=50):
+    """Process one batch. Returns (processed, failed)."""
+    processed = failed = 0
+    for message_id in claim(batch_size):
+        if process_message(message_id):
+            processed += 1
+        else:
+            failed += 1
+    return processed, failed
+
+
+# ---------------------------------------------------------------------------
+# Handlers for locking a shift log (core.views.logs.lock_log_entries)
+# ---------------------------------------------------------------------------
+
+@handler('log.render_pdf')
+def render_log_pdf(payload):
+    latest_log = LatestLogEntry.objects.select_related('carehome', 'service_user', 'user').filter(
+        pk=payload['latest_log_id']
+    ).first()
+    if latest_log is None:
+        return  # deleted since
+
+    # Archived shifts have their entries in the LogArchive blob, not in LogEntry
+    log_entries = get_log_entries(latest_log)
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, 'log_pdfs'), exist_ok=True)
+    pdf_filename = f"log_{latest_log.id}.pdf"
+    render_pdf(
+        'pdf_templates/log_pdf.html',
+        {'latest_log': latest_log, 'log_entries': log_entries},
+        os.path.join(settings.MEDIA_ROOT, 'log_pdfs', pdf_filename),
+        engine=settings.LOG_PDF_ENGINE,
+    )
+
+    LatestLogEntry.objects.filter(pk=latest_log.pk).update(log_pdf=f'log_pdfs/{pdf_filename}')
+
+
+@handler('log.resolve_missed')
+def resolve_missed_log(payload):
+    latest_log = LatestLogEntry.objects.filter(pk=payload['latest_log_id']).first()
+    if latest_log is None:
+        return
+    MissedLog.objects.filter(
+        carehome_id=latest_log.carehome_id,
+        service_user_id=latest_log.service_user_id,
+        date=latest_log.date,
+        shift=latest_log.shift,
+        resolved_at__isnull=True
+    ).update(resolved_at=timezone.now())
+
+
+@handler('log.notify_locked')
+def notify_log_locked(payload):
+    latest_log = LatestLogEntry.objects.select_related('service_user').filter(pk=payload['latest_log_id']).first()
+    if latest_log is None:
+        return
+    team_leads = CustomUser.objects.filter(
+        carehome_id=latest_log.carehome_id, role=CustomUser.TEAM_LEAD, is_active=True
+    )
+    # Locking the same log twice (e.g. a double submit) shouldn't notify twice
+    already_notified = set(Notification.objects.filter(
+        notif_type='log_locked', payload__latest_log_id=latest_log.pk
+    ).values_list('user_id', flat=True))
+    Notification.objects.bulk_create([
+        Notification(
+            user=lead,
+            notif_type='log_locked',
+            title=f"{latest_log.get_shift_display()} log locked for {latest_log.service_user}",
+            message=f"{latest_log.staff_name} locked the {latest_log.date} {latest_log.shift} log.",
+            payload={'latest_log_id': latest_log.pk},
+        )
+        for lead in team_leads if lead.pk not in already_notified
+    ])
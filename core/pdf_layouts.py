@@ -0,0 +1,95 @@
+"""
+Documents drawn directly with ReportLab (the "reportlab" engine in core/rendering.py).
+
+Each layout mirrors one HTML template in pdf_templates/ and has to stay
+visually equivalent to it: change both together. Sizes are the template's CSS
+converted to points (1px = 0.75pt).
+"""
+from html import escape
+
+from django.utils.formats import date_format
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+PX = 0.75
+HEADER_GREY = colors.HexColor('#f2f2f2')
+
+BODY = ParagraphStyle('body', fontName='Helvetica', fontSize=12 * PX, leading=12 * PX * 1.4)
+BOLD = ParagraphStyle('bold', parent=BODY, fontName='Helvetica-Bold')
+HEADER = ParagraphStyle('header', parent=BOLD, alignment=TA_CENTER)
+CENTERED = ParagraphStyle('centered', parent=BODY, alignment=TA_CENTER)
+
+
+def _text(value, style=BODY):
+    """A cell as the template would print {{ value|linebreaksbr }}"""
+    return Paragraph(escape('' if value is None else str(value)).replace('\n', '<br/>'), style)
+
+
+def _full_width(cell):
+    return [cell, '', '', '']
+
+
+def log_pdf(context, output):
+    """pdf_templates/log_pdf.html"""
+    latest_log = context['latest_log']
+    rows = [
+        _full_width(_text("Service User's Daily Recording Sheet", HEADER)),
+        _full_width(Paragraph(
+            f"<b>Care Home:</b> {escape(str(latest_log.carehome))}<br/>"
+            f"<b>Service User:</b> {escape(str(latest_log.service_user))}<br/>"
+            f"<b>Staff:</b> {escape(str(latest_log.staff_name))}",
+            BODY
+        )),
+        [_text(label, HEADER) for label in ('Date', 'Day', 'Staff Initial', 'Shift')],
+        [
+            _text(date_format(latest_log.date, 'SHORT_DATE_FORMAT') if latest_log.date else ''),
+            _text(latest_log.day_of_week),
+            _text(latest_log.staff_initials),
+            _text(latest_log.get_shift_display()),
+        ],
+        _full_width(_text('Daily Log Entries', HEADER)),
+        [_text('Time', HEADER), _text('Details', HEADER), '', ''],
+    ]
+    style = [
+        ('GRID', (0, 0), (-1, -1), 1 * PX, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 5 * PX),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 5 * PX),
+        ('TOPPADDING', (0, 0), (-1, -1), 5 * PX),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5 * PX),
+        ('SPAN', (0, 0), (-1, 0)),
+        ('SPAN', (0, 1), (-1, 1)),
+        ('SPAN', (0, 4), (-1, 4)),
+        ('SPAN', (1, 5), (-1, 5)),
+    ]
+    for header_row in (0, 2, 4, 5):
+        style.append(('BACKGROUND', (0, header_row), (-1, header_row), HEADER_GREY))
+
+    entries = list(context['log_entries'])
+    for entry in entries:
+        style.append(('SPAN', (1, len(rows)), (-1, len(rows))))
+        rows.append([
+            _text(entry.time_slot.strftime('%H:%M') if entry.time_slot else '', BOLD),
+            _text(entry.content), '', '',
+        ])
+    if not entries:
+        style.append(('SPAN', (0, len(rows)), (-1, len(rows))))
+        rows.append(_full_width(_text('No log entries found for this shift.', CENTERED)))
+
+    # @page margin 0.5in, plus the .table-container's 0.5in on each side
+    document = SimpleDocTemplate(
+        output, pagesize=A4, title='Log PDF',
+        leftMargin=inch, rightMargin=inch, topMargin=0.5 * inch, bottomMargin=0.5 * inch,
+    )
+    # table-layout: fixed takes column widths from the first row, which spans
+    # all four columns, so the browser/WeasyPrint layout has four equal columns
+    document.build([Table(rows, colWidths=[document.width / 4] * 4, style=TableStyle(style))])
+
+
+LAYOUTS = {
+    'pdf_templates/log_pdf.html': log_pdf,
+}
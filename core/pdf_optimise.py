@@ -0,0 +1,112 @@
+"""
+Shrinking stored PDFs.
+
+optimise_pdf() runs after WeasyPrint renders (core/rendering.html_to_pdf) and,
+through `manage.py optimise_pdfs`, over files already in media/. It
+downsamples embedded photos larger than PDF_MAX_IMAGE_PX to JPEG, Flate
+compresses page content streams and merges identical objects (the same logo
+or font on every page, repeated images) while dropping unreferenced ones.
+
+Font subsetting happens at render time: WeasyPrint embeds only the glyphs
+used, and the ReportLab layouts use the standard PDF fonts, which aren't
+embedded at all. pypdf writes a classic cross-reference table, not object
+streams, so a file that WeasyPrint already packed tightly can come out
+bigger; the original is kept whenever optimising doesn't make it smaller.
+"""
+import logging
+import os
+import tempfile
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+
+def _downsample_images(page, max_image_px, jpeg_quality):
+    for image in page.images:
+        try:
+            picture = image.image
+            if picture is None or max(picture.size) <= max_image_px:
+                continue
+            if '/SMask' in image.indirect_reference.get_object() or picture.mode not in ('RGB', 'L', 'CMYK'):
+                continue  # transparency would be lost as JPEG
+            picture = picture.copy()
+            picture.thumbnail((max_image_px, max_image_px))
+            image.replace(picture, quality=jpeg_quality)
+        except (AttributeError, TypeError, ValueError, OSError) as exc:
+            # Inline images can't be replaced; undecodable ones are left alone
+            logger.debug("Keeping image %s as is: %s", image.name, exc)
+
+
+def optimise_pdf(data, max_image_px=1600, jpeg_quality=75):
+    """Returns the optimised PDF bytes, or ``data`` itself if that isn't smaller"""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter(clone_from=PdfReader(BytesIO(data)))
+    for page in writer.pages:
+        _downsample_images(page, max_image_px, jpeg_quality)
+        page.compress_content_streams()
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+    output = BytesIO()
+    writer.write(output)
+    optimised = output.getvalue()
+    return optimised if len(optimised) < len(data) else data
+
+
+def optimise_file(path, max_image_px=1600, jpeg_quality=75, dry_run=False):
+    """
+    Optimise one stored PDF in place (atomically, keeping its name so model
+    fields still point at it). Returns (path, bytes before, bytes after, error).
+    Runs in worker processes, so it takes no settings and raises nothing.
+    """
+    try:
+        with open(path, 'rb') as pdf:
+            data = pdf.read()
+        optimised = optimise_pdf(data, max_image_px, jpeg_quality)
+        if optimised is not data and not dry_run:
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(handle, 'wb') as output:
+                    output.write(optimised)
+                os.chmod(temp_path, os.stat(path).st_mode & 0o777)  # mkstemp creates it 0600
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        return path, len(data), len(optimised), None
+    except Exception as exc:
+        return path, 0, 0, f"{type(exc).__name__}: {exc}"
+
+
+STORED_PDF_DIRS = ('log_pdfs', 'incident_reports', 'abc_pdfs')
+
+
+def stored_pdfs(media_root, directories=STORED_PDF_DIRS):
+    for directory in directories:
+        for root, _, filenames in os.walk(os.path.join(media_root, directory)):
+            for filename in filenames:
+                if filename.lower().endswith('.pdf'):
+                    yield os.path.join(root, filename)
+
+
+def optimise_stored_pdfs(paths, workers=None, progress=None, **options):
+    """
+    Optimise ``paths`` across a process pool (image resampling is CPU bound).
+    Returns {'files', 'rewritten', 'before', 'after', 'errors': [(path, error)]}.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    totals = {'files': 0, 'rewritten': 0, 'before': 0, 'after': 0, 'errors': []}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, before, after, error in pool.map(partial(optimise_file, **options), paths, chunksize=8):
+            totals['files'] += 1
+            if error:
+                totals['errors'].append((path, error))
+                continue
+            totals['before'] += before
+            totals['after'] += after
+            totals['rewritten'] += after < before
+            if progress and totals['files'] % 100 == 0:
+                progress(totals)
+    return totals
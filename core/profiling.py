@@ -0,0 +1,157 @@
+"""
+Opt-in SQL profiling for a sample of requests.
+
+Turn on with SQL_PROFILING=True; SQL_PROFILING_SAMPLE_RATE decides what share of
+requests get profiled. For each sampled request we keep the query count, total
+DB time and the slowest queries with the line of our code that ran them. The
+last SQL_PROFILING_BUFFER_SIZE profiles sit in an in-memory ring buffer per
+worker process, readable by staff at /debug/sql-profiles/.
+"""
+import os
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.utils import timezone
+
+_profiles = deque(maxlen=settings.SQL_PROFILING_BUFFER_SIZE)
+_lock = threading.Lock()
+
+_current = ContextVar('sql_profile', default=None)
+
+_PROJECT_DIR = os.path.abspath(settings.BASE_DIR)
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _origin():
+    """The innermost frame in project code (not Django, not this module)"""
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(_PROJECT_DIR) and filename != _THIS_FILE and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, _PROJECT_DIR)}:{frame.lineno} in {frame.name}"
+    return None
+
+
+class RequestProfile:
+    def __init__(self, request):
+        self.request = request
+        self.started = time.perf_counter()
+        self.queries = []  # (ms, sql, origin)
+
+    def add(self, sql, ms):
+        self.queries.append((ms, sql, _origin()))
+
+    def finish(self, response):
+        match = getattr(self.request, 'resolver_match', None)
+        slowest = sorted(self.queries, key=lambda query: query[0], reverse=True)[:settings.SQL_PROFILING_SLOWEST]
+        return {
+            'at': timezone.now().isoformat(),
+            'method': self.request.method,
+            'path': self.request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code if response is not None else None,
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'query_count': len(self.queries),
+            'db_ms': round(sum(query[0] for query in self.queries), 2),
+            'slowest': [{'ms': round(ms, 2), 'sql': sql, 'origin': origin} for ms, sql, origin in slowest],
+        }
+
+
+def _profile_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add(sql, (time.perf_counter() - started) * 1000)
+
+
+def _install_profiler(sender, connection, **kwargs):
+    if _profile_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_profile_query)
+
+
+def recent_profiles():
+    with _lock:
+        return list(reversed(_profiles))
+
+
+class SQLProfilingMiddleware:
+    """Profiles SQL_PROFILING_SAMPLE_RATE of requests into the ring buffer. Not loaded unless SQL_PROFILING is on."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SQL_PROFILING:
+            raise MiddlewareNotUsed
+        connection_created.connect(_install_profiler, dispatch_uid='core.profiling.profile_queries')
+        for connection in connections.all(initialized_only=True):
+            _install_profiler(None, connection)
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= settings.SQL_PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        token = _current.set(RequestProfile(request))
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self.store(token, response)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SQL_PROFILING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        token = _current.set(RequestProfile(request))
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self.store(token, response)
+
+    @staticmethod
+    def store(token, response):
+        profile = _current.get()
+        _current.reset(token)
+        record = profile.finish(response)
+        with _lock:
+            _profiles.append(record)
+
+
+@staff_member_required
+def sql_profiles_view(request):
+    """Most recent profiles first. ?limit=N to trim, ?view=<url name> to filter."""
+    profiles = recent_profiles()
+    view = request.GET.get('view')
+    if view:
+        profiles = [profile for profile in profiles if profile['view'] == view]
+    try:
+        limit = int(request.GET.get('limit', 50))
+    except ValueError:
+        limit = 50
+    return JsonResponse({
+        'enabled': settings.SQL_PROFILING,
+        'sample_rate': settings.SQL_PROFILING_SAMPLE_RATE,
+        'profiles': profiles[:max(limit, 0)],
+    })
@@ -0,0 +1,196 @@
+"""
+PDF rendering helpers.
+
+WeasyPrint loads Cairo/Pango/fontconfig and xhtml2pdf loads ReportLab, which is
+most of a worker's boot time, so they are imported on first render instead of
+when Django loads the app. Keep module-level imports here light.
+
+render_pdf() renders a template with one of the ENGINES. WeasyPrint handles
+any template; "reportlab" draws the documents in core/pdf_layouts.py directly
+and skips HTML/CSS layout altogether.
+"""
+import logging
+import mimetypes
+import os
+import time
+from io import BytesIO
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+
+from .metrics import record_pdf
+
+logger = logging.getLogger(__name__)
+
+
+def _write(pdf, target):
+    """Same contract as WeasyPrint's write_pdf(target): bytes without a target, else None"""
+    if target is None:
+        return pdf
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, 'wb') as output:
+            output.write(pdf)
+    else:
+        target.write(pdf)
+    return None
+
+
+class LocalURLFetcher:
+    """
+    WeasyPrint url_fetcher that reads /media/ and /static/ from storage instead
+    of requesting them from our own server - that request needs a second worker
+    from the pool the rendering worker is blocking, and a few concurrent renders
+    can use up the pool. Other paths on ``base_url``'s host are refused for the
+    same reason; other hosts go to WeasyPrint's default fetcher.
+
+    One instance per render: each URL is read once, however often the
+    document uses it.
+    """
+
+    def __init__(self, base_url=None):
+        parts = urlsplit(base_url or '')
+        self.origin = (parts.scheme, parts.netloc)
+        self.fetched = {}
+
+    def __call__(self, url, *args, **kwargs):
+        if url not in self.fetched:
+            self.fetched[url] = self.fetch(url, *args, **kwargs)
+        return dict(self.fetched[url])
+
+    def fetch(self, url, *args, **kwargs):
+        parts = urlsplit(url)
+        if (parts.scheme, parts.netloc) != self.origin:
+            from weasyprint import default_url_fetcher
+
+            result = default_url_fetcher(url, *args, **kwargs)
+            if 'file_obj' in result:
+                with result.pop('file_obj') as file_obj:
+                    result['string'] = file_obj.read()
+            return result
+
+        data = self.read_local(unquote(parts.path))
+        return {
+            'string': data,
+            'mime_type': mimetypes.guess_type(parts.path)[0] or 'application/octet-stream',
+            'redirected_url': url,
+        }
+
+    @staticmethod
+    def read_local(path):
+        if path.startswith(settings.MEDIA_URL):
+            with default_storage.open(path[len(settings.MEDIA_URL):]) as media_file:
+                return media_file.read()
+
+        if path.startswith(settings.STATIC_URL):
+            name = path[len(settings.STATIC_URL):]
+            if staticfiles_storage.exists(name):  # collected (production)
+                with staticfiles_storage.open(name) as static_file:
+                    return static_file.read()
+            found = finders.find(name)  # not collected (runserver)
+            if found:
+                with open(found, 'rb') as static_file:
+                    return static_file.read()
+            raise FileNotFoundError(path)
+
+        raise ValueError(f"Not requesting {path} from our own server while rendering a PDF")
+
+
+def html_to_pdf(html, target=None, base_url=None):
+    """Render HTML with WeasyPrint. Writes to ``target`` if given, otherwise returns the PDF bytes."""
+    from weasyprint import HTML
+
+    started = time.perf_counter()
+    # WeasyPrint subsets fonts itself; dpi caps photos at their printed size
+    pdf = HTML(string=html, base_url=base_url, url_fetcher=LocalURLFetcher(base_url)).write_pdf(
+        optimize_images=True, dpi=settings.PDF_IMAGE_DPI, jpeg_quality=settings.PDF_JPEG_QUALITY,
+    )
+    if settings.PDF_OPTIMISE:
+        from .pdf_optimise import optimise_pdf
+        pdf = optimise_pdf(pdf, settings.PDF_MAX_IMAGE_PX, settings.PDF_JPEG_QUALITY)
+    record_pdf('weasyprint', time.perf_counter() - started, len(pdf))
+    return _write(pdf, target)
+
+
+def html_to_pdf_xhtml2pdf(html):
+    """Render HTML with xhtml2pdf. Returns the PDF bytes, or None if rendering failed."""
+    from xhtml2pdf import pisa
+
+    started = time.perf_counter()
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
+    if pdf.err:
+        return None
+    record_pdf('xhtml2pdf', time.perf_counter() - started, result.tell())
+    return result.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Engines
+# ---------------------------------------------------------------------------
+
+class PDFEngine:
+    """Renders a template and context to PDF: written to ``target`` if given, otherwise returned as bytes"""
+    name = None
+
+    def supports(self, template_name):
+        return True
+
+    def render(self, template_name, context, target=None, base_url=None):
+        raise NotImplementedError
+
+
+class WeasyPrintEngine(PDFEngine):
+    name = 'weasyprint'
+
+    def render(self, template_name, context, target=None, base_url=None):
+        return html_to_pdf(render_to_string(template_name, context), target, base_url=base_url)
+
+
+class XHTML2PDFEngine(PDFEngine):
+    name = 'xhtml2pdf'
+
+    def render(self, template_name, context, target=None, base_url=None):
+        pdf = html_to_pdf_xhtml2pdf(render_to_string(template_name, context))
+        if pdf is None:
+            raise RuntimeError(f"xhtml2pdf could not render {template_name}")
+        return _write(pdf, target)
+
+
+class ReportLabEngine(PDFEngine):
+    """Only for templates with a layout in core/pdf_layouts.py"""
+    name = 'reportlab'
+
+    def supports(self, template_name):
+        from .pdf_layouts import LAYOUTS
+        return template_name in LAYOUTS
+
+    def render(self, template_name, context, target=None, base_url=None):
+        from .pdf_layouts import LAYOUTS
+
+        started = time.perf_counter()
+        output = BytesIO()
+        LAYOUTS[template_name](context, output)
+        pdf = output.getvalue()
+        record_pdf('reportlab', time.perf_counter() - started, len(pdf))
+        return _write(pdf, target)
+
+
+ENGINES = {engine.name: engine for engine in (WeasyPrintEngine(), XHTML2PDFEngine(), ReportLabEngine())}
+
+
+def render_pdf(template_name, context, target=None, engine='weasyprint', base_url=None):
+    """
+    Render ``template_name`` with ``engine``. Templates the engine has no layout
+    for, and documents it fails on, are rendered with WeasyPrint instead.
+    """
+    chosen = ENGINES[engine]
+    if chosen.name != 'weasyprint' and chosen.supports(template_name):
+        try:
+            return chosen.render(template_name, context, target, base_url=base_url)
+        except Exception:
+            logger.exception("%s could not render %s, using WeasyPrint", chosen.name, template_name)
+    return ENGINES['weasyprint'].render(template_name, context, target, base_url=base_url)
@@ -0,0 +1,114 @@
+"""
+Read replica routing.
+
+When a "replica" database is configured, ReplicaRoutingMiddleware lets
+GET/HEAD/OPTIONS requests read from it. Everything else reads and writes the
+primary ("default"). Replication lags, so two things keep users seeing their
+own changes:
+
+* once a request has written anything, its remaining reads go to the primary;
+* a request that wrote sets a short-lived cookie, and requests carrying it read
+  the primary too (REPLICA_STICKY_SECONDS), so the redirect after a POST
+  doesn't show stale data.
+
+Outside a request (management commands, scheduled jobs) reads use the primary.
+"""
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+REPLICA = 'replica'
+STICKY_COOKIE = 'read_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    # Shared by reference so writes made in sync_to_async threads are seen here
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+_state = ContextVar('db_routing', default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.use_replica and not state.wrote:
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReplicaRoutingMiddleware:
+    """Decides per request whether reads may use the replica; sets the stickiness cookie after writes"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def may_use_replica(request):
+        if request.method not in SAFE_METHODS:
+            return False
+        try:
+            pinned_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return pinned_until < time.time()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(self.may_use_replica(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(self.may_use_replica(request))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    @staticmethod
+    def finish(state, response):
+        if state.wrote:
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + seconds), max_age=seconds,
+                httponly=True, samesite='Lax', secure=not settings.DEBUG,
+            )
+        return response
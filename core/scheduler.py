@@ -0,0 +1,295 @@
+"""
+Periodic jobs (manage.py run_scheduler).
+
+Jobs register with @job(name, cron expression) and the scheduler process runs
+each one when it is due, recording every run (JobRun) and the latest on its
+ScheduledJob row. Several scheduler processes can run at once - one per host,
+or a spare - and each job still runs only once per due time: before running a
+job an instance takes a lease on it, then re-reads when it is next due.
+
+On PostgreSQL the lease is a session advisory lock, released when the job
+ends or the connection drops. Other databases, and PostgreSQL behind a
+transaction pooler (PGBOUNCER_TRANSACTION_POOLING), use the ScheduledJob row:
+a conditional UPDATE claims it until lease_expires_at, so a crashed
+instance's lease runs out and another takes over. Keep a job's lease_seconds
+above its longest run.
+"""
+import logging
+import os
+import socket
+import time
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import JobRun, ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Schedules
+# ---------------------------------------------------------------------------
+
+class Cron:
+    """
+    A five-field cron expression: minute, hour, day of month, month, day of
+    week (0 or 7 is Sunday). Fields take *, numbers, a-b ranges, /steps and
+    comma lists. Times are in TIME_ZONE.
+    """
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs five fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(part, low, high) for part, (low, high) in zip(parts, self.FIELDS)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron: when both day fields are restricted, either may match
+        self.any_day, self.any_weekday = parts[2] == '*', parts[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for item in field.split(','):
+            span, _, step = item.partition('/')
+            if span == '*':
+                start, end = low, high
+            elif '-' in span:
+                start, end = (int(value) for value in span.split('-', 1))
+            else:
+                start = int(span)
+                end = high if step else start
+            if not low <= start <= end <= high:
+                raise ValueError(f"Cron field out of range: {field!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return weekday
+        if self.any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, moment):
+        """The first matching minute after ``moment`` (aware)"""
+        local = timezone.localtime(moment).replace(tzinfo=None, second=0, microsecond=0)
+        candidate = local + timedelta(minutes=1)
+        while candidate.year <= local.year + 5:
+            if candidate.month not in self.months:
+                month_start = candidate.replace(day=1, hour=0, minute=0)
+                candidate = (month_start + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = datetime.combine(candidate.date() + timedelta(days=1), datetime.min.time())
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(candidate)
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+Job = namedtuple('Job', 'name cron func lease_seconds')
+
+JOBS = {}
+
+
+def job(name, schedule, lease_seconds=3600):
+    cron = Cron(schedule)
+
+    def register(func):
+        JOBS[name] = Job(name, cron, func, lease_seconds)
+        return func
+    return register
+
+
+def instance_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------------------------------------------------------
+# Leases
+# ---------------------------------------------------------------------------
+
+def _advisory_key(name):
+    return zlib.crc32(f'core.scheduler:{name}'.encode())
+
+
+@contextmanager
+def lease(job, owner):
+    """Yields True while this instance holds ``job``, False if another instance does"""
+    # Behind a transaction pooler the unlock could run on another server session
+    # and leak the lock, so the row lease is used there
+    if connection.vendor == 'postgresql' and not settings.PGBOUNCER_TRANSACTION_POOLING:
+        key = _advisory_key(job.name)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+            held = cursor.fetchone()[0]
+        try:
+            yield held
+        finally:
+            if held:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+        return
+
+    now = timezone.now()
+    held = ScheduledJob.objects.filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now), name=job.name
+    ).update(lease_owner=owner, lease_expires_at=now + timedelta(seconds=job.lease_seconds)) == 1
+    try:
+        yield held
+    finally:
+        if held:
+            ScheduledJob.objects.filter(name=job.name, lease_owner=owner).update(
+                lease_owner='', lease_expires_at=None
+            )
+
+
+# ---------------------------------------------------------------------------
+# Running
+# ---------------------------------------------------------------------------
+
+def sync_jobs(now):
+    """Make sure every registered job has a row, due at its next scheduled time"""
+    rows = {row.name: row for row in ScheduledJob.objects.filter(name__in=JOBS)}
+    for name, registered in JOBS.items():
+        row = rows.get(name)
+        if row is None:
+            try:
+                with transaction.atomic():
+                    ScheduledJob.objects.create(
+                        name=name, schedule=registered.cron.expression, next_run_at=registered.cron.next_after(now)
+                    )
+            except IntegrityError:
+                pass  # another instance got there first
+        elif row.schedule != registered.cron.expression:
+            ScheduledJob.objects.filter(pk=row.pk).update(
+                schedule=registered.cron.expression, next_run_at=registered.cron.next_after(now)
+            )
+
+
+def run_job(registered, owner, now=None, force=False):
+    """
+    Run a job if it's due (or ``force``) and no other instance has it.
+    Returns the JobRun, or None if it didn't run here.
+    """
+    with lease(registered, owner) as held:
+        if not held:
+            return None
+        # Read after taking the lease: another instance may have just run it
+        row = ScheduledJob.objects.get(name=registered.name)
+        now = now or timezone.now()
+        if not force and row.next_run_at > now:
+            return None
+
+        started_at, started = timezone.now(), time.monotonic()
+        error = ''
+        try:
+            registered.func()
+        except Exception as exc:
+            logger.exception("Scheduled job %s failed", registered.name)
+            error = f"{type(exc).__name__}: {exc}"
+        duration = time.monotonic() - started
+
+        row.last_started_at = started_at
+        row.last_duration = duration
+        row.last_succeeded = not error
+        row.last_error = error
+        # Slots that passed while it ran are skipped, not run back to back
+        row.next_run_at = registered.cron.next_after(now + timedelta(seconds=duration))
+        row.save(update_fields=['last_started_at', 'last_duration', 'last_succeeded', 'last_error', 'next_run_at'])
+        logger.info("Scheduled job %s %s in %.1fs", registered.name, 'failed' if error else 'ran', duration)
+        return JobRun.objects.create(
+            job=row, started_at=started_at, duration=duration, succeeded=not error, owner=owner, error=error
+        )
+
+
+def run_due(owner, now=None):
+    """Run every job that is due, one after another. Returns the runs made here."""
+    now = now or timezone.now()
+    sync_jobs(now)
+    due = ScheduledJob.objects.filter(name__in=JOBS, next_run_at__lte=now).values_list('name', flat=True)
+    runs = []
+    for name in due:
+        run = run_job(JOBS[name], owner, now)
+        if run:
+            runs.append(run)
+    return runs
+
+
+def seconds_until_due(now=None, longest=60):
+    now = now or timezone.now()
+    next_run_at = ScheduledJob.objects.filter(name__in=JOBS).order_by('next_run_at').values_list(
+        'next_run_at', flat=True
+    ).first()
+    if next_run_at is None:
+        return longest
+    return min(max((next_run_at - now).total_seconds(), 1), longest)
+
+
+# ---------------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------------
+
+@job('check_missed_logs', '0 23 * * *')
+def check_missed_logs():
+    from .models import CareHome
+
+    today = timezone.localdate()
+    for carehome in CareHome.objects.all():
+        carehome.check_missed_logs(today)
+
+
+@job('auto_lock_logs', '*/15 * * * *')
+def auto_lock_logs():
+    from .autolock import auto_lock
+
+    auto_lock()
+
+
+@job('archive_logs', '30 2 * * *', lease_seconds=4 * 3600)
+def archive_logs():
+    from .archive import archive_old_logs
+
+    archive_old_logs(days=settings.LOG_ARCHIVE_AFTER_DAYS)
+
+
+@job('sync_warehouse', '0 1 * * *', lease_seconds=4 * 3600)
+def sync_warehouse():
+    from .warehouse import sync
+
+    sync()
+
+
+@job('gc_media', '0 4 * * *', lease_seconds=4 * 3600)
+def gc_media():
+    from .mediagc import collect, purge_quarantine
+
+    collect(settings.MEDIA_ROOT, min_age_hours=settings.MEDIA_GC_MIN_AGE_HOURS)
+    purge_quarantine(settings.MEDIA_ROOT, settings.MEDIA_GC_QUARANTINE_DAYS)
+
+
+@job('prune_job_runs', '15 4 * * *')
+def prune_job_runs():
+    cutoff = timezone.now() - timedelta(days=settings.SCHEDULER_KEEP_RUNS_DAYS)
+    JobRun.objects.filter(started_at__lt=cutoff).delete()
@@ -0,0 +1,233 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils import timezone
+
+from .models import ABCForm, IncidentReport, LogEntry, SearchDocument
+
+FTS_TABLE = 'core_searchdocument_fts'
+
+# Highlight markers - swapped for <mark> after the snippet has been HTML-escaped
+MARK_START = '\x02'
+MARK_STOP = '\x03'
+
+
+# ---------------------------------------------------------------------------
+# Indexing
+# ---------------------------------------------------------------------------
+
+def _join(*parts):
+    return "\n".join(part for part in parts if part)
+
+
+def document_for_log_entry(entry):
+    return {
+        'carehome_id': entry.carehome_id,
+        'service_user_id': entry.service_user_id,
+        'user_id': entry.user_id,
+        'date': entry.date,
+        'title': f"{entry.shift.title()} log {entry.date} {entry.time_slot.strftime('%H:%M')}",
+        'url': reverse('log_detail_view', args=[entry.latest_log_id]) if entry.latest_log_id else '',
+        'body': entry.content,
+    }
+
+
+def document_for_incident(incident):
+    return {
+        'carehome_id': incident.carehome_id,
+        'service_user_id': incident.service_user_id,
+        'user_id': incident.staff_id,
+        'date': timezone.localdate(incident.incident_datetime) if timezone.is_aware(incident.incident_datetime)
+        else incident.incident_datetime.date(),
+        'title': f"Incident at {incident.location}"[:255],
+        'url': reverse('view_incident_report', args=[incident.pk]),
+        'body': _join(
+            incident.prior_description,
+            incident.incident_description,
+            incident.user_response,
+            incident.injuries_detail,
+            incident.property_damage,
+        ),
+    }
+
+
+def document_for_abc_form(form):
+    return {
+        'carehome_id': form.service_user.carehome_id,
+        'service_user_id': form.service_user_id,
+        'user_id': form.created_by_id,
+        'date': timezone.localdate(form.date_time) if timezone.is_aware(form.date_time) else form.date_time.date(),
+        'title': "ABC form",
+        'url': reverse('view_abc_form', args=[form.pk]),
+        'body': _join(
+            form.setting_location,
+            form.setting_present,
+            form.setting_activity,
+            form.setting_environment,
+            form.antecedent_description,
+            form.antecedent_waiting,
+            form.behaviour_description,
+            form.consequence_immediate,
+            form.reflection_learnings,
+        ),
+    }
+
+
+INDEXED_MODELS = {
+    LogEntry: (SearchDocument.KIND_LOG, document_for_log_entry),
+    IncidentReport: (SearchDocument.KIND_INCIDENT, document_for_incident),
+    ABCForm: (SearchDocument.KIND_ABC, document_for_abc_form),
+}
+
+
+def index_instance(instance, created=False):
+    """Create, refresh or drop the search document for a saved instance"""
+    kind, build = INDEXED_MODELS[type(instance)]
+    fields = build(instance)
+    if not fields['body'].strip():
+        # New blank rows (e.g. the empty hourly log slots) never had a document
+        if not created:
+            remove_instance(instance)
+        return
+    SearchDocument.objects.update_or_create(kind=kind, object_id=instance.pk, defaults=fields)
+
+
+def remove_instance(instance):
+    kind, _ = INDEXED_MODELS[type(instance)]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild_index(chunk_size=1000, progress=None):
+    """Re-index every indexed model, reading source rows in pk-ordered chunks"""
+    total = 0
+    for model, (kind, build) in INDEXED_MODELS.items():
+        queryset = model.objects.order_by('pk')
+        if model is ABCForm:
+            queryset = queryset.select_related('service_user')
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            for instance in chunk:
+                index_instance(instance)
+            last_pk = chunk[-1].pk
+            total += len(chunk)
+            if progress:
+                progress(kind, total)
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------------
+
+def highlight(snippet):
+    """HTML-escape a snippet and turn the highlight markers into <mark> tags"""
+    return escape(snippet).replace(MARK_START, '<mark>').replace(MARK_STOP, '</mark>')
+
+
+class BasicSearchBackend:
+    """Substring match for databases without a full-text engine"""
+    snippet_chars = 160
+
+    def search(self, queryset, query, offset, limit):
+        matches = queryset.filter(body__icontains=query).order_by('-date', '-pk')
+        total = matches.count()
+        hits = []
+        for doc in matches[offset:offset + limit]:
+            hits.append((doc, self._snippet(doc.body, query)))
+        return total, hits
+
+    def _snippet(self, body, query):
+        position = body.lower().find(query.lower())
+        start = max(position - self.snippet_chars // 2, 0)
+        text = body[start:start + self.snippet_chars]
+        if position >= 0:
+            index = position - start
+            text = text[:index] + MARK_START + text[index:index + len(query)] + MARK_STOP + text[index + len(query):]
+        return text
+
+
+class PostgresSearchBackend:
+    """tsvector column kept current by a trigger, GIN-indexed"""
+
+    def search(self, queryset, query, offset, limit):
+        ts_query = SearchQuery(query, search_type='websearch', config='english')
+        matches = queryset.filter(search_vector=ts_query)
+        total = matches.count()
+        page = matches.annotate(
+            rank=SearchRank(F('search_vector'), ts_query),
+            snippet=SearchHeadline(
+                'body', ts_query, config='english',
+                start_sel=MARK_START, stop_sel=MARK_STOP, max_fragments=2,
+            ),
+        ).order_by('-rank', '-date')[offset:offset + limit]
+        return total, [(doc, doc.snippet) for doc in page]
+
+
+class SqliteSearchBackend:
+    """FTS5 external-content table kept current by triggers"""
+
+    @staticmethod
+    def _match_expression(query):
+        # Quote every term so user input can't inject FTS5 operators
+        terms = ['"{}"'.format(term.replace('"', '""')) for term in query.split()]
+        return " ".join(terms)
+
+    def search(self, queryset, query, offset, limit):
+        scoped_sql, scoped_params = queryset.values('pk').query.sql_with_params()
+        match = self._match_expression(query)
+        where = f"{FTS_TABLE} MATCH %s AND rowid IN ({scoped_sql})"
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {where}", [match, *scoped_params])
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, '…', 24) FROM {FTS_TABLE} "
+                f"WHERE {where} ORDER BY rank LIMIT %s OFFSET %s",
+                [MARK_START, MARK_STOP, match, *scoped_params, limit, offset],
+            )
+            rows = cursor.fetchall()
+
+        docs = SearchDocument.objects.in_bulk([pk for pk, _ in rows])
+        return total, [(docs[pk], snippet) for pk, snippet in rows if pk in docs]
+
+
+def _sqlite_has_fts():
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and _sqlite_has_fts():
+        return SqliteSearchBackend()
+    return BasicSearchBackend()
+
+
+def search_documents(queryset, query, page=1, per_page=20):
+    """Search a (role-scoped) SearchDocument queryset and return one page of hits"""
+    page = max(page, 1)
+    total, hits = get_search_backend().search(queryset, query, (page - 1) * per_page, per_page)
+    return {
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'num_pages': (total + per_page - 1) // per_page,
+        'results': [
+            {
+                'kind': doc.kind,
+                'id': doc.object_id,
+                'title': doc.title,
+                'date': doc.date.isoformat() if doc.date else None,
+                'service_user_id': doc.service_user_id,
+                'url': doc.url,
+                'snippet': highlight(snippet or ''),
+            }
+            for doc, snippet in hits
+        ],
+    }
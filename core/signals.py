@@ -1,9 +1,14 @@
 from datetime import timedelta
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import LatestLogEntry, MissedLog, CareHome
+from .analytics import refresh_behaviour_counts, form_day
+from .compliance import invalidate_day
+from .listcache import invalidate_carehomes, invalidate_residents
+from .models import LatestLogEntry, MissedLog, CareHome, ABCForm, LogEntry, IncidentReport, ServiceUser
+from .search import index_instance, remove_instance
 
 
 @receiver(post_save, sender=LatestLogEntry)
@@ -65,3 +70,73 @@ def check_existing_missed_logs(sender, instance, created, **kwargs):
                         date=timezone.now().date(),
                         shift=shift
                     )
+
+
+@receiver(pre_save, sender=ABCForm)
+def remember_abc_rollup_key(sender, instance, **kwargs):
+    """Remember the old service user/day so an edit can move counts out of it"""
+    instance._previous_rollup_key = None
+    if instance.pk:
+        old = ABCForm.objects.filter(pk=instance.pk).values('service_user_id', 'date_time').first()
+        if old:
+            instance._previous_rollup_key = (old['service_user_id'], form_day(old['date_time']))
+
+
+@receiver(post_save, sender=ABCForm)
+def update_behaviour_counts(sender, instance, **kwargs):
+    keys = {(instance.service_user_id, form_day(instance.date_time))}
+    if getattr(instance, '_previous_rollup_key', None):
+        keys.add(instance._previous_rollup_key)
+    for service_user_id, day in keys:
+        transaction.on_commit(lambda key=(service_user_id, day): refresh_behaviour_counts(*key))
+
+
+@receiver(post_delete, sender=ABCForm)
+def remove_behaviour_counts(sender, instance, **kwargs):
+    key = (instance.service_user_id, form_day(instance.date_time))
+    transaction.on_commit(lambda: refresh_behaviour_counts(*key))
+
+
+@receiver(post_save, sender=LogEntry)
+@receiver(post_save, sender=IncidentReport)
+@receiver(post_save, sender=ABCForm)
+def update_search_document(sender, instance, created, **kwargs):
+    index_instance(instance, created=created)
+
+
+@receiver(post_delete, sender=LogEntry)
+@receiver(post_delete, sender=IncidentReport)
+@receiver(post_delete, sender=ABCForm)
+def remove_search_document(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+@receiver(post_save, sender=CareHome)
+@receiver(post_delete, sender=CareHome)
+def invalidate_carehome_list(sender, instance, **kwargs):
+    # Only once committed: a request reading before then would cache the old list again
+    transaction.on_commit(invalidate_carehomes)
+
+
+@receiver(pre_save, sender=ServiceUser)
+def remember_previous_carehome(sender, instance, **kwargs):
+    """A resident moved to another home has to leave the old home's cached list too"""
+    instance._previous_carehome_id = None
+    if instance.pk:
+        instance._previous_carehome_id = ServiceUser.objects.filter(
+            pk=instance.pk
+        ).values_list('carehome_id', flat=True).first()
+
+
+@receiver(post_save, sender=ServiceUser)
+@receiver(post_delete, sender=ServiceUser)
+def invalidate_resident_list(sender, instance, **kwargs):
+    carehome_ids = (instance.carehome_id, getattr(instance, '_previous_carehome_id', None))
+    transaction.on_commit(lambda: invalidate_residents(*carehome_ids))
+
+
+@receiver(post_save, sender=MissedLog)
+@receiver(post_delete, sender=MissedLog)
+def invalidate_compliance_day(sender, instance, **kwargs):
+    carehome_id, day = instance.carehome_id, instance.date
+    transaction.on_commit(lambda: invalidate_day(carehome_id, day))
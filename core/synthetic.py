@@ -0,0 +1,323 @@
+import random
+import secrets
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .compliance import invalidate_home
+from .listcache import invalidate_carehomes, invalidate_residents
+from .models import (
+    ABCForm, CareHome, CustomUser, IncidentReport, LatestLogEntry, LogEntry, Mapping, MissedLog, Rota,
+    ServiceUser, Shift,
+)
+from .utils import generate_shift_times
+
+# Everything generated here can be told apart from real data by these
+EMAIL_DOMAIN = 'loadtest.invalid'
+HOME_PREFIX = 'Loadtest Home'
+
+FIRST_NAMES = [
+    'Aisha', 'Ben', 'Chloe', 'Daniel', 'Ella', 'Farah', 'George', 'Hannah', 'Imran', 'Jade',
+    'Kieran', 'Leah', 'Mohammed', 'Nia', 'Oliver', 'Priya', 'Ryan', 'Sophie', 'Tom', 'Zara',
+]
+LAST_NAMES = [
+    'Ahmed', 'Brown', 'Clarke', 'Davies', 'Evans', 'Fraser', 'Green', 'Hughes', 'Iqbal', 'Jones',
+    'Khan', 'Lewis', 'Murphy', 'Patel', 'Roberts', 'Smith', 'Taylor', 'Walker', 'Wilson', 'Young',
+]
+LOG_SENTENCES = [
+    "Resident was settled and watched television in the lounge.",
+    "Had breakfast and drank a full cup of tea.",
+    "Declined lunch, offered a sandwich later which was accepted.",
+    "Personal care given, no concerns noted.",
+    "Went for a short walk in the garden with staff support.",
+    "Appeared anxious after a phone call, reassured by staff.",
+    "Medication administered as prescribed.",
+    "Asleep, checked hourly, breathing normally.",
+    "Visited by family in the afternoon, in good spirits.",
+    "Took part in the group art activity.",
+    "Woke during the night asking for water, settled again quickly.",
+    "Refused evening medication, team lead informed.",
+]
+INCIDENT_LOCATIONS = ['Lounge', 'Dining room', 'Bedroom', 'Garden', 'Corridor', 'Bathroom']
+
+
+@contextmanager
+def historic_timestamps(*models):
+    """
+    Let bulk inserts keep the dates we give them. The date/created_at fields on the
+    log models are auto_now_add, which would otherwise stamp every row with today.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class SyntheticDataGenerator:
+    """
+    Bulk-inserts care homes, staff, residents and `days` of shift history.
+
+    Rows are created with bulk_create, so signals (search index, behaviour rollups)
+    do not fire; run rebuild_search_index afterwards if the search flows matter.
+    Pass ``homes`` to add more staff, residents and history to existing care homes
+    instead of creating new ones. Every account created gets ``password``, a random
+    one per generator unless given.
+    """
+
+    def __init__(self, carehomes=200, residents_per_home=10, staff_per_home=8, days=90,
+                 coverage=0.9, incidents_per_resident_month=0.5, abc_forms_per_resident_month=0.5,
+                 seed=1, batch_size=5000, progress=None, homes=None, password=None):
+        self.carehomes = carehomes
+        self.homes = homes
+        self.residents_per_home = residents_per_home
+        self.staff_per_home = staff_per_home
+        self.days = days
+        self.coverage = coverage
+        self.incident_rate = incidents_per_resident_month / 30
+        self.abc_rate = abc_forms_per_resident_month / 30
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.progress = progress or (lambda message: None)
+        self.counts = {}
+        self.password = password or secrets.token_urlsafe(12)
+
+    def run(self):
+        self.password_hash = make_password(self.password)  # hashed once, shared by every account
+        with historic_timestamps(LatestLogEntry, LogEntry, MissedLog, Rota, Shift, ABCForm):
+            homes = list(self.homes) if self.homes is not None else self.create_carehomes()
+            staff_by_home, leads_by_home = self.create_staff(homes)
+            residents_by_home = self.create_residents(homes)
+            self.create_mappings(staff_by_home, residents_by_home)
+            self.create_history(homes, staff_by_home, residents_by_home)
+            self.create_rotas(homes, staff_by_home, leads_by_home, residents_by_home)
+        # bulk_create sends no signals
+        invalidate_carehomes()
+        invalidate_residents(*(home.pk for home in homes))
+        for home in homes:
+            invalidate_home(home.pk)
+        return self.counts
+
+    # ------------------------------------------------------------------
+    def _bulk(self, model, rows):
+        if rows:
+            created = model.objects.bulk_create(rows, batch_size=self.batch_size)
+            self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+            return created
+        return []
+
+    def _name(self):
+        return self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+
+    def create_carehomes(self):
+        start = CareHome.objects.filter(name__startswith=HOME_PREFIX).count()
+        homes = self._bulk(CareHome, [
+            CareHome(
+                name=f"{HOME_PREFIX} {start + i + 1}",
+                postcode=f"LU{i % 9 + 1} {i % 10}AB",
+                morning_shift_start=time(8, 0), morning_shift_end=time(20, 0),
+                night_shift_start=time(20, 0), night_shift_end=time(8, 0),
+            )
+            for i in range(self.carehomes)
+        ])
+        self.progress(f"{len(homes)} care homes")
+        return homes
+
+    def create_staff(self, homes):
+        # Unique per run so repeated runs against the same homes don't clash
+        prefix = f"{CustomUser.objects.aggregate(last=Max('pk'))['last'] or 0}-"
+        users = []
+        for home in homes:
+            for i in range(self.staff_per_home + 1):
+                first, last = self._name()
+                role = CustomUser.TEAM_LEAD if i == 0 else CustomUser.STAFF
+                users.append(CustomUser(
+                    email=f"{role}.{prefix}{home.pk}.{i}@{EMAIL_DOMAIN}",
+                    first_name=first, last_name=last, role=role, carehome=home,
+                    password=self.password_hash, date_of_joining=timezone.localdate(),
+                ))
+        if not CustomUser.objects.filter(email=f"manager@{EMAIL_DOMAIN}").exists():
+            users.append(CustomUser(
+                email=f"manager@{EMAIL_DOMAIN}", first_name='Load', last_name='Manager',
+                role=CustomUser.Manager, password=self.password_hash,
+            ))
+        users = self._bulk(CustomUser, users)
+
+        staff_by_home, leads_by_home = {}, {}
+        for user in users:
+            if user.role == CustomUser.TEAM_LEAD:
+                leads_by_home[user.carehome_id] = user
+            elif user.role == CustomUser.STAFF:
+                staff_by_home.setdefault(user.carehome_id, []).append(user)
+        self.progress(f"{len(users)} staff accounts")
+        return staff_by_home, leads_by_home
+
+    def create_residents(self, homes):
+        residents = []
+        for home in homes:
+            for i in range(self.residents_per_home):
+                first, last = self._name()
+                residents.append(ServiceUser(
+                    carehome=home, first_name=first, last_name=last,
+                    dob=timezone.localdate() - timedelta(days=self.random.randint(18 * 365, 90 * 365)),
+                    phone='07700 900123', emergency_contact='07700 900456',
+                    address=f"{i + 1} {home.name} Road",
+                ))
+        residents = self._bulk(ServiceUser, residents)
+        residents_by_home = {}
+        for resident in residents:
+            residents_by_home.setdefault(resident.carehome_id, []).append(resident)
+        self.progress(f"{len(residents)} residents")
+        return residents_by_home
+
+    def create_mappings(self, staff_by_home, residents_by_home):
+        staff = [user for users in staff_by_home.values() for user in users]
+        mappings = self._bulk(Mapping, [Mapping(staff=user) for user in staff])
+        homes_through = Mapping.carehomes.through
+        residents_through = Mapping.service_users.through
+        self._bulk(homes_through, [
+            homes_through(mapping_id=mapping.pk, carehome_id=user.carehome_id)
+            for mapping, user in zip(mappings, staff)
+        ])
+        self._bulk(residents_through, [
+            residents_through(mapping_id=mapping.pk, serviceuser_id=resident.pk)
+            for mapping, user in zip(mappings, staff)
+            for resident in residents_by_home.get(user.carehome_id, [])
+        ])
+        self.progress(f"{len(mappings)} staff mappings")
+
+    def _aware(self, day, at):
+        return timezone.make_aware(datetime.combine(day, at))
+
+    def create_history(self, homes, staff_by_home, residents_by_home):
+        """One day at a time so memory stays flat however long the history is"""
+        today = timezone.localdate()
+        slots = {'morning': generate_shift_times(time(8, 0)), 'night': generate_shift_times(time(20, 0))}
+
+        for offset in range(self.days, -1, -1):
+            day = today - timedelta(days=offset)
+            stamp = self._aware(day, time(20, 0))
+            latest_logs, missed, incidents, abc_forms = [], [], [], []
+
+            for home in homes:
+                staff = staff_by_home.get(home.pk)
+                if not staff:
+                    continue
+                for resident in residents_by_home.get(home.pk, []):
+                    for shift in ('morning', 'night'):
+                        if self.random.random() < self.coverage:
+                            author = self.random.choice(staff)
+                            latest_logs.append(LatestLogEntry(
+                                user=author, carehome=home, service_user=resident, shift=shift,
+                                date=day, day_of_week=day.strftime('%A'),
+                                staff_name=author.get_full_name(),
+                                status='incomplete' if offset == 0 else 'locked',
+                                created_at=stamp, updated_at=stamp,
+                            ))
+                        else:
+                            missed.append(MissedLog(
+                                carehome=home, service_user=resident, date=day, shift=shift,
+                                created_at=stamp,
+                                resolved_at=stamp if self.random.random() < 0.3 else None,
+                            ))
+                    if self.random.random() < self.incident_rate:
+                        incidents.append(self._incident(home, resident, staff, day))
+                    if self.random.random() < self.abc_rate:
+                        abc_forms.append(self._abc_form(resident, staff, day))
+
+            with transaction.atomic():
+                latest_logs = self._bulk(LatestLogEntry, latest_logs)
+                self._bulk(LogEntry, [
+                    LogEntry(
+                        user_id=log.user_id, carehome_id=log.carehome_id, service_user_id=log.service_user_id,
+                        shift=log.shift, date=day, time_slot=slot, latest_log=log,
+                        content=self.random.choice(LOG_SENTENCES), is_locked=log.status == 'locked',
+                    )
+                    for log in latest_logs
+                    for slot in slots[log.shift]
+                ])
+                self._bulk(MissedLog, missed)
+                self._bulk(IncidentReport, incidents)
+                self._bulk(ABCForm, abc_forms)
+
+            if offset % 30 == 0:
+                self.progress(f"history up to {day}: {self.counts.get('LogEntry', 0)} log entries")
+
+    def _incident(self, home, resident, staff, day):
+        author = self.random.choice(staff)
+        return IncidentReport(
+            staff=author, service_user=resident, carehome=home,
+            incident_datetime=self._aware(day, time(self.random.randint(0, 23), self.random.choice([0, 15, 30, 45]))),
+            location=self.random.choice(INCIDENT_LOCATIONS),
+            dob=resident.dob or day,
+            staff_involved=author.get_full_name(),
+            prior_description=self.random.choice(LOG_SENTENCES),
+            incident_description="Resident became distressed and pushed a chair over.",
+            user_response="Staff gave space, spoke calmly and offered a drink.",
+            contacted_manager=self.random.random() < 0.5,
+        )
+
+    def _abc_form(self, resident, staff, day):
+        author = self.random.choice(staff)
+        stamp = self._aware(day, time(self.random.randint(0, 23), 0))
+        behaviours = [code for code, _ in ABCForm.TARGET_BEHAVIOUR_CHOICES]
+        form = ABCForm(
+            created_by=author, staff=author.get_full_name(), service_user=resident,
+            date_of_birth=resident.dob or day, date_time=stamp,
+            target_behaviours=self.random.sample(behaviours, self.random.randint(1, 2)),
+            setting_location=self.random.choice(INCIDENT_LOCATIONS),
+            antecedent_description=self.random.choice(LOG_SENTENCES),
+            behaviour_description="Shouting and banging on the table.",
+            consequence_immediate="Staff redirected to a quiet activity.",
+            created_at=stamp, updated_at=stamp,
+        )
+        form.build_section_text()  # save() isn't called by bulk_create
+        return form
+
+    def create_rotas(self, homes, staff_by_home, leads_by_home, residents_by_home):
+        """A published weekly rota per home with both shifts covered for every resident"""
+        today = timezone.localdate()
+        first_monday = today - timedelta(days=self.days + today.weekday())
+        weeks = (today - first_monday).days // 7 + 1
+        versions = {
+            (row['carehome_id'], row['period_start']): row['version']
+            for row in Rota.objects.filter(carehome__in=homes, period_start__gte=first_monday)
+            .values('carehome_id', 'period_start').annotate(version=Max('version'))
+        }
+
+        for week in range(weeks):
+            period_start = first_monday + timedelta(weeks=week)
+            stamp = self._aware(period_start, time(9, 0))
+            rotas = self._bulk(Rota, [
+                Rota(
+                    carehome=home, period_start=period_start, status=Rota.STATUS_PUBLISHED,
+                    version=versions.get((home.pk, period_start), 0) + 1,
+                    created_by=leads_by_home.get(home.pk), created_at=stamp, updated_at=stamp,
+                    published_at=stamp,
+                )
+                for home in homes
+            ])
+            shifts = []
+            for rota in rotas:
+                staff = staff_by_home.get(rota.carehome_id) or [None]
+                for day in range(7):
+                    for resident in residents_by_home.get(rota.carehome_id, []):
+                        for shift_type in (Shift.SHIFT_MORNING, Shift.SHIFT_NIGHT):
+                            shifts.append(Shift(
+                                rota=rota, date=period_start + timedelta(days=day), shift_type=shift_type,
+                                staff=self.random.choice(staff), service_user=resident,
+                                created_at=stamp, updated_at=stamp,
+                            ))
+            self._bulk(Shift, shifts)
+        self.progress(f"{self.counts.get('Rota', 0)} rotas, {self.counts.get('Shift', 0)} rota shifts")
@@ -1,3 +1,1717 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, time as datetime_time
+from importlib import import_module
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import resolve_url
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from pypdf import PdfReader, PdfWriter
+
+from core import outbox
+from core.archive import (
+    archive_old_logs, archive_shift, delete_entries, get_log_entries, pack_entries, unpack_entries,
+)
+from core.forms import ABCFormForm, MappingForm, StaffCreationForm
+from core.listcache import carehome_list, residents_for
+from core.decorators import async_login_required
+from core.autolock import auto_lock, last_ended
+from core.logconfig import JSONFormatter, QueuedHandler, SamplingFilter
+from core.mediagc import QUARANTINE_DIR, collect, purge_quarantine
+from core.models import (
+    ABCForm, BehaviourDailyCount, CareHome, CustomUser, IncidentReport, JobRun, LatestLogEntry, LogEntry, MissedLog,
+    Notification, OutboxMessage, Rota, ScheduledJob, SearchDocument, ServiceUser, Shift,
+)
+from core.outbox import process_outbox
+from core.pdf_optimise import optimise_file, optimise_pdf
+from core.rendering import ENGINES, LocalURLFetcher, render_pdf
+from core.routers import STICKY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware
+from core.scheduler import JOBS, Cron, Job, lease, run_due, sync_jobs
+from core.search import rebuild_index
+from core.timeline import timeline_page
+from core.warehouse import report, sync
+from core.synthetic import EMAIL_DOMAIN, HOME_PREFIX, SyntheticDataGenerator
+
+# Modules that must not be loaded just by booting Django (see core/rendering.py).
+# requests isn't listed: rest_framework.compat imports it when installed.
+HEAVY_MODULES = ["weasyprint", "xhtml2pdf", "reportlab", "imgkit", "PIL"]
+
+BOOT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver, resolve, reverse
+get_resolver().url_patterns
+resolve(reverse('search'))
+print(time.perf_counter() - start)
+print(','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+class ABCStructuredSectionsTests(TestCase):
+    def setUp(self):
+        home = CareHome.objects.create(name='ABC Home', postcode='LU1 1AB')
+        self.resident = ServiceUser.objects.create(carehome=home, first_name='Ada', last_name='Abc',
+                                                   dob=date(1950, 1, 1))
+
+    def test_migration_splits_legacy_text(self):
+        populate = import_module('core.migrations.0034_populate_abcform_structured_sections')
+        form = ABCForm.objects.create(service_user=self.resident, date_of_birth=date(1950, 1, 1), staff='Sam')
+        # A row as the old form wrote it: only the "Key: value" text columns filled in
+        ABCForm.objects.filter(pk=form.pk).update(
+            setting="Location: Lounge\nPresent: Sam\nActivity: Lunch\nthen a walk\nEnvironment: Loud",
+            antecedent="Description: Visitor left\nRoutine change: Yes\nUnexpected noise: maybe\nWaiting for: Tea",
+            behaviour="Description: Shouted", consequences="Immediate: Redirected",
+            reflection="Learnings: Warn before visits end",
+            setting_location='', antecedent_change='no',
+        )
+
+        populate.populate_structured_sections(django_apps, None)
+
+        form.refresh_from_db()
+        self.assertEqual(form.setting_location, 'Lounge')
+        self.assertEqual(form.setting_activity, 'Lunch\nthen a walk')  # multi-line values stay whole
+        self.assertEqual(form.setting_environment, 'Loud')
+        self.assertEqual(form.antecedent_description, 'Visitor left')
+        self.assertEqual((form.antecedent_change, form.antecedent_noise), ('yes', 'no'))
+        self.assertEqual(form.antecedent_waiting, 'Tea')
+        self.assertEqual(form.behaviour_description, 'Shouted')
+        self.assertEqual(form.consequence_immediate, 'Redirected')
+        self.assertEqual(form.reflection_learnings, 'Warn before visits end')
+
+    def test_form_round_trips_section_text(self):
+        populate = import_module('core.migrations.0034_populate_abcform_structured_sections')
+        data = {
+            'service_user': self.resident.pk, 'date_of_birth': '1950-01-01', 'staff': 'Sam',
+            'date_time': '2026-03-02T14:00', 'target_behaviours': ['verbal_aggression'],
+            'setting_location': 'Garden', 'setting_present': 'Sam, Alex', 'setting_activity': 'Gardening\nwith Alex',
+            'setting_environment': 'Sunny', 'antecedent_description': 'Asked to stop', 'antecedent_change': 'yes',
+            'antecedent_noise': 'no', 'antecedent_waiting': '', 'behaviour_description': 'Threw a pot',
+            'consequence_immediate': 'Gave space', 'reflection_learnings': 'Give a warning first',
+        }
+        form = ABCFormForm(data)
+        self.assertTrue(form.is_valid(), form.errors)
+        saved = form.save()
+        self.assertEqual(saved.setting.split('\n')[0], 'Location: Garden')
+
+        # The display text parses back to exactly what was entered, and the edit form shows it again
+        saved.refresh_from_db()
+        parsed = {}
+        for column, labels in populate.SECTION_FIELDS.items():
+            parsed.update(populate.parse_section(getattr(saved, column), labels))
+        self.assertEqual(parsed, {field: data[field] for field in populate.STRUCTURED_FIELDS})
+        edit = ABCFormForm(instance=saved)
+        self.assertEqual({field: edit.initial[field] for field in populate.STRUCTURED_FIELDS}, parsed)
+
+
+class BehaviourRollupTests(TestCase):
+    def setUp(self):
+        home = CareHome.objects.create(name='Rollup Home', postcode='LU1 1AB')
+        self.ada = ServiceUser.objects.create(carehome=home, first_name='Ada', last_name='Rollup', dob=date(1950, 1, 1))
+        self.bob = ServiceUser.objects.create(carehome=home, first_name='Bob', last_name='Rollup', dob=date(1950, 1, 1))
+        self.monday = timezone.make_aware(datetime(2026, 3, 2, 14))
+        self.tuesday = timezone.make_aware(datetime(2026, 3, 3, 9))
+
+    def add_form(self, service_user, date_time, behaviours):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ABCForm.objects.create(service_user=service_user, date_of_birth=date(1950, 1, 1), staff='Sam',
+                                          date_time=date_time, target_behaviours=behaviours)
+
+    def counts(self):
+        return {
+            (row.service_user_id, row.date.isoformat(), row.behaviour): row.count
+            for row in BehaviourDailyCount.objects.all()
+        }
+
+    def test_signals_follow_save_and_delete(self):
+        first = self.add_form(self.ada, self.monday, ['verbal_aggression', 'self_injury'])
+        self.add_form(self.ada, self.monday, ['verbal_aggression'])
+        self.assertEqual(self.counts(), {
+            (self.ada.pk, '2026-03-02', 'verbal_aggression'): 2,
+            (self.ada.pk, '2026-03-02', 'self_injury'): 1,
+        })
+
+        # Moving a form to another resident and day takes its counts along
+        first.service_user, first.date_time, first.target_behaviours = self.bob, self.tuesday, ['other']
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.counts(), {
+            (self.ada.pk, '2026-03-02', 'verbal_aggression'): 1,
+            (self.bob.pk, '2026-03-03', 'other'): 1,
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.counts(), {(self.ada.pk, '2026-03-02', 'verbal_aggression'): 1})
+
+    def test_counts_refresh_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            ABCForm.objects.create(service_user=self.ada, date_of_birth=date(1950, 1, 1), staff='Sam',
+                                   date_time=self.monday, target_behaviours=['other'])
+        self.assertEqual(self.counts(), {})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.counts(), {(self.ada.pk, '2026-03-02', 'other'): 1})
+
+    def test_rebuild_command(self):
+        self.add_form(self.ada, self.monday, ['verbal_aggression'])
+        self.add_form(self.bob, self.tuesday, ['other', 'other'])
+        expected = self.counts()
+        BehaviourDailyCount.objects.update(count=99)
+        BehaviourDailyCount.objects.create(service_user=self.ada, carehome=self.ada.carehome, date=date(2026, 3, 1),
+                                           behaviour='other', count=5)
+
+        out = StringIO()
+        call_command('rebuild_behaviour_counts', stdout=out)
+        self.assertEqual(self.counts(), expected)
+        self.assertIn('Rebuilt 2 daily counts from 2 ABC forms', out.getvalue())
+
+        # --since leaves earlier days alone
+        BehaviourDailyCount.objects.filter(date=date(2026, 3, 2)).update(count=7)
+        call_command('rebuild_behaviour_counts', since='2026-03-03', stdout=StringIO())
+        self.assertEqual(self.counts()[(self.ada.pk, '2026-03-02', 'verbal_aggression')], 7)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.home = CareHome.objects.create(name='Search Home', postcode='LU1 1AB')
+        other_home = CareHome.objects.create(name='Other Search Home', postcode='LU2 2AB')
+        self.staff = CustomUser.objects.create_user(
+            email='search.staff@example.com', password='x', role=CustomUser.STAFF, carehome=self.home,
+        )
+        colleague = CustomUser.objects.create_user(
+            email='search.colleague@example.com', password='x', role=CustomUser.STAFF, carehome=self.home,
+        )
+        self.lead = CustomUser.objects.create_user(
+            email='search.lead@example.com', password='x', role=CustomUser.TEAM_LEAD, carehome=self.home,
+        )
+        self.manager = CustomUser.objects.create_user(
+            email='search.manager@example.com', password='x', role=CustomUser.Manager,
+        )
+        resident = ServiceUser.objects.create(carehome=self.home, first_name='Ada', last_name='Search',
+                                              dob=date(1950, 1, 1))
+        other_resident = ServiceUser.objects.create(carehome=other_home, first_name='Bob', last_name='Search',
+                                                    dob=date(1950, 1, 1))
+
+        def entry(user, service_user, content):
+            return LogEntry.objects.create(user=user, carehome=service_user.carehome, service_user=service_user,
+                                           shift='morning', time_slot=datetime_time(9), content=content)
+
+        self.own = entry(self.staff, resident, 'Morning medication taken with breakfast')
+        self.colleagues = entry(colleague, resident, 'Refused medication at first')
+        entry(self.staff, resident, '')  # blank hourly slot
+        self.elsewhere = IncidentReport.objects.create(
+            service_user=other_resident, carehome=other_home, location='Hall', dob=date(1950, 1, 1),
+            incident_datetime=timezone.make_aware(datetime(2026, 3, 2, 14)),
+            incident_description='Medication trolley knocked over',
+        )
+
+    def search(self, user, query='medication', **params):
+        self.client.force_login(user)
+        return self.client.get(reverse('search'), {'q': query, **params}).json()
+
+    def hits(self, user, **params):
+        return {(hit['kind'], hit['id']) for hit in self.search(user, **params)['results']}
+
+    def test_hits_are_scoped_by_role(self):
+        own, colleagues = ('log', self.own.pk), ('log', self.colleagues.pk)
+        elsewhere = ('incident', self.elsewhere.pk)
+        self.assertEqual(self.hits(self.manager), {own, colleagues, elsewhere})
+        self.assertEqual(self.hits(self.lead), {own, colleagues})  # never another home's documents
+        self.assertEqual(self.hits(self.staff), {own})
+        self.assertEqual(self.hits(self.manager, kind='incident'), {elsewhere})
+
+        result = self.search(self.lead, query='breakfast')
+        self.assertEqual(result['total'], 1)
+        self.assertIn('<mark>breakfast</mark>', result['results'][0]['snippet'])
+
+    def test_index_follows_changes(self):
+        self.assertEqual(SearchDocument.objects.count(), 3)  # the blank slot has no document
+        self.own.content = 'Breakfast only'
+        self.own.save()
+        self.colleagues.delete()
+        self.assertEqual(self.hits(self.manager), {('incident', self.elsewhere.pk)})
+
+    def test_rebuild_index(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.search(self.manager)['total'], 0)
+        rebuild_index()
+        self.assertEqual(SearchDocument.objects.count(), 3)
+        self.assertEqual(self.search(self.manager)['total'], 3)
+
+
+class LogArchiveTests(TestCase):
+    def setUp(self):
+        home = CareHome.objects.create(name='Archive Home', postcode='LU1 1AB')
+        self.staff = CustomUser.objects.create_user(
+            email='archive.staff@example.com', password='x', role=CustomUser.STAFF, carehome=home,
+            first_name='Sam', last_name='Staff',
+        )
+        self.manager = CustomUser.objects.create_user(
+            email='archive.manager@example.com', password='x', role=CustomUser.Manager,
+        )
+        resident = ServiceUser.objects.create(carehome=home, first_name='Ada', last_name='Archive',
+                                              dob=date(1950, 1, 1))
+        self.log = LatestLogEntry.objects.create(user=self.staff, carehome=home, service_user=resident,
+                                                 shift='morning', status='locked')
+        LatestLogEntry.objects.filter(pk=self.log.pk).update(date=date(2025, 1, 6))
+        self.log.refresh_from_db()
+        for hour, content in ((9, 'Walked to the shops'), (8, 'Breakfast, "porridge" ☕'), (10, '')):
+            LogEntry.objects.create(user=self.staff, carehome=home, service_user=resident, shift='morning',
+                                    time_slot=datetime_time(hour), content=content, latest_log=self.log,
+                                    is_locked=True)
+        LogEntry.objects.update(date=self.log.date)
+
+    def test_pack_unpack_round_trip(self):
+        entries = list(LogEntry.objects.filter(latest_log=self.log).order_by('time_slot'))
+        unpacked = unpack_entries(self.log, pack_entries(self.log, entries))
+        fields = lambda entry: (entry.pk, entry.user_id, entry.carehome_id, entry.service_user_id, entry.shift,
+                                entry.date, entry.time_slot, entry.content, entry.latest_log_id)
+        self.assertEqual([fields(entry) for entry in unpacked], [fields(entry) for entry in entries])
+
+    def test_archive_moves_entries_and_keeps_search_documents(self):
+        self.assertEqual(archive_old_logs(days=30), (1, 3))
+        self.log.refresh_from_db()
+        self.assertIsNotNone(self.log.archived_at)
+        self.assertFalse(LogEntry.objects.filter(latest_log=self.log).exists())
+        self.assertEqual(self.log.archive.entry_count, 3)
+        self.assertEqual([entry.content for entry in get_log_entries(self.log)],
+                         ['Breakfast, "porridge" ☕', 'Walked to the shops', ''])
+        self.assertEqual(SearchDocument.objects.filter(kind=SearchDocument.KIND_LOG).count(), 2)
+        self.assertEqual(archive_old_logs(days=30), (0, 0))  # already archived
+
+    def test_delete_entries_drops_search_documents_by_default(self):
+        delete_entries(LogEntry.objects.filter(latest_log=self.log).values_list('pk', flat=True))
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_detail_view_renders_archived_log(self):
+        archive_old_logs(days=30)
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('log_detail_view', args=[self.log.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Walked to the shops')
+        self.assertContains(response, 'porridge')
+
+    def test_admin_edit_refuses_archived_log(self):
+        from core.views.logs import edit_log_entry_by_admin
+
+        archive_old_logs(days=30)
+        request = RequestFactory().get('/')
+        request.user = self.manager
+        request._messages = CookieStorage(request)
+        response = edit_log_entry_by_admin(request, self.log.pk)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('log_detail_view', args=[self.log.pk]))
+        self.assertIn('archived', str(list(request._messages)[0]))
+
+
+class AsyncAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.home = CareHome.objects.create(name='Async Home', postcode='LU1 1AB')
+        self.staff = CustomUser.objects.create_user(
+            email='async.staff@example.com', password='x', role=CustomUser.STAFF, carehome=self.home,
+            first_name='Sam', last_name='Staff',
+        )
+        self.resident = ServiceUser.objects.create(carehome=self.home, first_name='Ada', last_name='Async',
+                                                   dob=date(1950, 1, 1))
+        self.rota = Rota.objects.create(carehome=self.home, period_start=date(2026, 3, 2))
+        self.shift = Shift.objects.create(rota=self.rota, date=date(2026, 3, 2), shift_type='morning',
+                                          staff=self.staff, service_user=self.resident, notes='Cover')
+
+    def test_anonymous_requests_redirect_to_login(self):
+        for name in ('api-carehomes-list', 'api-staff-list', 'api-serviceusers-list', 'api-rota-events'):
+            with self.subTest(url_name=name):
+                response = self.client.get(reverse(name), {'carehome': self.home.pk})
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response.url.startswith(f"{resolve_url(settings.LOGIN_URL)}?next=/api/"))
+
+    async def test_decorator_runs_view_only_for_authenticated_users(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        calls = []
+
+        @async_login_required
+        async def view(request):
+            calls.append(request)
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/private/?page=2')
+        request.user = AnonymousUser()
+        response = await view(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, f"{resolve_url(settings.LOGIN_URL)}?next=/private/%3Fpage%3D2")
+        self.assertEqual(calls, [])
+
+        request.user = self.staff
+        self.assertEqual((await view(request)).content, b'ok')
+        self.assertEqual(len(calls), 1)
+
+    def test_json_is_unchanged(self):
+        self.client.force_login(self.staff)
+        params = {'carehome': self.home.pk}
+        self.assertEqual(self.client.get(reverse('api-carehomes-list')).json(), {
+            'ok': True, 'data': [{'id': self.home.pk, 'name': 'Async Home', 'postcode': 'LU1 1AB'}],
+        })
+        self.assertEqual(self.client.get(reverse('api-staff-list'), params).json(), {'ok': True, 'data': [{
+            'id': self.staff.pk, 'first_name': 'Sam', 'last_name': 'Staff', 'image': '',
+            'role': 'staff', 'name': 'Sam Staff', 'avatar': '', 'role_display': 'Staff',
+        }]})
+        self.assertEqual(self.client.get(reverse('api-serviceusers-list'), params).json(), {'ok': True, 'data': [{
+            'id': self.resident.pk, 'first_name': 'Ada', 'last_name': 'Async', 'image': '',
+            'name': 'Ada Async', 'avatar': '', 'initials': 'AA',
+        }]})
+        self.assertEqual(self.client.get(reverse('api-rota-events'), params).json(), {'ok': True, 'data': [{
+            'rota_id': self.rota.pk, 'week_start': '2026-03-02', 'status': 'draft', 'shifts': [{
+                'id': self.shift.pk, 'date': '2026-03-02', 'shift_type': 'morning', 'staff_id': self.staff.pk,
+                'service_user_id': self.resident.pk, 'notes': 'Cover',
+            }],
+        }]})
+        self.assertEqual(self.client.get(reverse('api-rota-events')).json(),
+                         {'ok': False, 'error': 'carehome parameter is required'})
+
+    def test_ajax_resident_lookups(self):
+        self.client.force_login(self.staff)
+        csrf_client = Client(enforce_csrf_checks=True)
+        csrf_client.force_login(self.staff)
+        response = csrf_client.post(reverse('fetch_service_users'), json.dumps({'carehome_ids': [self.home.pk]}),
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'users': [{'id': self.resident.pk, 'name': 'Ada Async'}]})
+        self.assertEqual(self.client.get(reverse('fetch_service_users')).status_code, 400)
+
+        url = reverse('get-service-users-by-carehome')
+        self.assertEqual(self.client.get(url, {'carehome_id': f'{self.home.pk}'}).json(),
+                         {'service_users': [{'id': self.resident.pk, 'name': 'Ada Async (AA)'}]})
+        self.assertEqual(self.client.get(url, {'carehome_id': 'x'}).status_code, 400)
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """django.setup() + URL resolution in a fresh interpreter stays cheap"""
+
+    budget_seconds = float(os.environ.get('STARTUP_BUDGET_SECONDS', '3.0'))
+
+    def boot(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='carehome_project.settings')
+        result = subprocess.run(
+            [sys.executable, '-c', BOOT_SCRIPT.format(heavy=HEAVY_MODULES)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        elapsed, loaded = result.stdout.splitlines()[-2:]
+        return float(elapsed), [m for m in loaded.split(',') if m]
+
+    def test_heavy_libraries_not_imported_at_boot(self):
+        _, loaded = self.boot()
+        self.assertEqual(loaded, [], f"imported during startup: {loaded}")
+
+    def test_boot_under_budget(self):
+        # Best of three so a cold disk cache doesn't fail the run
+        elapsed = min(self.boot()[0] for _ in range(3))
+        self.assertLess(elapsed, self.budget_seconds)
+
+
+@override_settings(DEBUG=False)
+class SyntheticDataCommandTests(TestCase):
+    options = ['--carehomes', '1', '--residents-per-home', '1', '--staff-per-home', '1', '--days', '1']
+
+    def generate(self, *extra):
+        out = StringIO()
+        call_command('generate_synthetic_data', *self.options, *extra, stdout=out)
+        return re.search(r"with password '(.+?)'", out.getvalue()).group(1)
+
+    def test_refuses_without_debug(self):
+        with self.assertRaises(CommandError):
+            self.generate()
+        self.assertFalse(CustomUser.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').exists())
+
+    def test_each_run_prints_its_own_password(self):
+        first, second = self.generate('--allow-non-debug'), self.generate('--allow-non-debug')
+        self.assertNotEqual(first, second)
+        self.assertTrue(CustomUser.objects.get(email=f'manager@{EMAIL_DOMAIN}').check_password(first))
+
+
+# ---------------------------------------------------------------------------
+# Query budgets: the number of queries a view runs must not grow with the data
+# ---------------------------------------------------------------------------
+
+class ViewRequest:
+    """How to call one URL name. Callables receive the fixtures namespace."""
+
+    def __init__(self, user='manager', method='get', args=None, params=None, json_body=None):
+        self.user = user
+        self.method = method
+        self.args = args
+        self.params = params
+        self.json_body = json_body
+
+
+def _all_home_ids(f):
+    return list(CareHome.objects.values_list('pk', flat=True))
+
+
+VIEW_REQUESTS = {
+    'login': ViewRequest(user=None),
+    'admin-dashboard': ViewRequest(),
+    'active-users': ViewRequest(),
+    'missed-logs': ViewRequest(),
+    'create-staff': ViewRequest(),
+    'carehomes-dashboard': ViewRequest(),
+    'create-carehome': ViewRequest(),
+    'service-users-dashboard': ViewRequest(),
+    'create-service-user': ViewRequest(),
+    'edit-carehome': ViewRequest(args=lambda f: [f.home.pk]),
+    'edit-service-user': ViewRequest(args=lambda f: [f.resident.pk]),
+    'staff-dashboard': ViewRequest(user='staff'),
+    'edit-staff': ViewRequest(args=lambda f: [f.staff.pk]),
+    'fill_abc_form': ViewRequest(),
+    'abc_form_list': ViewRequest(),
+    'edit_abc_form': ViewRequest(args=lambda f: [f.abc_form.pk]),
+    'view_abc_form': ViewRequest(user='abc_author', args=lambda f: [f.abc_form.pk]),
+    'fill_incident_form': ViewRequest(),
+    'create-log': ViewRequest(user='staff'),
+    'log-entry-form': ViewRequest(user='staff', args=lambda f: [f.open_log.pk]),
+    'log_detail_view': ViewRequest(args=lambda f: [f.locked_log.pk]),
+    'staff_latest_logs_view': ViewRequest(user='lead'),
+    'staff_mapping': ViewRequest(),
+    'staff-mapping': ViewRequest(),
+    'fetch_service_users': ViewRequest(method='post', json_body=lambda f: {'carehome_ids': _all_home_ids(f)}),
+    'ajax_load_service_users': ViewRequest(params=lambda f: {'carehome_ids[]': _all_home_ids(f)}),
+    'incident_report_list': ViewRequest(),
+    'edit_incident_form': ViewRequest(args=lambda f: [f.incident.pk]),
+    'view_incident_report': ViewRequest(args=lambda f: [f.incident.pk]),
+    'get-staff-by-carehome': ViewRequest(params=lambda f: {'carehome_id': f.home.pk}),
+    'get-service-users-by-carehome': ViewRequest(
+        params=lambda f: {'carehome_id': ','.join(map(str, _all_home_ids(f)))}),
+    'carehome-shift-matrix': ViewRequest(),
+    'api-carehomes-list': ViewRequest(),
+    'api-rota-events': ViewRequest(params=lambda f: {'carehome': f.home.pk}),
+    'api-staff-list': ViewRequest(params=lambda f: {'carehome': f.home.pk}),
+    'api-serviceusers-list': ViewRequest(params=lambda f: {'carehome': f.home.pk}),
+    'api-behaviour-trends': ViewRequest(),
+    'api-compliance-heatmap': ViewRequest(params=lambda f: {'carehome': f.home.pk}),
+    'api-analytics': ViewRequest(params=lambda f: {'report': 'incidents', 'by': 'carehome'}),
+    'service-user-timeline': ViewRequest(args=lambda f: [f.resident.pk]),
+    'search': ViewRequest(params=lambda f: {'q': 'medication'}),
+    'sql-profiles': ViewRequest(user='admin'),
+}
+
+# URL names with no budget, and why
+UNCHECKED_URLS = {
+    'logout': "ends the session the other requests rely on",
+    'validate-postcode': "calls the external postcodes.io API",
+    'delete-carehome': "destructive on GET",
+    'delete-service-user': "destructive on GET",
+    'delete-mapping': "destructive on GET",
+    'toggle-staff-status': "flips state on every call, so the two runs aren't comparable",
+    'download_abc_pdf': "renders a PDF (needs the WeasyPrint system libraries)",
+    'download_incident_pdf': "renders a PDF (needs the WeasyPrint system libraries)",
+    'service-user-bundle': "streams a stored PDF bundle (BundleTests)",
+    'save-log': "regenerates the shift PDF on every save",
+    'lock-log': "renders the shift PDF and changes the log's state",
+    'api-shifts-list': "creates a shift on every call",
+    'api-rota-save-draft': "creates a rota on first call only",
+    'api-rota-submit': "state transition on one rota",
+    'api-rota-publish': "state transition on one rota",
+    'api-rota-reject': "state transition on one rota",
+    'api-login': "one user lookup plus JWT signing; nothing that scales with the data",
+    'token_obtain_pair': "one user lookup plus JWT signing; nothing that scales with the data",
+    'token_refresh': "needs a refresh token; no data-dependent queries",
+}
+
+
+def _normalise_sql(sql):
+    return re.sub(r"\b\d+\b|'[^']*'", '?', sql)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every named URL in core/urls.py is requested against a small dataset and again
+    after the data has grown (more homes, and more staff/residents/history in the
+    same homes). The query count has to stay the same - if it grows, the view has
+    an N+1 and the failure lists the queries it ran.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.small = dict(residents_per_home=2, staff_per_home=2, days=2,
+                         incidents_per_resident_month=30, abc_forms_per_resident_month=30)
+        SyntheticDataGenerator(carehomes=2, seed=1, **cls.small).run()
+
+        home = CareHome.objects.filter(name__startswith=HOME_PREFIX).order_by('pk').first()
+        staff = CustomUser.objects.filter(carehome=home, role=CustomUser.STAFF).order_by('pk').first()
+        cls.f = SimpleNamespace(
+            home=home,
+            staff=staff,
+            lead=CustomUser.objects.get(carehome=home, role=CustomUser.TEAM_LEAD),
+            manager=CustomUser.objects.get(email=f'manager@{EMAIL_DOMAIN}'),
+            resident=ServiceUser.objects.filter(carehome=home).order_by('pk').first(),
+            open_log=LatestLogEntry.objects.filter(user=staff, status='incomplete').order_by('pk').first()
+            or LatestLogEntry.objects.create(user=staff, carehome=home, shift='morning',
+                                             service_user=ServiceUser.objects.filter(carehome=home).first()),
+            locked_log=LatestLogEntry.objects.filter(carehome=home, status='locked').order_by('pk').first(),
+            abc_form=ABCForm.objects.filter(
+                service_user__carehome=home, created_by__isnull=False
+            ).order_by('pk').first(),
+            incident=IncidentReport.objects.filter(carehome=home).order_by('pk').first(),
+        )
+        cls.f.abc_author = cls.f.abc_form.created_by
+        cls.f.admin = CustomUser.objects.create_user(
+            email=f'admin@{EMAIL_DOMAIN}', password='x', role=CustomUser.Manager, is_staff=True,
+        )
+        rebuild_index()
+
+    def setUp(self):
+        cache.clear()  # cached lists from other tests' (rolled back) data
+
+    def grow(self):
+        homes = list(CareHome.objects.filter(name__startswith=HOME_PREFIX))
+        SyntheticDataGenerator(homes=homes, seed=2, **self.small).run()
+        SyntheticDataGenerator(carehomes=3, seed=3, **self.small).run()
+        rebuild_index()
+
+    def call(self, name, spec):
+        client = Client()
+        if spec.user:
+            client.force_login(getattr(self.f, spec.user))
+        path = reverse(name, args=spec.args(self.f) if spec.args else None)
+        data = spec.params(self.f) if spec.params else {}
+        if spec.json_body:
+            send = lambda: client.post(path, json.dumps(spec.json_body(self.f)), content_type='application/json')
+        else:
+            send = lambda: getattr(client, spec.method)(path, data)
+
+        send()  # warm up session/content-type caches
+        with CaptureQueriesContext(connection) as queries:
+            response = send()
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_every_url_has_a_budget(self):
+        from core.urls import urlpatterns
+        names = {pattern.name for pattern in urlpatterns if getattr(pattern, 'name', None)}
+        missing = names - set(VIEW_REQUESTS) - set(UNCHECKED_URLS)
+        self.assertFalse(missing, f"add these URL names to VIEW_REQUESTS or UNCHECKED_URLS: {sorted(missing)}")
+
+    def test_query_count_does_not_grow_with_data(self):
+        before = {}
+        for name, spec in VIEW_REQUESTS.items():
+            response, queries = self.call(name, spec)
+            before[name] = (response.status_code, queries)
+
+        self.grow()
+
+        for name, spec in VIEW_REQUESTS.items():
+            with self.subTest(url_name=name):
+                status, small_queries = before[name]
+                # Anything else means the budget measured an error or redirect, not the view
+                self.assertEqual(status, 200, f"{name} returned {status} on the small dataset")
+                response, queries = self.call(name, spec)
+                self.assertEqual(response.status_code, 200,
+                                 f"{name} returned {response.status_code} on the large dataset")
+                if len(queries) > len(small_queries):
+                    repeated = Counter(_normalise_sql(sql) for sql in queries)
+                    lines = [f"{name}: {len(small_queries)} queries on the small dataset, "
+                             f"{len(queries)} after growing it. Repeated queries:"]
+                    lines += [f"  x{count} {sql}" for sql, count in repeated.most_common() if count > 1]
+                    lines.append("All queries:")
+                    lines += [f"  {i}. {sql}" for i, sql in enumerate(queries, 1)]
+                    self.fail("\n".join(lines))
+
+    def test_check_missed_logs_query_count_does_not_grow(self):
+        date = timezone.localdate()
+        with CaptureQueriesContext(connection) as small:
+            list(self.f.home.check_missed_logs(date))
+        self.grow()
+        with CaptureQueriesContext(connection) as large:
+            list(self.f.home.check_missed_logs(date))
+        self.assertEqual(len(large), len(small), "\n".join(q['sql'] for q in large.captured_queries))
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class MetricsTests(TestCase):
+    def test_metrics_needs_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics_with_token(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'carehome_db_queries_per_request', response.content)
+
+    def test_queries_per_request_recorded(self):
+        user = CustomUser.objects.create_user(email='metrics@example.com', password='x', role=CustomUser.Manager)
+        self.client.force_login(user)
+        labels = {'view': 'active-users'}
+        before = REGISTRY.get_sample_value('carehome_db_queries_per_request_count', labels) or 0
+        writes = REGISTRY.get_sample_value('carehome_last_active_writes_total') or 0
+        self.client.get(reverse('active-users'))
+        self.assertEqual(REGISTRY.get_sample_value('carehome_db_queries_per_request_count', labels), before + 1)
+        self.assertGreater(REGISTRY.get_sample_value('carehome_db_queries_per_request_sum', labels), 0)
+        self.assertEqual(REGISTRY.get_sample_value('carehome_last_active_writes_total'), writes + 1)
+
+
+class SQLProfilingTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='profiler@example.com', password='x', role=CustomUser.Manager, is_staff=True,
+        )
+        self.client.force_login(self.user)
+
+    @override_settings(SQL_PROFILING=True, SQL_PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_request_is_profiled(self):
+        self.client.get(reverse('active-users'))
+        profiles = self.client.get(reverse('sql-profiles'), {'view': 'active-users'}).json()['profiles']
+        self.assertTrue(profiles)
+        profile = profiles[0]
+        self.assertGreater(profile['query_count'], 0)
+        self.assertLessEqual(len(profile['slowest']), 5)
+        origins = [query['origin'] for query in profile['slowest'] if query['origin']]
+        self.assertTrue(origins, "no query was traced back to project code")
+
+    @override_settings(SQL_PROFILING=True, SQL_PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_request_is_not_profiled(self):
+        self.client.get(reverse('staff-dashboard'))
+        profiles = self.client.get(reverse('sql-profiles'), {'view': 'staff-dashboard'}).json()['profiles']
+        self.assertEqual(profiles, [])
+
+    def test_endpoint_is_staff_only(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(reverse('sql-profiles'))
+        self.assertEqual(response.status_code, 302)
+
+
+class LoggingTests(SimpleTestCase):
+    def record(self, name, level, msg, *args, **extra):
+        record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_sampling_uses_longest_matching_logger(self):
+        sampler = SamplingFilter({'django': 1, 'django.db.backends': 0})
+        self.assertFalse(sampler.filter(self.record('django.db.backends.schema', logging.DEBUG, 'sql')))
+        self.assertTrue(sampler.filter(self.record('django.request', logging.DEBUG, 'req')))
+        self.assertTrue(sampler.filter(self.record('core.views', logging.DEBUG, 'view')))
+
+    def test_sampling_keeps_warnings(self):
+        sampler = SamplingFilter({'core': 0})
+        self.assertTrue(sampler.filter(self.record('core.views', logging.WARNING, 'warn')))
+
+    def test_json_output_includes_extra_fields(self):
+        line = JSONFormatter().format(self.record('core.views', logging.INFO, 'Failed login %s', 1, email='a@b.c'))
+        payload = json.loads(line)
+        self.assertEqual(payload['message'], 'Failed login 1')
+        self.assertEqual(payload['email'], 'a@b.c')
+        self.assertEqual(payload['level'], 'INFO')
+
+    def test_queued_handler_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'app.jsonl')
+            handler = QueuedHandler(filename=path)
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                record = self.record('core', logging.ERROR, 'failed', exc_info=sys.exc_info())
+            handler.handle(record)
+            handler.close()
+            with open(path) as log_file:
+                payload = json.loads(log_file.readline())
+        self.assertEqual(payload['message'], 'failed')
+        self.assertIn('ValueError: boom', payload['exception'])
+
+
+@mock.patch('core.routers.replica_configured', return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    def run_request(self, request, view):
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_reads_outside_requests_use_primary(self, _):
+        self.assertEqual(self.router.db_for_read(CareHome), 'default')
+
+    def test_get_reads_from_replica(self, _):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(CareHome))
+            return HttpResponse()
+
+        response = self.run_request(RequestFactory().get('/'), view)
+        self.assertEqual(seen, ['replica'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_post_reads_primary_and_sets_sticky_cookie(self, _):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(CareHome))
+            self.router.db_for_write(CareHome)
+            return HttpResponse()
+
+        response = self.run_request(RequestFactory().post('/'), view)
+        self.assertEqual(seen, ['default'])
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_reads_after_a_write_use_primary(self, _):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(CareHome))
+            self.router.db_for_write(CareHome)
+            seen.append(self.router.db_for_read(CareHome))
+            return HttpResponse()
+
+        self.run_request(RequestFactory().get('/'), view)
+        self.assertEqual(seen, ['replica', 'default'])
+
+    def test_sticky_cookie_pins_reads_to_primary(self, _):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(CareHome))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES[STICKY_COOKIE] = str(time.time() + 60)
+        self.run_request(request, view)
+        request = RequestFactory().get('/')
+        request.COOKIES[STICKY_COOKIE] = str(time.time() - 1)
+        self.run_request(request, view)
+        self.assertEqual(seen, ['default', 'replica'])
+
+
+def _write_fake_pdf(template_name, context, target=None, **kwargs):
+    with open(target, 'wb') as pdf:
+        pdf.write(b'%PDF-1.4 test')
+
+
+@override_settings(OUTBOX_RUN_ON_COMMIT=False)
+class OutboxTests(TestCase):
+    def setUp(self):
+        home = CareHome.objects.create(
+            name='Outbox Home', postcode='LU1 1AB',
+            morning_shift_start=datetime_time(8), morning_shift_end=datetime_time(20),
+            night_shift_start=datetime_time(20), night_shift_end=datetime_time(8),
+        )
+        self.staff = CustomUser.objects.create_user(
+            email='outbox.staff@example.com', password='x', role=CustomUser.STAFF, carehome=home,
+            first_name='Sam', last_name='Staff',
+        )
+        self.lead = CustomUser.objects.create_user(
+            email='outbox.lead@example.com', password='x', role=CustomUser.TEAM_LEAD, carehome=home,
+        )
+        self.resident = ServiceUser.objects.create(
+            carehome=home, first_name='Ada', last_name='Outbox', dob=date(1950, 1, 1),
+        )
+        self.log = LatestLogEntry.objects.create(
+            user=self.staff, carehome=home, service_user=self.resident, shift='morning',
+        )
+        self.missed = MissedLog.objects.create(
+            carehome=home, service_user=self.resident, date=self.log.date, shift='morning',
+        )
+        self.client.force_login(self.staff)
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+
+    def lock(self):
+        with mock.patch('core.outbox.render_pdf') as render:
+            self.client.post(reverse('lock-log', args=[self.log.pk]))
+        render.assert_not_called()
+
+    def test_lock_only_records_side_effects(self):
+        self.lock()
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.status, 'locked')
+        self.assertFalse(self.log.log_pdf)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('topic', flat=True)),
+            ['log.notify_locked', 'log.render_pdf', 'log.resolve_missed'],
+        )
+
+    def test_worker_runs_side_effects_once(self):
+        self.lock()
+        with override_settings(MEDIA_ROOT=self.media.name), \
+                mock.patch('core.outbox.render_pdf', side_effect=_write_fake_pdf):
+            self.assertEqual(process_outbox(), (3, 0))
+            self.assertEqual(process_outbox(), (0, 0))
+
+        self.log.refresh_from_db()
+        self.missed.refresh_from_db()
+        self.assertEqual(self.log.log_pdf.name, f'log_pdfs/log_{self.log.pk}.pdf')
+        self.assertIsNotNone(self.missed.resolved_at)
+        self.assertEqual(Notification.objects.filter(user=self.lead, notif_type='log_locked').count(), 1)
+        self.assertFalse(OutboxMessage.objects.filter(processed_at__isnull=True).exists())
+
+    def test_failed_handler_is_kept_for_retry(self):
+        self.lock()
+        with mock.patch('core.outbox.render_pdf', side_effect=OSError('disk full')):
+            processed, failed = process_outbox()
+        self.assertEqual((processed, failed), (2, 1))
+
+        message = OutboxMessage.objects.get(topic='log.render_pdf')
+        self.assertIsNone(message.processed_at)
+        self.assertEqual(message.attempts, 1)
+        self.assertIn('disk full', message.last_error)
+        self.assertGreater(message.available_at, timezone.now())
+
+    def test_rerender_of_archived_log_keeps_its_entries(self):
+        LogEntry.objects.create(
+            user=self.staff, carehome=self.staff.carehome, service_user=self.resident, shift='morning',
+            time_slot=datetime_time(8), latest_log=self.log, content='Breakfast eaten',
+        )
+        self.lock()
+        with override_settings(MEDIA_ROOT=self.media.name), \
+                mock.patch('core.outbox.render_pdf', side_effect=_write_fake_pdf):
+            process_outbox()
+        archive_shift(self.log)
+        outbox.enqueue('log.render_pdf', latest_log_id=self.log.pk)
+
+        rendered = []
+        with override_settings(MEDIA_ROOT=self.media.name), mock.patch(
+            'core.outbox.render_pdf',
+            side_effect=lambda template, context, target, **kwargs: rendered.append(list(context['log_entries'])),
+        ):
+            self.assertEqual(process_outbox(), (1, 0))
+        self.assertEqual([entry.content for entry in rendered[0]], ['Breakfast eaten'])
+
+    def test_autosave_coalesces_pdf_renders(self):
+        entry = LogEntry.objects.create(
+            user=self.staff, carehome=self.staff.carehome, service_user=self.resident, shift='morning',
+            date=self.log.date, time_slot=datetime_time(8), latest_log=self.log,
+        )
+        for text in ('first', 'second', 'third'):
+            self.client.post(reverse('save-log', args=[entry.pk]), {'content': text})
+        self.assertEqual(OutboxMessage.objects.filter(topic='log.render_pdf').count(), 1)
+
+
+class ListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.homes = [
+            CareHome.objects.create(
+                name=name, postcode='LU1 1AB',
+                morning_shift_start=datetime_time(8), morning_shift_end=datetime_time(20),
+                night_shift_start=datetime_time(20), night_shift_end=datetime_time(8),
+            )
+            for name in ('Cache Home A', 'Cache Home B')
+        ]
+        self.resident = ServiceUser.objects.create(
+            carehome=self.homes[0], first_name='Ada', last_name='Cache', dob=date(1950, 1, 1),
+        )
+        self.manager = CustomUser.objects.create_user(
+            email='cache.manager@example.com', password='x', role=CustomUser.Manager,
+            first_name='Max', last_name='Manager',
+        )
+
+    def test_lists_are_served_from_cache(self):
+        self.assertEqual(carehome_list(), self.homes)
+        self.assertEqual(residents_for([self.homes[0].pk, self.homes[1].pk]), [self.resident])
+        with self.assertNumQueries(0):
+            self.assertEqual(carehome_list(), self.homes)
+            self.assertEqual(residents_for([self.homes[0].pk, self.homes[1].pk]), [self.resident])
+
+    def test_saving_and_deleting_invalidates(self):
+        carehome_list()
+        residents_for([self.homes[0].pk])
+
+        self.homes[1].name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.homes[1].save()
+        self.assertEqual(carehome_list()[1].name, 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = ServiceUser.objects.create(
+                carehome=self.homes[0], first_name='Bob', last_name='Cache', dob=date(1950, 1, 1),
+            )
+        self.assertEqual(residents_for([self.homes[0].pk]), [self.resident, other])
+
+        # Moving a resident updates both homes' lists
+        residents_for([self.homes[1].pk])
+        other.carehome = self.homes[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            other.save()
+        self.assertEqual(residents_for([self.homes[0].pk]), [self.resident])
+        self.assertEqual(residents_for([self.homes[1].pk]), [other])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(residents_for([self.homes[1].pk]), [])
+
+    def test_invalidates_only_after_commit(self):
+        carehome_list()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.homes[1].name = 'Renamed'
+            self.homes[1].save()
+            # Still uncommitted, so a read now must not become the new version's entry
+            with self.assertNumQueries(0):
+                self.assertEqual(carehome_list()[1].name, 'Cache Home B')
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(carehome_list()[1].name, 'Renamed')
+
+    def test_forms_render_choices_from_cache(self):
+        carehome_list()
+        residents_for([home.pk for home in self.homes])
+        with self.assertNumQueries(0):
+            StaffCreationForm()['carehome'].as_widget()
+            MappingForm()['carehomes'].as_widget()
+        form = MappingForm()
+        self.assertEqual([label for _, label in form.fields['carehomes'].choices], ['Cache Home A', 'Cache Home B'])
+
+        form = StaffCreationForm(data={'carehome': self.homes[1].pk})
+        form.is_valid()
+        self.assertEqual(form.cleaned_data['carehome'], self.homes[1])
+
+    def test_json_endpoints_use_cache(self):
+        self.client.force_login(self.manager)
+        url = reverse('get-service-users-by-carehome')
+        response = self.client.get(url, {'carehome_id': f'{self.homes[0].pk},{self.homes[1].pk}'})
+        self.assertEqual(response.json(), {'service_users': [
+            {'id': self.resident.pk, 'name': self.resident.get_formatted_name()},
+        ]})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceUser.objects.create(carehome=self.homes[1], first_name='Cy', last_name='Cache', dob=date(1950, 1, 1))
+        response = self.client.get(reverse('ajax_load_service_users'), {'carehome_ids[]': [self.homes[1].pk]})
+        self.assertEqual([user['name'] for user in response.json()['service_users']], ['Cy Cache'])
+
+
+class LocalURLFetcherTests(SimpleTestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        os.makedirs(os.path.join(media.name, 'incident_images'))
+        with open(os.path.join(media.name, 'incident_images', 'bruise 1.jpg'), 'wb') as image:
+            image.write(b'jpeg bytes')
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.fetcher = LocalURLFetcher('https://carehome.example.com')
+
+    def test_media_is_read_from_storage_once_per_render(self):
+        url = 'https://carehome.example.com/media/incident_images/bruise%201.jpg'
+        with mock.patch('core.rendering.default_storage.open', wraps=default_storage.open) as storage_open:
+            first = self.fetcher(url)
+            second = self.fetcher(url)
+        self.assertEqual(first['string'], b'jpeg bytes')
+        self.assertEqual(first['mime_type'], 'image/jpeg')
+        self.assertEqual(second, first)
+        self.assertEqual(storage_open.call_count, 1)
+
+    def test_static_falls_back_to_finders(self):
+        with mock.patch('core.rendering.staticfiles_storage.exists', return_value=False), \
+                mock.patch('core.rendering.finders.find', return_value=__file__):
+            result = self.fetcher('https://carehome.example.com/static/css/pdf.css')
+        with open(__file__, 'rb') as source:
+            self.assertEqual(result['string'], source.read())
+
+    def test_never_requests_other_pages_from_own_server(self):
+        with self.assertRaises(ValueError):
+            self.fetcher('https://carehome.example.com/incident-pdf/1/')
+        with self.assertRaises(FileNotFoundError):
+            self.fetcher('https://carehome.example.com/media/incident_images/missing.jpg')
+
+
+class PDFEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.latest_log = LatestLogEntry(
+            carehome=CareHome(name='Engine House'),
+            service_user=ServiceUser(first_name='Ada', last_name='Engine'),
+            user=CustomUser(first_name='Sam', last_name='Staff'),
+            date=date(2026, 1, 5), day_of_week='Monday', shift='morning', staff_name='Sam Staff',
+        )
+        self.entries = [
+            LogEntry(time_slot=datetime_time(8), content='Breakfast <eaten>\nthen a walk'),
+            LogEntry(time_slot=datetime_time(9), content=''),
+        ]
+
+    def text(self, pdf):
+        return PdfReader(BytesIO(pdf)).pages[0].extract_text()
+
+    def test_reportlab_log_pdf_has_the_template_content(self):
+        pdf = render_pdf('pdf_templates/log_pdf.html',
+                         {'latest_log': self.latest_log, 'log_entries': self.entries}, engine='reportlab')
+        text = self.text(pdf)
+        for expected in ("Service User's Daily Recording Sheet", 'Care Home: Engine House', 'Staff: Sam Staff',
+                         'Monday', 'SS', 'Morning', '08:00', 'Breakfast <eaten>', 'then a walk', '09:00'):
+            self.assertIn(expected, text)
+
+        pdf = render_pdf('pdf_templates/log_pdf.html', {'latest_log': self.latest_log, 'log_entries': []},
+                         engine='reportlab')
+        self.assertIn('No log entries found for this shift.', self.text(pdf))
+
+    def test_writes_to_target(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'log.pdf')
+            result = render_pdf('pdf_templates/log_pdf.html',
+                                {'latest_log': self.latest_log, 'log_entries': self.entries}, path,
+                                engine='reportlab')
+            self.assertIsNone(result)
+            with open(path, 'rb') as pdf:
+                self.assertTrue(pdf.read().startswith(b'%PDF'))
+
+    def test_falls_back_to_weasyprint(self):
+        with mock.patch.object(ENGINES['weasyprint'], 'render', return_value=b'%PDF weasy') as weasyprint:
+            # No ReportLab layout for this template
+            self.assertEqual(render_pdf('pdf_templates/incident_pdf.html', {}, engine='reportlab'), b'%PDF weasy')
+            # Layout failed
+            with mock.patch.dict('core.pdf_layouts.LAYOUTS', {'pdf_templates/log_pdf.html': mock.Mock(
+                    side_effect=ValueError('too tall'))}):
+                self.assertEqual(render_pdf('pdf_templates/log_pdf.html', {}, engine='reportlab'), b'%PDF weasy')
+        self.assertEqual(weasyprint.call_count, 2)
+
+
+def _blank_pdf(pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    output = BytesIO()
+    writer.write(output)
+    return ContentFile(output.getvalue())
+
+
+class BundleTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.home = CareHome.objects.create(
+            name='Bundle Home', postcode='LU1 1AB',
+            morning_shift_start=datetime_time(8), morning_shift_end=datetime_time(20),
+            night_shift_start=datetime_time(20), night_shift_end=datetime_time(8),
+        )
+        staff = CustomUser.objects.create_user(
+            email='bundle.staff@example.com', password='x', role=CustomUser.STAFF, carehome=self.home,
+            first_name='Sam', last_name='Staff',
+        )
+        self.lead = CustomUser.objects.create_user(
+            email='bundle.lead@example.com', password='x', role=CustomUser.TEAM_LEAD, carehome=self.home,
+            first_name='Lee', last_name='Lead',
+        )
+        self.resident = ServiceUser.objects.create(
+            carehome=self.home, first_name='Ada', last_name='Bundle', dob=date(1950, 1, 1),
+        )
+        today = timezone.localdate()
+        self.year, self.month = today.year, today.month
+
+        night = LatestLogEntry.objects.create(
+            user=staff, carehome=self.home, service_user=self.resident, shift='night', status='locked',
+        )
+        night.log_pdf.save('log_night.pdf', _blank_pdf(2))
+        morning = LatestLogEntry.objects.create(
+            user=staff, carehome=self.home, service_user=self.resident, shift='morning', status='locked',
+        )
+        morning.log_pdf.save('log_morning.pdf', _blank_pdf(1))
+        self.incident = IncidentReport.objects.create(
+            staff=staff, service_user=self.resident, carehome=self.home, location='Lounge',
+            incident_datetime=timezone.make_aware(datetime.combine(today, datetime_time(12))), dob=date(1950, 1, 1),
+        )
+        self.incident.pdf_file.save('incident.pdf', _blank_pdf(3))
+        # Unlocked logs and documents without a PDF aren't bundled
+        LatestLogEntry.objects.create(user=self.lead, carehome=self.home, service_user=self.resident, shift='morning')
+
+        self.url = reverse('service-user-bundle', args=[self.resident.pk, self.year, self.month])
+        self.client.force_login(self.lead)
+
+    def fetch(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return PdfReader(BytesIO(b''.join(response.streaming_content)))
+
+    def test_bundle_has_contents_outline_and_members_in_order(self):
+        bundle = self.fetch()
+        self.assertEqual(len(bundle.pages), 1 + 1 + 3 + 2)
+        contents = bundle.pages[0].extract_text()
+        self.assertIn('Ada Bundle', contents)
+        self.assertLess(contents.index('08:00'), contents.index('12:00'))
+        self.assertLess(contents.index('12:00'), contents.index('20:00'))
+
+        outline = bundle.outline
+        self.assertEqual(outline[0].title, 'Contents')
+        day = outline[2]
+        self.assertEqual([item.title for item in day], ['08:00 Shift log', '12:00 Incident report', '20:00 Shift log'])
+        self.assertEqual([bundle.get_destination_page_number(item) for item in day], [1, 2, 5])
+
+    def test_bundle_is_cached_until_a_member_changes(self):
+        self.fetch()
+        with mock.patch('core.bundles.build_bundle') as build:
+            self.fetch()
+        build.assert_not_called()
+
+        self.incident.pdf_file.delete(save=False)
+        self.incident.pdf_file.save('incident.pdf', _blank_pdf(1))
+        self.assertEqual(len(self.fetch().pages), 1 + 1 + 1 + 2)
+        _, files = default_storage.listdir(f'bundles/{self.resident.pk}')
+        self.assertEqual(len(files), 1)
+
+    def test_other_homes_and_staff_cannot_download(self):
+        other_home = CareHome.objects.create(name='Other Home', postcode='LU1 1AB')
+        other_lead = CustomUser.objects.create_user(
+            email='other.lead@example.com', password='x', role=CustomUser.TEAM_LEAD, carehome=other_home,
+        )
+        self.client.force_login(other_lead)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        self.client.force_login(CustomUser.objects.get(email='bundle.staff@example.com'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_out_of_range_dates_are_not_found(self):
+        for year, month in ((0, self.month), (10000, self.month), (self.year, 0), (self.year, 13)):
+            url = reverse('service-user-bundle', args=[self.resident.pk, year, month])
+            self.assertEqual(self.client.get(url).status_code, 404, (year, month))
+
+
+def _photo_pdf(px=2400):
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    photo = Image.effect_noise((px, px * 2 // 3), 60).convert('RGB')
+    output = BytesIO()
+    pdf = canvas.Canvas(output)
+    pdf.drawString(50, 800, 'Incident report')
+    pdf.drawImage(ImageReader(photo), 50, 400, width=300, height=200)
+    pdf.save()
+    return output.getvalue()
+
+
+class PDFOptimiseTests(SimpleTestCase):
+    def test_downsamples_photos_and_keeps_text(self):
+        original = _photo_pdf()
+        optimised = optimise_pdf(original, max_image_px=800)
+        self.assertLess(len(optimised), len(original) / 5)
+        page = PdfReader(BytesIO(optimised)).pages[0]
+        self.assertEqual(max(page.images[0].image.size), 800)
+        self.assertIn('Incident report', page.extract_text())
+
+    def test_keeps_original_when_it_cannot_shrink(self):
+        already_small = optimise_pdf(_photo_pdf(), max_image_px=800)
+        self.assertIs(optimise_pdf(already_small, max_image_px=800), already_small)
+
+    def test_command_rewrites_in_place_and_reports(self):
+        with tempfile.TemporaryDirectory() as media:
+            os.makedirs(os.path.join(media, 'incident_reports'))
+            path = os.path.join(media, 'incident_reports', 'incident_report_1.pdf')
+            with open(path, 'wb') as pdf:
+                pdf.write(_photo_pdf())
+            os.chmod(path, 0o644)
+            with open(os.path.join(media, 'incident_reports', 'broken.pdf'), 'wb') as pdf:
+                pdf.write(b'not a pdf')
+            before = os.path.getsize(path)
+
+            _, size, optimised_size, error = optimise_file(path, dry_run=True)
+            self.assertEqual((size, error), (before, None))
+            self.assertLess(optimised_size, before)
+            self.assertEqual(os.path.getsize(path), before)
+
+            out, err = StringIO(), StringIO()
+            with override_settings(MEDIA_ROOT=media):
+                call_command('optimise_pdfs', '--workers', '2', '--max-image-px', '800', stdout=out, stderr=err)
+            self.assertLess(os.path.getsize(path), before)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+            self.assertIn('by rewriting 1 of 2 files; 1 failed', out.getvalue())
+            self.assertIn('broken.pdf', err.getvalue())
+
+
+class MediaGCTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.home = CareHome.objects.create(name='GC Home', postcode='LU1 1AB')
+        self.home.picture.save('old.png', ContentFile(b'old picture'))
+        self.old_picture = self.home.picture.name
+        self.home.picture.save('new.png', ContentFile(b'new picture'))
+        default_storage.save('bundles/1/2026-01-abc.pdf', ContentFile(b'bundle'))
+        default_storage.save('log_pdfs/log_1.pdf', ContentFile(b'old pdf variant'))
+        self.recent = default_storage.save('log_pdfs/log_2.pdf', ContentFile(b'still being saved'))
+
+        two_days_ago = time.time() - 48 * 3600
+        for name in (self.old_picture, self.home.picture.name, 'bundles/1/2026-01-abc.pdf', 'log_pdfs/log_1.pdf'):
+            os.utime(default_storage.path(name), (two_days_ago, two_days_ago))
+
+    def test_replacing_a_file_leaves_the_old_one_for_gc(self):
+        self.assertTrue(default_storage.exists(self.old_picture))
+
+    def test_quarantines_only_old_unreferenced_files(self):
+        out = StringIO()
+        call_command('gc_media', stdout=out)
+        self.assertIn('Quarantined 2 orphaned files', out.getvalue())
+
+        quarantine = os.path.join(self.media, QUARANTINE_DIR, date.today().strftime('%Y%m%d'))
+        for name in (self.old_picture, 'log_pdfs/log_1.pdf'):
+            self.assertFalse(default_storage.exists(name))
+            self.assertTrue(os.path.isfile(os.path.join(quarantine, name)))
+        for name in (self.home.picture.name, self.recent, 'bundles/1/2026-01-abc.pdf'):
+            self.assertTrue(default_storage.exists(name))
+
+        # Quarantined files aren't scanned again
+        self.assertEqual(collect(self.media)['orphans'], 0)
+
+    def test_dry_run_and_delete(self):
+        self.assertEqual(collect(self.media, dry_run=True)['orphans'], 2)
+        self.assertTrue(default_storage.exists('log_pdfs/log_1.pdf'))
+
+        totals = collect(self.media, quarantine=False, batch_size=1)
+        self.assertEqual(totals['removed'], 2)
+        self.assertFalse(default_storage.exists('log_pdfs/log_1.pdf'))
+        self.assertFalse(os.path.exists(os.path.join(self.media, QUARANTINE_DIR)))
+
+    def test_batches_are_rechecked_before_removal(self):
+        # A file that gained a reference after the index was built
+        with mock.patch('core.mediagc.referenced_files', return_value=set()):
+            totals = collect(self.media, quarantine=False)
+        self.assertEqual((totals['removed'], totals['kept']), (2, 1))
+        self.assertTrue(default_storage.exists(self.home.picture.name))
+
+    def test_purges_old_quarantine_days(self):
+        for day in ('20260101', '20261001'):
+            os.makedirs(os.path.join(self.media, QUARANTINE_DIR, day))
+        self.assertEqual(purge_quarantine(self.media, 30, today=date(2026, 10, 19)), 1)
+        self.assertEqual(os.listdir(os.path.join(self.media, QUARANTINE_DIR)), ['20261001'])
+
+
+class AutoLockTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name, LOG_PDF_ENGINE='reportlab')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.home = CareHome.objects.create(
+            name='Auto-lock Home', postcode='LU1 1AB',
+            morning_shift_start=datetime_time(8), morning_shift_end=datetime_time(20),
+            night_shift_start=datetime_time(20), night_shift_end=datetime_time(8),
+        )
+        staff = CustomUser.objects.create_user(
+            email='autolock.staff@example.com', password='x', role=CustomUser.STAFF, carehome=self.home,
+            first_name='Sam', last_name='Staff',
+        )
+        resident = ServiceUser.objects.create(
+            carehome=self.home, first_name='Ada', last_name='Autolock', dob=date(1950, 1, 1),
+        )
+        self.day = date(2026, 3, 10)
+
+        def log(shift, day):
+            latest_log = LatestLogEntry.objects.create(
+                user=staff, carehome=self.home, service_user=resident, shift=shift,
+            )
+            LatestLogEntry.objects.filter(pk=latest_log.pk).update(date=day)
+            LogEntry.objects.create(
+                user=staff, carehome=self.home, service_user=resident, shift=shift, date=day,
+                time_slot=datetime_time(9), content='Settled', latest_log=latest_log,
+            )
+            return latest_log
+
+        self.morning = log('morning', self.day)
+        self.night = log('night', self.day)
+        self.missed = MissedLog.objects.create(
+            carehome=self.home, service_user=resident, date=self.day, shift='morning',
+        )
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, datetime_time(hour, minute)))
+
+    def test_last_ended(self):
+        grace = timezone.timedelta(minutes=30)
+        next_day = date(2026, 3, 11)
+        self.assertEqual(last_ended(self.home, self.at(self.day, 20, 10), grace), (date(2026, 3, 9), date(2026, 3, 9)))
+        self.assertEqual(last_ended(self.home, self.at(self.day, 20, 30), grace), (self.day, date(2026, 3, 9)))
+        self.assertEqual(last_ended(self.home, self.at(next_day, 8, 30), grace), (self.day, self.day))
+
+    def test_locks_ended_shifts_and_renders_their_pdfs(self):
+        totals = auto_lock(now=self.at(self.day, 21), workers=1)
+        self.assertEqual((totals['locked'], totals['rendered'], totals['errors']), (1, 1, []))
+
+        self.morning.refresh_from_db()
+        self.night.refresh_from_db()
+        self.assertEqual(self.morning.status, 'locked')
+        self.assertEqual(self.morning.log_pdf.name, f'log_pdfs/log_{self.morning.pk}.pdf')
+        self.assertIn('Settled', PdfReader(self.morning.log_pdf.path).pages[0].extract_text())
+        self.assertFalse(self.morning.log_entries.filter(is_locked=False).exists())
+        self.missed.refresh_from_db()
+        self.assertIsNotNone(self.missed.resolved_at)
+        # The night shift is still running
+        self.assertEqual(self.night.status, 'incomplete')
+
+        # Running again changes nothing
+        totals = auto_lock(now=self.at(self.day, 21, 15), workers=1)
+        self.assertEqual((totals['locked'], totals['to_render']), (0, 0))
+
+    def test_renders_pdfs_missing_from_earlier_runs(self):
+        LatestLogEntry.objects.filter(pk=self.night.pk).update(status='locked')
+        OutboxMessage.objects.create(topic='log.render_pdf', payload={'latest_log_id': self.morning.pk})
+
+        totals = auto_lock(now=self.at(date(2026, 3, 11), 9), workers=1)
+        # The morning log's PDF is left to the outbox worker that is due to render it
+        self.assertEqual((totals['locked'], totals['to_render'], totals['rendered']), (1, 1, 1))
+        self.night.refresh_from_db()
+        self.assertTrue(self.night.log_pdf)
+
+    def test_dry_run_and_lookback(self):
+        out = StringIO()
+        with mock.patch('core.autolock.timezone.now', return_value=self.at(self.day, 21)):
+            call_command('auto_lock_logs', '--dry-run', stdout=out)
+        self.assertIn('Would lock 1 logs and render 1 PDFs', out.getvalue())
+        self.assertFalse(LatestLogEntry.objects.filter(status='locked').exists())
+
+        later = self.at(date(2026, 3, 30), 12)
+        self.assertEqual(auto_lock(now=later, lookback_days=7, dry_run=True)['locked'], 0)
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.now = timezone.make_aware(datetime(2026, 3, 10, 9, 0))
+        jobs = mock.patch.dict(JOBS, {
+            'tick': Job('tick', Cron('*/15 * * * *'), lambda: self.calls.append('tick'), 60),
+            'broken': Job('broken', Cron('0 3 * * *'), lambda: 1 / 0, 60),
+        }, clear=True)
+        jobs.start()
+        self.addCleanup(jobs.stop)
+
+    def local(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    def test_cron_next_after(self):
+        at = self.local(2026, 3, 10, 9, 7, 30)
+        self.assertEqual(Cron('*/15 * * * *').next_after(at), self.local(2026, 3, 10, 9, 15))
+        self.assertEqual(Cron('30 2 * * *').next_after(at), self.local(2026, 3, 11, 2, 30))
+        # 2026-03-10 is a Tuesday; 0 and 7 are both Sunday
+        self.assertEqual(Cron('0 9 * * 0').next_after(at), self.local(2026, 3, 15, 9, 0))
+        self.assertEqual(Cron('0 9 * * 7').next_after(at), self.local(2026, 3, 15, 9, 0))
+        self.assertEqual(Cron('0 0 1 1-3/2 *').next_after(at), self.local(2027, 1, 1, 0, 0))
+        # Day of month or day of week when both are given
+        self.assertEqual(Cron('0 0 31 * 3').next_after(at), self.local(2026, 3, 11, 0, 0))
+        for bad in ('* * * *', '60 * * * *', '0 0 30 2 *'):
+            with self.assertRaises(ValueError):
+                Cron(bad).next_after(at)
+
+    def test_runs_due_jobs_once_across_instances(self):
+        sync_jobs(self.now)
+        self.assertEqual(ScheduledJob.objects.get(name='tick').next_run_at, self.local(2026, 3, 10, 9, 15))
+
+        later = self.local(2026, 3, 10, 9, 20)
+        runs = run_due('host-a:1', later)
+        self.assertEqual([run.job.name for run in runs], ['tick'])
+        # A second instance looking at the same moment finds nothing due
+        self.assertEqual(run_due('host-b:1', later), [])
+        self.assertEqual(self.calls, ['tick'])
+
+        row = ScheduledJob.objects.get(name='tick')
+        self.assertEqual(row.next_run_at, self.local(2026, 3, 10, 9, 30))
+        self.assertTrue(row.last_succeeded)
+        self.assertIsNotNone(row.last_duration)
+        self.assertEqual(row.lease_owner, '')
+
+    def test_records_failures(self):
+        sync_jobs(self.now)
+        run_due('host-a:1', self.local(2026, 3, 11, 3, 0))
+        run = JobRun.objects.get(job__name='broken')
+        self.assertFalse(run.succeeded)
+        self.assertIn('ZeroDivisionError', run.error)
+        self.assertEqual(ScheduledJob.objects.get(name='broken').next_run_at, self.local(2026, 3, 12, 3, 0))
+
+    def test_lease_excludes_other_instances_until_it_expires(self):
+        sync_jobs(self.now)
+        tick = JOBS['tick']
+        with lease(tick, 'host-a:1') as held:
+            self.assertTrue(held)
+            with lease(tick, 'host-b:1') as other:
+                self.assertFalse(other)
+            # A lease left behind by a crashed instance runs out
+            ScheduledJob.objects.filter(name='tick').update(lease_expires_at=timezone.now() - timezone.timedelta(1))
+            with lease(tick, 'host-b:1') as other:
+                self.assertTrue(other)
+
+    @override_settings(PGBOUNCER_TRANSACTION_POOLING=True)
+    def test_pooled_postgres_uses_the_row_lease(self):
+        sync_jobs(self.now)
+        with mock.patch('core.scheduler.connection') as pooled:
+            pooled.vendor = 'postgresql'
+            with lease(JOBS['tick'], 'host-a:1') as held:
+                self.assertTrue(held)
+                self.assertEqual(ScheduledJob.objects.get(name='tick').lease_owner, 'host-a:1')
+        pooled.cursor.assert_not_called()
+
+    def test_command_runs_a_job_on_demand(self):
+        out = StringIO()
+        call_command('run_scheduler', '--run', 'tick', stdout=out)
+        self.assertEqual(self.calls, ['tick'])
+        self.assertIn('tick ran in', out.getvalue())
+        call_command('run_scheduler', '--list', stdout=out)
+        self.assertIn('*/15 * * * *', out.getvalue())
+
+
+class ComplianceHeatmapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.home = CareHome.objects.create(name='Compliance Home', postcode='LU1 1AB')
+        other = CareHome.objects.create(name='Other Home', postcode='LU1 1AC')
+        self.manager = CustomUser.objects.create_user(
+            email='compliance.manager@example.com', password='x', role=CustomUser.Manager,
+        )
+        self.other_lead = CustomUser.objects.create_user(
+            email='compliance.lead@example.com', password='x', role=CustomUser.TEAM_LEAD, carehome=other,
+        )
+        self.ada, self.bob = (
+            ServiceUser.objects.create(carehome=self.home, first_name=name, last_name='Compliance', dob=date(1950, 1, 1))
+            for name in ('Ada', 'Bob')
+        )
+        self.day = timezone.localdate() - timezone.timedelta(days=1)
+        MissedLog.objects.create(carehome=self.home, service_user=self.ada, date=self.day, shift='morning')
+        MissedLog.objects.create(carehome=self.home, service_user=self.ada, date=self.day, shift='night',
+                                 resolved_at=timezone.now())
+        self.client.force_login(self.manager)
+
+    def get(self, **params):
+        params.setdefault('carehome', self.home.pk)
+        params.setdefault('date_from', (self.day - timezone.timedelta(days=1)).isoformat())
+        params.setdefault('date_to', self.day.isoformat())
+        return self.client.get(reverse('api-compliance-heatmap'), params)
+
+    def test_matrix_and_percentages(self):
+        data = self.get().json()
+        self.assertEqual([resident['id'] for resident in data['residents']], [self.ada.pk, self.bob.pk])
+        self.assertEqual(data['missed'], [[0, 0], [2, 0]])
+        self.assertEqual(data['compliance'], {'home': 75.0, 'residents': [50.0, 100.0], 'days': [100.0, 50.0]})
+        self.assertEqual(data['total_missed'], 2)
+
+    def test_days_are_cached_until_a_missed_log_changes(self):
+        self.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.get()
+        self.assertFalse([q for q in queries.captured_queries if 'core_missedlog' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MissedLog.objects.create(carehome=self.home, service_user=self.bob, date=self.day, shift='night')
+            # Not committed yet, so the cached day is still served
+            self.assertEqual(self.get().json()['missed'], [[0, 0], [2, 0]])
+        self.assertEqual(self.get().json()['missed'], [[0, 0], [2, 1]])
+
+    def test_today_is_never_cached(self):
+        today = timezone.localdate()
+        self.get(date_to=today.isoformat())
+        # As the scheduler writes them: another process, so nothing here is invalidated
+        MissedLog.objects.bulk_create([MissedLog(carehome=self.home, service_user=self.bob, date=today, shift='night')])
+        self.assertEqual(self.get(date_to=today.isoformat()).json()['missed'], [[0, 0], [2, 0], [0, 1]])
+        with CaptureQueriesContext(connection) as queries:
+            self.get(date_to=today.isoformat())
+        self.assertEqual(len([q for q in queries.captured_queries if 'core_missedlog' in q['sql']]), 1)
+
+    def test_access_and_validation(self):
+        self.client.force_login(self.other_lead)
+        self.assertEqual(self.get().status_code, 404)
+        self.client.force_login(self.manager)
+        self.assertEqual(self.get(date_from='2020-01-01').status_code, 400)
+        self.assertEqual(self.get(carehome='x').status_code, 400)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        home = CareHome.objects.create(name='Timeline Home', postcode='LU1 1AB')
+        staff = CustomUser.objects.create_user(
+            email='timeline.staff@example.com', password='x', role=CustomUser.STAFF, carehome=home,
+            first_name='Sam', last_name='Staff',
+        )
+        self.lead = CustomUser.objects.create_user(
+            email='timeline.lead@example.com', password='x', role=CustomUser.TEAM_LEAD, carehome=home,
+        )
+        self.resident = ServiceUser.objects.create(
+            carehome=home, first_name='Ada', last_name='Timeline', dob=date(1950, 1, 1),
+        )
+        other = ServiceUser.objects.create(carehome=home, first_name='Bob', last_name='Other', dob=date(1950, 1, 1))
+        rota = Rota.objects.create(carehome=home, period_start=date(2026, 3, 1), status=Rota.STATUS_PUBLISHED)
+        draft = Rota.objects.create(carehome=home, period_start=date(2026, 3, 1), version=2)
+
+        def at(day, hour):
+            return timezone.make_aware(datetime(2026, 3, day, hour))
+
+        for day in (1, 2, 3):
+            log = LatestLogEntry.objects.create(
+                user=staff, carehome=home, service_user=self.resident, shift='morning',
+            )
+            LatestLogEntry.objects.filter(pk=log.pk).update(date=date(2026, 3, day))
+            MissedLog.objects.create(carehome=home, service_user=self.resident, date=date(2026, 3, day), shift='night')
+            Shift.objects.create(rota=rota, date=date(2026, 3, day), shift_type='morning', service_user=self.resident,
+                                 staff=staff)
+            Shift.objects.create(rota=draft, date=date(2026, 3, day), shift_type='night', service_user=self.resident)
+            IncidentReport.objects.create(
+                staff=staff, service_user=self.resident, carehome=home, location='Lounge',
+                incident_datetime=at(day, 8), dob=date(1950, 1, 1),
+            )
+            ABCForm.objects.create(service_user=self.resident, date_of_birth=date(1950, 1, 1), date_time=at(day, 14),
+                                   staff='Sam Staff', target_behaviours=['verbal_aggression'])
+        MissedLog.objects.create(carehome=home, service_user=other, date=date(2026, 3, 3), shift='night')
+
+    def test_pages_merge_all_streams_newest_first(self):
+        everything = timeline_page(self.resident, limit=100)
+        self.assertIsNone(everything['next_cursor'])
+        items = everything['items']
+        self.assertEqual([item['kind'] for item in items[:5]], ['missed', 'abc_form', 'shift', 'log', 'incident'])
+        self.assertEqual(len(items), 15)  # draft rota shifts and other residents are left out
+        self.assertEqual(items[2]['at'], items[4]['at'])  # the 08:00 incident ties with the morning shift
+
+        paged, cursor = [], None
+        while True:
+            page = timeline_page(self.resident, cursor=cursor, limit=4)
+            paged += page['items']
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(paged, items)
+
+    def test_each_page_costs_the_same_queries(self):
+        first = timeline_page(self.resident, limit=3)
+        with CaptureQueriesContext(connection) as queries:
+            timeline_page(self.resident, cursor=first['next_cursor'], limit=3)
+        self.assertEqual(len(queries), 5)
+
+    def test_view(self):
+        self.client.force_login(self.lead)
+        url = reverse('service-user-timeline', args=[self.resident.pk])
+        data = self.client.get(url, {'kinds': 'incident,abc_form', 'limit': 4}).json()
+        self.assertEqual({item['kind'] for item in data['items']}, {'incident', 'abc_form'})
+        data = self.client.get(url, {'kinds': 'incident,abc_form', 'cursor': data['next_cursor']}).json()
+        self.assertEqual(len(data['items']), 2)
+        self.assertEqual(self.client.get(url, {'cursor': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'kinds': 'emails'}).status_code, 400)
+
+
+class WarehouseTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'analytics.sqlite3')
+        settings_override = override_settings(ANALYTICS_DB_PATH=self.path, ANALYTICS_OVERLAP_MINUTES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.home = CareHome.objects.create(name='Warehouse Home', postcode='LU1 1AB')
+        self.other_home = CareHome.objects.create(name='Other Home', postcode='LU2 2AB')
+        self.staff = CustomUser.objects.create_user(
+            email='warehouse.staff@example.com', password='x', role=CustomUser.STAFF, carehome=self.home,
+        )
+        self.lead = CustomUser.objects.create_user(
+            email='warehouse.lead@example.com', password='x', role=CustomUser.TEAM_LEAD, carehome=self.home,
+        )
+        self.resident = ServiceUser.objects.create(
+            carehome=self.home, first_name='Ada', last_name='Warehouse', dob=date(1950, 1, 1),
+        )
+        other_resident = ServiceUser.objects.create(
+            carehome=self.other_home, first_name='Bob', last_name='Elsewhere', dob=date(1950, 1, 1),
+        )
+        self.day = date(2026, 3, 2)
+        at = timezone.make_aware(datetime(2026, 3, 2, 14))
+
+        log = LatestLogEntry.objects.create(user=self.staff, carehome=self.home, service_user=self.resident,
+                                            shift='morning', status='locked')
+        LatestLogEntry.objects.filter(pk=log.pk).update(date=self.day)
+        for hour, content in ((8, 'Breakfast'), (9, '')):
+            LogEntry.objects.create(user=self.staff, carehome=self.home, service_user=self.resident, shift='morning',
+                                    time_slot=datetime_time(hour), content=content, latest_log=log)
+        self.incident = IncidentReport.objects.create(
+            staff=self.staff, service_user=self.resident, carehome=self.home, location='Garden',
+            incident_datetime=at, dob=date(1950, 1, 1), contacted_police=True,
+        )
+        IncidentReport.objects.create(service_user=other_resident, carehome=self.other_home, location='Hall',
+                                      incident_datetime=at, dob=date(1950, 1, 1))
+        self.form = ABCForm.objects.create(
+            service_user=self.resident, date_of_birth=date(1950, 1, 1), date_time=at, staff='Sam',
+            target_behaviours=['verbal_aggression', 'self_harm'],
+        )
+        self.missed = MissedLog.objects.create(carehome=self.home, service_user=self.resident, date=self.day,
+                                               shift='night')
+        rota = Rota.objects.create(carehome=self.home, period_start=date(2026, 3, 1), status=Rota.STATUS_PUBLISHED)
+        Shift.objects.create(rota=rota, date=self.day, shift_type='morning', staff=self.staff)
+        Shift.objects.create(rota=rota, date=self.day, shift_type='night')
+
+    def report(self, name, by='month', homes=None):
+        return report(name, homes or [self.home.pk], date(2026, 3, 1), date(2026, 3, 31), by=by)
+
+    def test_full_load(self):
+        totals = sync()
+        self.assertEqual(totals['fact_incident'], {'loaded': 2, 'deleted': 0})
+        self.assertEqual(self.report('shift_logs')['rows'],
+                         [{'key': '2026-03', 'label': '2026-03', 'logs': 1, 'locked': 1, 'slots': 2, 'filled': 1}])
+        incidents = self.report('incidents', by='carehome', homes=[self.home.pk, self.other_home.pk])
+        self.assertEqual([(row['label'], row['incidents'], row['police']) for row in incidents['rows']],
+                         [('Warehouse Home', 1, 1), ('Other Home', 1, 0)])
+        self.assertIsNotNone(incidents['synced_at'])
+        behaviours = self.report('behaviours', by='behaviour')['rows']
+        self.assertEqual({row['key']: row['forms'] for row in behaviours}, {'self_harm': 1, 'verbal_aggression': 1})
+        self.assertEqual(self.report('missed_logs', by='day')['rows'][0]['unresolved'], 1)
+        shifts = self.report('shifts', by='week')['rows']
+        self.assertEqual([(row['key'], row['shifts'], row['unassigned']) for row in shifts], [('2026-W10', 2, 1)])
+
+    def test_incremental_sync_reads_only_changes(self):
+        sync()
+        self.assertTrue(all(counts['loaded'] == 0 for counts in sync().values()))
+
+        self.form.target_behaviours = ['verbal_aggression']
+        self.form.save()
+        MissedLog.objects.filter(pk=self.missed.pk).update(resolved_at=timezone.now())
+        self.incident.delete()
+        totals = sync()
+
+        self.assertEqual(totals['fact_abc_form'], {'loaded': 1, 'deleted': 0})
+        self.assertEqual(totals['fact_missed_log'], {'loaded': 1, 'deleted': 0})
+        self.assertEqual(totals['fact_incident'], {'loaded': 0, 'deleted': 1})
+        self.assertEqual(self.report('abc_forms')['rows'][0]['behaviours'], 1)
+        self.assertEqual([row['key'] for row in self.report('behaviours', by='behaviour')['rows']],
+                         ['verbal_aggression'])
+        self.assertEqual(self.report('missed_logs')['rows'][0]['unresolved'], 0)
+        self.assertEqual(self.report('incidents')['rows'], [])
+
+    def test_open_logs_are_reread_every_run(self):
+        LatestLogEntry.objects.update(status='incomplete')
+        sync()
+        LogEntry.objects.filter(content='').update(content='Lunch')
+        self.assertEqual(sync()['fact_shift_log']['loaded'], 1)
+        self.assertEqual(self.report('shift_logs')['rows'][0]['filled'], 2)
+
+    def test_view(self):
+        self.client.force_login(self.lead)
+        url = reverse('api-analytics')
+        self.assertEqual(self.client.get(url, {'report': 'incidents'}).json()['rows'], [])  # not built yet
+        sync()
+        params = {'report': 'incidents', 'by': 'carehome', 'date_from': '2026-03-01', 'date_to': '2026-03-31'}
+        data = self.client.get(url, params).json()
+        self.assertEqual([row['key'] for row in data['rows']], [self.home.pk])  # not the other home's incident
+        data = self.client.get(url, {**params, 'carehome': self.other_home.pk}).json()
+        self.assertEqual(data['rows'], [])
+        self.assertEqual(self.client.get(url, {'report': 'emails'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'report': 'incidents', 'by': 'behaviour'}).status_code, 400)
@@ -0,0 +1,233 @@
+"""
+One resident's activity timeline, newest first.
+
+Shift logs, incident reports, ABC forms, missed shifts and rota shifts are
+each read as their own stream, ordered by an index on (service_user, date).
+A page reads at most ``limit`` rows from each stream after the cursor and
+merges them with heapq.merge, so it costs one small query per stream however
+long the history is.
+
+Items are ordered by (moment, kind, id). Date-only rows (logs, missed and
+rota shifts) are placed at their shift's usual start, 08:00 or 20:00, since a
+night's log is dated the day it starts. The cursor is the last item's key,
+which is enough to resume every stream where the page stopped.
+"""
+import base64
+import heapq
+import json
+from collections import namedtuple
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ABCForm, IncidentReport, LatestLogEntry, MissedLog, Rota, Shift
+
+# Rank breaks ties between kinds at the same moment
+KINDS = ('incident', 'abc_form', 'log', 'missed', 'shift')
+
+# Ordering on the shift column matches ordering by these times ('morning' < 'night')
+SHIFT_STARTS = {'morning': time(8), 'night': time(20)}
+
+Key = namedtuple('Key', 'moment rank pk')
+
+
+def encode_cursor(key):
+    raw = json.dumps([key.moment.isoformat(), KINDS[key.rank], key.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Raises ValueError for anything that isn't a cursor this module made"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        moment, kind, pk = json.loads(raw)
+        moment = parse_datetime(moment)
+        if moment is None or timezone.is_naive(moment):
+            raise ValueError(moment)
+        return Key(moment, KINDS.index(kind), int(pk))
+    except (TypeError, ValueError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+class Stream:
+    kind = None
+
+    @property
+    def rank(self):
+        return KINDS.index(self.kind)
+
+    def queryset(self, service_user):
+        raise NotImplementedError
+
+    def moment(self, row):
+        raise NotImplementedError
+
+    def item(self, row):
+        raise NotImplementedError
+
+    def earlier(self, moment):
+        """Q for rows strictly before ``moment``"""
+        raise NotImplementedError
+
+    def same(self, moment):
+        """Q for rows exactly at ``moment``"""
+        raise NotImplementedError
+
+    def after(self, key):
+        """Q for rows that come after ``key`` in the timeline"""
+        if self.rank < key.rank:
+            return self.earlier(key.moment) | self.same(key.moment)
+        if self.rank > key.rank:
+            return self.earlier(key.moment)
+        return self.earlier(key.moment) | (self.same(key.moment) & Q(pk__lt=key.pk))
+
+    def read(self, service_user, key, limit):
+        rows = self.queryset(service_user)
+        if key is not None:
+            rows = rows.filter(self.after(key))
+        return [
+            (Key(self.moment(row), self.rank, row.pk), row)
+            for row in rows.order_by(*self.ordering)[:limit]
+        ]
+
+
+class DateTimeStream(Stream):
+    field = None
+
+    @property
+    def ordering(self):
+        return (f'-{self.field}', '-pk')
+
+    def moment(self, row):
+        return getattr(row, self.field)
+
+    def earlier(self, moment):
+        return Q(**{f'{self.field}__lt': moment})
+
+    def same(self, moment):
+        return Q(**{self.field: moment})
+
+
+class ShiftStream(Stream):
+    """Rows with a date and a morning/night shift column"""
+    shift_field = 'shift'
+
+    @property
+    def ordering(self):
+        return ('-date', f'-{self.shift_field}', '-pk')
+
+    def moment(self, row):
+        starts = SHIFT_STARTS.get(getattr(row, self.shift_field), time.min)
+        return timezone.make_aware(datetime.combine(row.date, starts))
+
+    def _shifts(self, test):
+        return [shift for shift, starts in SHIFT_STARTS.items() if test(starts)]
+
+    def earlier(self, moment):
+        local = timezone.localtime(moment)
+        return Q(date__lt=local.date()) | Q(**{
+            'date': local.date(), f'{self.shift_field}__in': self._shifts(lambda starts: starts < local.time()),
+        })
+
+    def same(self, moment):
+        local = timezone.localtime(moment)
+        return Q(**{
+            'date': local.date(), f'{self.shift_field}__in': self._shifts(lambda starts: starts == local.time()),
+        })
+
+
+class IncidentStream(DateTimeStream):
+    kind = 'incident'
+    field = 'incident_datetime'
+
+    def queryset(self, service_user):
+        return IncidentReport.objects.filter(service_user=service_user).only(
+            'pk', 'incident_datetime', 'location', 'staff_involved'
+        )
+
+    def item(self, row):
+        return {'title': f"Incident - {row.location}", 'detail': row.staff_involved,
+                'url': reverse('view_incident_report', args=[row.pk])}
+
+
+class ABCFormStream(DateTimeStream):
+    kind = 'abc_form'
+    field = 'date_time'
+
+    def queryset(self, service_user):
+        return ABCForm.objects.filter(service_user=service_user).only(
+            'pk', 'date_time', 'target_behaviours', 'setting_location', 'staff'
+        )
+
+    def item(self, row):
+        labels = dict(ABCForm.TARGET_BEHAVIOUR_CHOICES)
+        behaviours = ', '.join(labels.get(behaviour, behaviour) for behaviour in row.target_behaviours or [])
+        return {'title': f"ABC form - {row.setting_location or 'no location'}", 'detail': behaviours,
+                'staff': row.staff, 'url': reverse('view_abc_form', args=[row.pk])}
+
+
+class LogStream(ShiftStream):
+    kind = 'log'
+
+    def queryset(self, service_user):
+        return LatestLogEntry.objects.filter(service_user=service_user).only(
+            'pk', 'date', 'shift', 'status', 'staff_name'
+        )
+
+    def item(self, row):
+        return {'title': f"{row.get_shift_display()} shift log", 'detail': row.get_status_display(),
+                'staff': row.staff_name, 'url': reverse('log_detail_view', args=[row.pk])}
+
+
+class MissedStream(ShiftStream):
+    kind = 'missed'
+
+    def queryset(self, service_user):
+        return MissedLog.objects.filter(service_user=service_user).only('pk', 'date', 'shift', 'resolved_at')
+
+    def item(self, row):
+        return {'title': f"Missed {row.get_shift_display().lower()} shift log",
+                'detail': 'Resolved' if row.resolved_at else 'Unresolved'}
+
+
+class RotaShiftStream(ShiftStream):
+    kind = 'shift'
+    shift_field = 'shift_type'
+
+    def queryset(self, service_user):
+        return Shift.objects.filter(
+            service_user=service_user, rota__status=Rota.STATUS_PUBLISHED
+        ).select_related('staff').only('pk', 'date', 'shift_type', 'staff__first_name', 'staff__last_name')
+
+    def item(self, row):
+        return {'title': f"{row.get_shift_type_display()} shift on the rota",
+                'staff': row.staff.get_full_name() if row.staff else ''}
+
+
+STREAMS = {stream.kind: stream for stream in (
+    IncidentStream(), ABCFormStream(), LogStream(), MissedStream(), RotaShiftStream(),
+)}
+
+
+def timeline_page(service_user, cursor=None, limit=50, kinds=KINDS):
+    """
+    Up to ``limit`` items after ``cursor`` (an encoded cursor, or None for the
+    newest). Returns {'items': [...], 'next_cursor': str or None}.
+    """
+    key = decode_cursor(cursor) if cursor else None
+    streams = [STREAMS[kind].read(service_user, key, limit + 1) for kind in kinds]
+    merged = list(heapq.merge(*streams, key=lambda entry: entry[0], reverse=True))
+    page = merged[:limit]
+
+    items = []
+    for entry_key, row in page:
+        kind = KINDS[entry_key.rank]
+        items.append({'kind': kind, 'id': row.pk, 'at': entry_key.moment.isoformat(),
+                      **STREAMS[kind].item(row)})
+    return {
+        'items': items,
+        'next_cursor': encode_cursor(page[-1][0]) if len(merged) > limit else None,
+    }
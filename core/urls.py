@@ -1,82 +1,99 @@
 # core/urls.py
 from django.conf.urls.static import static
 from django.urls import path
-from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+
 from carehome_project import settings
-from . import views
-from .views import create_log_view, log_entry_form, save_log_entry, lock_log_entries, staff_latest_logs_view, \
-    staff_mapping_view, delete_mapping , api_login
+from .views import lazy_view
+
+# Views are imported on first request (see core/views/__init__.py), so list them by dotted path
+urlpatterns = [
+    path('', lazy_view('core.views.staff.login_view'), name='login'),
+    path('dashboard/', lazy_view('core.views.staff.dashboard'), name='admin-dashboard'),
+    path('logout/', lazy_view('core.views.staff.logout_view'), name='logout'),
+    path('active-users/', lazy_view('core.views.staff.active_users_view'), name='active-users'),
+    path('missed-logs/', lazy_view('core.views.logs.missed_shifts_view'), name='missed-logs'),
+    path('staff/create/', lazy_view('core.views.staff.create_staff'), name='create-staff'),
+
+    # Carehomes / service users
+    path('carehomes/dashboard/', lazy_view('core.views.homes.carehomes_dashboard'), name='carehomes-dashboard'),
+    path('carehomes/create/', lazy_view('core.views.homes.create_carehome'), name='create-carehome'),
+    path('service-users/dashboard/', lazy_view('core.views.homes.service_users_dashboard'),
+         name='service-users-dashboard'),
+    path('service-users/create/', lazy_view('core.views.homes.create_service_user'), name='create-service-user'),
+    path('validate-postcode/', lazy_view('core.views.homes.validate_postcode'), name='validate-postcode'),
+    path('carehomes/edit/<int:id>/', lazy_view('core.views.homes.edit_carehome'), name='edit-carehome'),
+    path('carehomes/delete/<int:id>/', lazy_view('core.views.homes.delete_carehome'), name='delete-carehome'),
+    path('service-users/', lazy_view('core.views.homes.service_users_dashboard'), name='service-users-dashboard'),
+    path('service-users/edit/<int:id>/', lazy_view('core.views.homes.edit_service_user'), name='edit-service-user'),
+    path('service-users/delete/<int:id>/', lazy_view('core.views.homes.delete_service_user'),
+         name='delete-service-user'),
+    path('service-users/<int:id>/bundle/<int:year>/<int:month>/', lazy_view('core.views.homes.service_user_bundle'),
+         name='service-user-bundle'),
+    path('service-users/<int:id>/timeline/', lazy_view('core.views.homes.service_user_timeline'),
+         name='service-user-timeline'),
+    path('staff/', lazy_view('core.views.staff.staff_dashboard'), name='staff-dashboard'),
+    path('staff/edit/<int:pk>/', lazy_view('core.views.staff.edit_staff'), name='edit-staff'),
+    path('staff/toggle-status/<int:pk>/', lazy_view('core.views.staff.toggle_staff_status'),
+         name='toggle-staff-status'),
+
+    # ABC forms
+    path('abc/new/', lazy_view('core.views.abc.fill_abc_form'), name='fill_abc_form'),
+    path('abc/', lazy_view('core.views.abc.abc_form_list'), name='abc_form_list'),
+    path('abc/<int:form_id>/edit/', lazy_view('core.views.abc.edit_abc_form'), name='edit_abc_form'),
+    path('abc/<int:form_id>/', lazy_view('core.views.abc.view_abc_form'), name='view_abc_form'),
+    path('abc/<int:form_id>/pdf/', lazy_view('core.views.abc.download_abc_pdf'), name='download_abc_pdf'),
+
+    # Incident reports
+    path('fill-incident/', lazy_view('core.views.incidents.fill_incident_form'), name='fill_incident_form'),
+    path('incident-pdf/<int:form_id>/', lazy_view('core.views.incidents.download_incident_pdf'),
+         name='download_incident_pdf'),
 
-urlpatterns = ([
-                   path('', views.login_view, name='login'),
-                   path('dashboard/', views.dashboard, name='admin-dashboard'),
-                   path('logout/', views.logout_view, name='logout'),
-                   path('active-users/', views.active_users_view, name='active-users'),
-                   path('missed-logs/', views.missed_shifts_view, name='missed-logs'),
-                   path('staff/create/', views.create_staff, name='create-staff'),
+    # Shift logs
+    path('create-log/', lazy_view('core.views.logs.create_log_view'), name='create-log'),
+    path('log-entry/<int:latest_log_id>/', lazy_view('core.views.logs.log_entry_form'), name='log-entry-form'),
+    path('save-log/<int:entry_id>/', lazy_view('core.views.logs.save_log_entry'), name='save-log'),
+    path('lock-log/<int:latest_log_id>/', lazy_view('core.views.logs.lock_log_entries'), name='lock-log'),
+    path('log/<int:pk>/', lazy_view('core.views.logs.log_detail_view'), name='log_detail_view'),
+    path('my-logs/', lazy_view('core.views.logs.staff_latest_logs_view'), name='staff_latest_logs_view'),
 
-                   # Carehomes URLs
-                   path('carehomes/dashboard/', views.carehomes_dashboard, name='carehomes-dashboard'),
-                   path('carehomes/create/', views.create_carehome, name='create-carehome'),
+    # Staff mapping and carehome lookups
+    path('dashboard/staff-mapping/', lazy_view('core.views.staff.staff_mapping_view'), name='staff_mapping'),
+    path('ajax/fetch-service-users/', lazy_view('core.views.api.fetch_service_users', is_async=True),
+         name='fetch_service_users'),
+    path('staff-mapping/', lazy_view('core.views.staff.staff_mapping_view'), name='staff-mapping'),
+    path('ajax/load-service-users/', lazy_view('core.views.api.load_service_users'), name='ajax_load_service_users'),
+    path('incident-reports/', lazy_view('core.views.incidents.incident_report_list_view'), name='incident_report_list'),
+    path('edit-incident/<int:form_id>/', lazy_view('core.views.incidents.edit_incident_form'),
+         name='edit_incident_form'),
+    path('incident/<int:pk>/', lazy_view('core.views.incidents.view_incident_report'), name='view_incident_report'),
+    path('get-staff-by-carehome/', lazy_view('core.views.api.get_staff_by_carehome'), name='get-staff-by-carehome'),
+    path('get-service-users-by-carehome/', lazy_view('core.views.api.get_service_users_by_carehome', is_async=True),
+         name='get-service-users-by-carehome'),
+    path('delete-mapping/<int:pk>/', lazy_view('core.views.staff.delete_mapping'), name='delete-mapping'),
 
-                   # Service Users URLs
-                   path('service-users/dashboard/', views.service_users_dashboard, name='service-users-dashboard'),
-                   path('service-users/create/', views.create_service_user, name='create-service-user'),
-                   path('validate-postcode/', views.validate_postcode, name='validate-postcode'),
-                   path('carehomes/edit/<int:id>/', views.edit_carehome, name='edit-carehome'),
-                   path('carehomes/delete/<int:id>/', views.delete_carehome, name='delete-carehome'),
-                   path('service-users/', views.service_users_dashboard, name='service-users-dashboard'),
-                   path('service-users/create/', views.create_service_user, name='create-service-user'),
-                   path('service-users/edit/<int:id>/', views.edit_service_user, name='edit-service-user'),
-                   path('service-users/delete/<int:id>/', views.delete_service_user, name='delete-service-user'),
-                   path('staff/', views.staff_dashboard, name='staff-dashboard'),
-                   path('staff/create/', views.create_staff, name='create-staff'),
-                   path('staff/edit/<int:pk>/', views.edit_staff, name='edit-staff'),
-                   path('staff/toggle-status/<int:pk>/', views.toggle_staff_status, name='toggle-staff-status'),
-                   path('abc/new/', views.fill_abc_form, name='fill_abc_form'),
-                   path('abc/', views.abc_form_list, name='abc_form_list'),
-                   path('abc/<int:form_id>/edit/', views.edit_abc_form, name='edit_abc_form'),
-                   path('abc/<int:form_id>/', views.view_abc_form, name='view_abc_form'),
-                   path('abc/<int:form_id>/pdf/', views.download_abc_pdf, name='download_abc_pdf'),
-                   path('fill-incident/', views.fill_incident_form, name='fill_incident_form'),
-                   path('incident-pdf/<int:form_id>/', views.download_incident_pdf, name='download_incident_pdf'),
-                   path('create-log/', create_log_view, name='create-log'),
-                   path('log-entry/<int:latest_log_id>/', log_entry_form, name='log-entry-form'),
-                   path('save-log/<int:entry_id>/', save_log_entry, name='save-log'),
-                   path('lock-log/<int:latest_log_id>/', lock_log_entries, name='lock-log'),
-                   path('log/<int:pk>/', views.log_detail_view, name='log_detail_view'),
-                   path('my-logs/', staff_latest_logs_view, name='staff_latest_logs_view'),
-                   path('dashboard/staff-mapping/', views.staff_mapping_view, name='staff_mapping'),
-                   path('ajax/fetch-service-users/', views.fetch_service_users, name='fetch_service_users'),
-                   path('staff-mapping/', views.staff_mapping_view, name='staff-mapping'),
-                   path('ajax/load-service-users/', views.load_service_users, name='ajax_load_service_users'),
-                   path('incident-reports/', views.incident_report_list_view, name='incident_report_list'),
-                   path('edit-incident/<int:form_id>/', views.edit_incident_form, name='edit_incident_form'),
-                   path('incident/<int:pk>/', views.view_incident_report, name='view_incident_report'),
-                   path('get-staff-by-carehome/', views.get_staff_by_carehome, name='get-staff-by-carehome'),
-                   path('get-service-users-by-carehome/', views.get_service_users_by_carehome,
-                        name='get-service-users-by-carehome'),
-                   path('staff-mapping/', staff_mapping_view, name='staff-mapping'),
-                   path('delete-mapping/<int:pk>/', delete_mapping, name='delete-mapping'),
-path('carehome-shift-matrix/', views.carehome_shift_matrix, name='carehome-shift-matrix'),
-                   path("api/carehomes/", views.api_carehomes_list, name="api-carehomes-list"),
-                   path("api/rota-events/", views.api_rota_events, name="api-rota-events"),
-                   path("api/staff/", views.api_staff_list, name="api-staff-list"),
-                   path("api/service-users/", views.api_serviceusers_list, name="api-serviceusers-list"),
-                   path("api/shifts/", views.api_shifts_list, name="api-shifts-list"),
-                   path("api/rota/save-draft/", views.api_rota_save_draft, name="api-rota-save-draft"),
-                   path("api/rota/submit/", views.api_rota_submit, name="api-rota-submit"),
-                   path("api/rota/publish/", views.api_rota_publish, name="api-rota-publish"),
-                   path("api/rota/reject/", views.api_rota_reject, name="api-rota-reject"),
+    # Rota
+    path('carehome-shift-matrix/', lazy_view('core.views.rota.carehome_shift_matrix'), name='carehome-shift-matrix'),
+    path('api/carehomes/', lazy_view('core.views.api.api_carehomes_list', is_async=True), name='api-carehomes-list'),
+    path('api/rota-events/', lazy_view('core.views.api.api_rota_events', is_async=True), name='api-rota-events'),
+    path('api/staff/', lazy_view('core.views.api.api_staff_list', is_async=True), name='api-staff-list'),
+    path('api/service-users/', lazy_view('core.views.api.api_serviceusers_list', is_async=True),
+         name='api-serviceusers-list'),
+    path('api/shifts/', lazy_view('core.views.rota.api_shifts_list'), name='api-shifts-list'),
+    path('api/behaviour-trends/', lazy_view('core.views.abc.api_behaviour_trends'), name='api-behaviour-trends'),
+    path('api/compliance-heatmap/', lazy_view('core.views.logs.api_compliance_heatmap'),
+         name='api-compliance-heatmap'),
+    path('api/analytics/', lazy_view('core.views.logs.api_analytics'), name='api-analytics'),
+    path('search/', lazy_view('core.views.search.search_view'), name='search'),
+    path('api/rota/save-draft/', lazy_view('core.views.rota.api_rota_save_draft'), name='api-rota-save-draft'),
+    path('api/rota/submit/', lazy_view('core.views.rota.api_rota_submit'), name='api-rota-submit'),
+    path('api/rota/publish/', lazy_view('core.views.rota.api_rota_publish'), name='api-rota-publish'),
+    path('api/rota/reject/', lazy_view('core.views.rota.api_rota_reject'), name='api-rota-reject'),
 
-# 🔥 API for mobile
-    path('api/login/', api_login, name='api-login'),
-path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    # API for mobile
+    path('api/login/', lazy_view('core.views.api.api_login'), name='api-login'),
+    path('api/token/', lazy_view('rest_framework_simplejwt.views.TokenObtainPairView'), name='token_obtain_pair'),
+    path('api/token/refresh/', lazy_view('rest_framework_simplejwt.views.TokenRefreshView'), name='token_refresh'),
 
-               ]
-               + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
+    # Diagnostics (staff only)
+    path('debug/sql-profiles/', lazy_view('core.profiling.sql_profiles_view'), name='sql-profiles'),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -6,7 +6,7 @@ from .models import LatestLogEntry
 import os
 from django.template.loader import render_to_string
 from django.conf import settings
-from weasyprint import HTML
+from .rendering import html_to_pdf
 from django.utils import timezone
 from .models import CustomUser, LatestLogEntry, LogEntry, IncidentReport, ABCForm, ServiceUser
 
@@ -80,7 +80,7 @@ def generate_pdf(latest_log):
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    HTML(string=html).write_pdf(output_path)
+    html_to_pdf(html, output_path)
 
     return output_path  # So you can open and attach the file later
 
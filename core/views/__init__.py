@@ -0,0 +1,60 @@
+"""
+Views are split by domain: logs, incidents, abc, rota, staff, homes, api, search.
+
+core/urls.py refers to them through lazy_view() so a worker only imports the
+modules (and their forms/PDF code) for the URLs it actually serves.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+class LazyView:
+    """
+    Stands in for a view in urlpatterns and imports it on first use.
+
+    Attribute lookups the request cycle makes (csrf_exempt etc.) are passed to
+    the real view. Reverse() only needs this object's identity and name, so it
+    doesn't trigger an import. Async views have to be declared with
+    is_async=True because the handler checks that before calling the view.
+    """
+
+    def __init__(self, dotted_path, is_async=False, **initkwargs):
+        self.dotted_path = dotted_path
+        self.is_async = is_async
+        self.initkwargs = initkwargs
+        self._view = None
+        self.__module__, self.__name__ = dotted_path.rsplit('.', 1)
+        self.__qualname__ = self.__name__
+        if is_async:
+            markcoroutinefunction(self)
+
+    @property
+    def view(self):
+        if self._view is None:
+            view = import_string(self.dotted_path)
+            if isinstance(view, type):
+                view = view.as_view(**self.initkwargs)
+            if self.is_async != iscoroutinefunction(view):
+                raise ImproperlyConfigured(
+                    f"lazy_view('{self.dotted_path}') needs is_async={not self.is_async}"
+                )
+            self._view = view
+        return self._view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Private/dunder lookups come from the URL machinery - don't import for those
+        if name.startswith('_') or name == 'view_class':
+            raise AttributeError(name)
+        return getattr(self.view, name)
+
+    def __repr__(self):
+        return f"<LazyView {self.dotted_path}>"
+
+
+def lazy_view(dotted_path, is_async=False, **initkwargs):
+    """lazy_view('core.views.logs.log_detail_view'); class-based views get as_view(**initkwargs)"""
+    return LazyView(dotted_path, is_async=is_async, **initkwargs)
@@ -0,0 +1,277 @@
+"""ABC (antecedent-behaviour-consequence) forms and behaviour trends"""
+
+import logging
+from datetime import datetime
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core.analytics import behaviour_trends
+from core.rendering import html_to_pdf
+from core.utils import get_filtered_queryset
+from core.models import BehaviourDailyCount, ABCForm
+from core.forms import ABCFormForm
+from .common import is_manager_or_teamlead
+
+logger = logging.getLogger(__name__)
+
+
+@login_required
+def abc_form_list(request):
+    """Show list of forms with visibility control"""
+    if request.user.is_superuser:
+        forms = ABCForm.objects.all().order_by('-date_time')
+    elif request.user.groups.filter(name='Supervisors').exists():
+        forms = ABCForm.objects.filter(
+            Q(service_user__in=request.user.managed_clients.all()) |
+            Q(created_by=request.user)
+        ).order_by('-date_time')
+    else:  # Regular care staff
+        forms = ABCForm.objects.filter(
+            created_by=request.user
+        ).order_by('-date_time')
+
+    # Add select_related for performance
+    forms = forms.select_related('service_user', 'created_by')
+
+    return render(request, 'forms/abc_form_list.html', {
+        'forms': forms,
+        'can_edit': lambda form: (
+                request.user.is_superuser or
+                request.user.groups.filter(name='Supervisors').exists()
+        )
+    })
+
+
+@login_required
+def view_abc_form(request, form_id):  # Changed from pk to form_id
+    form_instance = get_object_or_404(ABCForm, pk=form_id)
+
+    # Check permissions
+    if not (request.user.is_superuser or
+            request.user == form_instance.created_by or
+            (request.user.groups.filter(name='Supervisors').exists() and
+             form_instance.service_user in request.user.managed_clients.all())):
+        return HttpResponseForbidden("You don't have permission to view this form")
+
+    context = {
+        'data': {
+            'id': form_instance.id,
+            'service_user': form_instance.service_user,
+            'date_of_birth': form_instance.date_of_birth,
+            'staff': form_instance.staff,
+            'date_time': form_instance.date_time,
+            'target_behaviours': form_instance.target_behaviours,
+            'setting': form_instance.setting,
+            'antecedent': form_instance.antecedent,
+            'behaviour': form_instance.behaviour,
+            'consequences': form_instance.consequences,
+            'reflection': form_instance.reflection,
+            'pdf_file': form_instance.pdf_file
+        },
+        'can_edit': (
+                request.user.is_superuser or
+                request.user.groups.filter(name='Supervisors').exists() or
+                request.user == form_instance.created_by
+        )
+    }
+    return render(request, 'core/abc_form_detail_template.html', context)
+
+
+@login_required
+def download_abc_pdf(request, form_id):
+    """Download PDF with permission check"""
+    instance = get_object_or_404(ABCForm, id=form_id)
+
+    # Permission check
+    if not (request.user.is_superuser or
+            request.user == instance.created_by or
+            request.user.groups.filter(name='Supervisors').exists() and
+            instance.service_user in request.user.managed_clients.all()):
+        return HttpResponse("Not authorized", status=403)
+
+    if not instance.pdf_file:
+        return HttpResponse("PDF not available", status=404)
+
+    response = HttpResponse(instance.pdf_file, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="abc_form_{instance.id}.pdf"'
+    return response
+
+
+@login_required
+def fill_abc_form(request):
+    if request.method == 'POST':
+        form = ABCFormForm(request.POST)
+        if form.is_valid():
+            try:
+                # Save the form - the combining of fields is now handled in form.save()
+                instance = form.save(commit=False)
+                instance.created_by = request.user
+                instance.save()
+                form.save_m2m()  # Save many-to-many relationships (target_behaviours)
+
+                # PDF Generation
+                context = {
+                    'data': {
+                        'target_behaviours': form.cleaned_data['target_behaviours'],
+                        'service_user': instance.service_user,
+                        'date_of_birth': instance.date_of_birth,
+                        'staff': instance.staff,
+                        'date_time': instance.date_time,
+                        'setting': instance.setting,
+                        'antecedent': instance.antecedent,
+                        'behaviour': instance.behaviour,
+                        'consequences': instance.consequences,
+                        'reflection': instance.reflection
+                    }
+                }
+
+                html_string = render_to_string('pdf_templates/abc_pdf.html', context)
+                pdf_bytes = html_to_pdf(html_string)
+
+                # Save new PDF (a replaced one is left for `manage.py gc_media`)
+                file_content = ContentFile(pdf_bytes)
+                filename = f'abc_form_{instance.id}_{instance.date_time.date()}.pdf'
+                instance.pdf_file.save(filename, file_content, save=True)
+
+                messages.success(request, 'ABC Form saved successfully!')
+                return redirect('abc_form_list')
+
+            except Exception as e:
+                messages.error(request, f'Error saving form: {str(e)}')
+                logger.exception("Error saving ABC form")
+        else:
+            messages.error(request, 'Please correct the form errors')
+            logger.debug(f"Form errors: {form.errors}")
+    else:
+        # Initialize form with default values
+        initial_data = {
+            'staff': request.user.get_full_name(),
+            'date_time': timezone.now()
+        }
+        form = ABCFormForm(initial=initial_data)
+
+    return render(request, 'forms/abc_form.html', {'form': form})
+
+
+@login_required
+def edit_abc_form(request, form_id):
+    instance = get_object_or_404(ABCForm, id=form_id)
+
+    if request.method == 'POST':
+        form = ABCFormForm(request.POST, instance=instance)
+        if form.is_valid():
+            try:
+                updated = form.save(commit=False)
+                updated.updated_by = request.user  # Track who made the update
+                updated.save()
+                form.save_m2m()
+
+                # Regenerate PDF (same as fill_abc_form)
+                context = {
+                    'data': {
+                        'target_behaviours': form.cleaned_data['target_behaviours'],
+                        'service_user': updated.service_user,
+                        'date_of_birth': updated.date_of_birth,
+                        'staff': updated.staff,
+                        'date_time': updated.date_time,
+                        'setting': updated.setting,
+                        'antecedent': updated.antecedent,
+                        'behaviour': updated.behaviour,
+                        'consequences': updated.consequences,
+                        'reflection': updated.reflection
+                    }
+                }
+
+                html_string = render_to_string('pdf_templates/abc_pdf.html', context)
+                pdf_bytes = html_to_pdf(html_string)
+
+                file_content = ContentFile(pdf_bytes)
+                filename = f'abc_form_{updated.id}_{updated.date_time.date()}.pdf'
+                updated.pdf_file.save(filename, file_content, save=True)
+
+                messages.success(request, 'ABC Form updated successfully!')
+                return redirect('abc_form_list')
+
+            except Exception as e:
+                messages.error(request, f'Error updating form: {str(e)}')
+                logger.exception("Error updating ABC form")
+        else:
+            messages.error(request, 'Please correct the form errors')
+    else:
+        # The form will automatically parse the instance data
+        form = ABCFormForm(instance=instance)
+
+    return render(request, 'forms/abc_form.html', {
+        'form': form,
+        'edit': True,
+        'instance': instance
+    })
+
+
+def parse_abc_instance(instance):
+    """Helper function to map the ABCForm instance onto individual template fields"""
+    return {
+        'service_user': instance.service_user,
+        'date_of_birth': instance.date_of_birth,
+        'staff': instance.staff,
+        'date_time': instance.date_time,
+        'target_behaviours': instance.target_behaviours,
+
+        # Setting fields
+        'setting_location': instance.setting_location,
+        'setting_present': instance.setting_present,
+        'setting_activity': instance.setting_activity,
+        'setting_environment': instance.setting_environment,
+
+        # Antecedent fields
+        'antecedent_description': instance.antecedent_description,
+        'antecedent_change': instance.antecedent_change,
+        'antecedent_noise': instance.antecedent_noise,
+        'antecedent_waiting': instance.antecedent_waiting,
+
+        # Behaviour field
+        'behaviour_description': instance.behaviour_description,
+
+        # Consequences field
+        'consequence_immediate': instance.consequence_immediate,
+
+        # Reflection field
+        'reflection_learnings': instance.reflection_learnings,
+    }
+
+
+@login_required
+@user_passes_test(is_manager_or_teamlead)
+def api_behaviour_trends(request):
+    """Behaviour trend chart data served from the daily rollups"""
+    counts = get_filtered_queryset(BehaviourDailyCount, request.user)
+
+    carehome_id = request.GET.get('carehome')
+    service_user_id = request.GET.get('service_user')
+    period = request.GET.get('period', 'day')
+    if period not in ('day', 'week'):
+        return JsonResponse({'error': 'period must be day or week'}, status=400)
+
+    try:
+        if carehome_id:
+            counts = counts.filter(carehome_id=int(carehome_id))
+        if service_user_id:
+            counts = counts.filter(service_user_id=int(service_user_id))
+        date_from = request.GET.get('date_from')
+        date_to = request.GET.get('date_to')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else None
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid filter value'}, status=400)
+
+    return JsonResponse({
+        'period': period,
+        'points': behaviour_trends(counts, period=period, date_from=date_from, date_to=date_to),
+    })
@@ -0,0 +1,200 @@
+"""JSON endpoints (async where they only read) and the mobile login"""
+
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from core.decorators import async_login_required
+from core.listcache import carehome_list, residents_for
+from core.models import CustomUser, Rota, Shift
+from .common import api_ok, api_error, User
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(["POST"])
+def api_login(request):
+    email = request.data.get("email")
+    password = request.data.get("password")
+
+    if not email or not password:
+        return Response(
+            {"error": "Email and password required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    user = authenticate(username=email, password=password)
+
+    if user is None:
+        return Response(
+            {"error": "Invalid credentials"},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    return Response({
+        "success": True,
+        "user": {
+            "id": user.id,
+            "email": user.email,
+            "username": user.username
+        }
+    })
+
+
+@async_login_required
+async def api_carehomes_list(request):
+    carehomes = await sync_to_async(carehome_list)()
+
+    return api_ok([
+        {"id": carehome.id, "name": carehome.name, "postcode": carehome.postcode}
+        for carehome in carehomes
+    ])
+
+
+@async_login_required
+async def api_staff_list(request):
+    carehome_id = request.GET.get('carehome')
+    try:
+        staff_qs = CustomUser.objects.filter(carehome_id=carehome_id, role='staff')
+        data = [s async for s in staff_qs.values(
+            "id",
+            "first_name",
+            "last_name",
+            "image",      # ← use 'image' instead of 'profile_picture'
+            "role",       # optional, can use for meta
+        )]
+        # add computed fields for frontend if needed
+        for s in data:
+            s['name'] = f"{s['first_name']} {s['last_name']}"
+            s['avatar'] = s['image']  # frontend expects 'avatar'
+            s['role_display'] = s['role'].capitalize()  # optional
+        return api_ok(data)
+    except Exception as e:
+        logger.exception("Error listing staff")
+        return api_error(str(e))
+
+
+@async_login_required
+async def api_serviceusers_list(request):
+    carehome_id = request.GET.get('carehome')
+    try:
+        residents = await sync_to_async(residents_for)([carehome_id] if carehome_id else [])
+        data = [{
+            "id": su.id,
+            "first_name": su.first_name,
+            "last_name": su.last_name,
+            "image": su.image.name,
+        } for su in residents]
+        for su in data:
+            su['name'] = f"{su['first_name']} {su['last_name']}"
+            su['avatar'] = su['image']
+            su['initials'] = f"{su['first_name'][0]}{su['last_name'][0]}" if su['first_name'] and su['last_name'] else ''
+        return api_ok(data)
+    except Exception as e:
+        logger.exception("Error listing service users")
+        return api_error(str(e))
+
+
+@async_login_required
+async def api_rota_events(request):
+    carehome_id = request.GET.get("carehome")
+
+    if not carehome_id:
+        return api_error("carehome parameter is required")
+
+    rotas = Rota.objects.filter(carehome_id=carehome_id).order_by("-period_start")
+
+    # One query for all shifts instead of one per rota
+    shifts_by_rota = {}
+    shifts = Shift.objects.filter(rota__carehome_id=carehome_id).values(
+        "id", "rota_id", "date", "shift_type", "staff_id", "service_user_id", "notes"
+    )
+    async for shift in shifts:
+        shifts_by_rota.setdefault(shift.pop("rota_id"), []).append(shift)
+
+    results = []
+
+    async for rota in rotas:
+        results.append({
+            "rota_id": rota.id,
+            "week_start": rota.period_start,
+            "status": rota.status,
+            "shifts": shifts_by_rota.get(rota.id, [])
+        })
+
+    return api_ok(results)
+
+
+async def fetch_service_users(request):
+    if request.method == "POST":
+        data = json.loads(request.body)
+        carehome_ids = data.get('carehome_ids', [])
+        users = await sync_to_async(residents_for)(carehome_ids)
+
+        response = {
+            'users': [{'id': su.id, 'name': str(su)} for su in users]
+        }
+        return JsonResponse(response)
+    return JsonResponse({'error': 'Invalid method'}, status=400)
+
+
+# csrf_exempt only wraps sync views on Django 4.2
+fetch_service_users.csrf_exempt = True
+
+
+async def get_service_users_by_carehome(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    # Get the raw parameter value
+    carehome_param = request.GET.get('carehome_id') or request.GET.get('carehome_id[]')
+
+    if not carehome_param:
+        return JsonResponse({'service_users': []}, status=400)
+
+    try:
+        # Handle both single ID and comma-separated IDs
+        carehome_ids = [int(id.strip()) for id in carehome_param.split(',')]
+        service_users = await sync_to_async(residents_for)(carehome_ids)
+
+        users_list = [{
+            'id': user.id,
+            'name': user.get_formatted_name()
+        } for user in service_users]
+
+        return JsonResponse({'service_users': users_list})
+
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': 'Invalid carehome ID format'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def get_staff_by_carehome(request):
+    carehome_id = request.GET.get('carehome_id')
+    staff = User.objects.filter(carehome_id=carehome_id).values('id', 'first_name', 'last_name')
+    staff_list = [{
+        'id': s['id'],
+        'name': f"{s['first_name']} {s['last_name']}"
+    } for s in staff]
+    return JsonResponse({'staff': staff_list})
+
+
+def load_service_users(request):
+    carehome_ids = request.GET.getlist('carehome_ids[]')
+    users = residents_for(carehome_ids)
+    data = [{'id': u.id, 'name': f"{u.first_name} {u.last_name}"} for u in users]
+    return JsonResponse({'service_users': data})
+
+
+def get_service_users(request):
+    carehome_id = request.GET.get('carehome_id')
+    service_users = residents_for([carehome_id] if carehome_id else [])
+    data = [{"id": su.id, "name": f"{su.first_name} {su.last_name}"} for su in service_users]
+    return JsonResponse(data, safe=False)
@@ -0,0 +1,46 @@
+"""Helpers shared by the view modules"""
+
+import logging
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+
+from core.rendering import html_to_pdf_xhtml2pdf
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def is_manager_or_teamlead(user):
+    return user.is_authenticated and user.role in ["manager", "team_lead"]
+
+
+def api_ok(data, status=200):
+    return JsonResponse({"ok": True, "data": data}, status=status)
+
+
+def api_error(message, status=400):
+    return JsonResponse({"ok": False, "error": message}, status=status)
+
+
+def render_pdf_view(template_src, context_dict):
+    html = render_to_string(template_src, context_dict)
+    pdf = html_to_pdf_xhtml2pdf(html)
+    if pdf is not None:
+        return HttpResponse(pdf, content_type='application/pdf')
+    return HttpResponse('Error generating PDF', status=500)
+
+
+def serve_media(request, path):
+    from urllib.parse import unquote
+    path = unquote(path)
+    file_path = os.path.join(settings.MEDIA_ROOT, path)
+    logger.info(f"Trying to serve media file: {file_path}")
+    if os.path.exists(file_path):
+        return FileResponse(open(file_path, 'rb'))
+    logger.error(f"File not found: {file_path}")
+    raise Http404("File not found")
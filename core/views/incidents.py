@@ -0,0 +1,232 @@
+"""Incident reports"""
+
+import os
+import tempfile
+from datetime import datetime
+
+from django.contrib.auth.decorators import login_required
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+
+from core.rendering import html_to_pdf
+from core.models import IncidentReport, ServiceUser
+from core.forms import IncidentReportForm
+
+
+@login_required
+def fill_incident_form(request):
+    if request.method == 'POST':
+        form = IncidentReportForm(request.POST, request.FILES)  # Added request.FILES
+        if form.is_valid():
+            instance = form.save(commit=False)
+            instance.staff = request.user
+            instance.save()
+            # Handle image resizing/validation if needed
+            for i in range(1, 4):
+                image_field = f'image{i}'
+                if image_field in request.FILES:
+                    # You could add image processing here if needed
+                    setattr(instance, image_field, request.FILES[image_field])
+
+            instance.carehome = form.cleaned_data['service_user'].carehome
+            instance.save()
+
+            # Generate HTML for PDF with images
+            html_string = render_to_string('pdf_templates/incident_pdf.html', {'data': instance})
+
+            # Generate PDF with WeasyPrint
+            temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
+            temp_pdf.close()
+
+            # Resolves {{ image.url }}; html_to_pdf reads those from MEDIA_ROOT, not over HTTP
+            base_url = request.build_absolute_uri('/')[:-1]  # Remove trailing slash
+            html_to_pdf(html_string, temp_pdf.name, base_url=base_url)
+
+            with open(temp_pdf.name, 'rb') as pdf_file:
+                file_content = ContentFile(pdf_file.read())
+                filename = f'incident_report_{instance.id}.pdf'
+                instance.pdf_file.save(filename, file_content)
+
+            os.unlink(temp_pdf.name)
+            return redirect('incident_report_list')
+    else:
+        form = IncidentReportForm()
+
+    return render(request, 'forms/incident_form.html', {'form': form})
+
+
+@login_required
+def edit_incident_form(request, form_id):
+    instance = get_object_or_404(IncidentReport, id=form_id)
+
+    # Check permission - only original staff or managers can edit
+    if not (request.user == instance.staff or request.user.role in ['manager', 'superuser']):
+        return redirect('incident_report_list')
+
+    if request.method == 'POST':
+        form = IncidentReportForm(request.POST, request.FILES, instance=instance)
+        if form.is_valid():
+            instance = form.save(commit=False)
+            instance.staff = request.user
+
+            # Handle image updates; replaced or cleared files are left for `manage.py gc_media`
+            for i in range(1, 4):
+                image_field = f'image{i}'
+                if image_field in request.FILES:
+                    setattr(instance, image_field, request.FILES[image_field])
+                elif f'{image_field}-clear' in request.POST:
+                    setattr(instance, image_field, None)
+
+            instance.carehome = form.cleaned_data['service_user'].carehome
+            instance.save()
+
+            # Regenerate PDF with updated images
+            html_string = render_to_string('pdf_templates/incident_pdf.html', {'data': instance})
+            base_url = request.build_absolute_uri('/')[:-1]
+            with tempfile.NamedTemporaryFile(delete=True, suffix='.pdf') as output:
+                html_to_pdf(html_string, output.name, base_url=base_url)
+                with open(output.name, 'rb') as pdf_file:
+                    file_content = ContentFile(pdf_file.read())
+                    filename = f'incident_report_{instance.id}.pdf'
+                    instance.pdf_file.save(filename, file_content)
+
+            return redirect('incident_detail', form_id=instance.id)
+    else:
+        form = IncidentReportForm(instance=instance)
+
+    return render(request, 'forms/incident_form.html', {
+        'form': form,
+        'existing_images': [
+            {'field': 'image1', 'url': instance.image1.url if instance.image1 else None},
+            {'field': 'image2', 'url': instance.image2.url if instance.image2 else None},
+            {'field': 'image3', 'url': instance.image3.url if instance.image3 else None},
+        ]
+    })
+
+
+@login_required
+def incident_report_list_view(request):
+    user = request.user
+
+    # Base queryset based on user role
+    if user.is_superuser or user.role == 'manager':
+        incidents = IncidentReport.objects.select_related('service_user')
+    elif user.role == 'team_lead':
+        incidents = IncidentReport.objects.filter(service_user__carehome=user.carehome)
+    elif user.role == 'staff':
+        incidents = IncidentReport.objects.filter(staff=user)
+    else:
+        incidents = IncidentReport.objects.none()
+    incidents = incidents.select_related('service_user', 'staff')
+
+    # Get filter parameters from request
+    service_user_id = request.GET.get('service_user')
+    date_from = request.GET.get('date_from')
+    date_to = request.GET.get('date_to')
+
+    # Apply filters
+    if service_user_id:
+        incidents = incidents.filter(service_user_id=service_user_id)
+
+    if date_from:
+        try:
+            date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
+            incidents = incidents.filter(incident_datetime__date__gte=date_from)
+        except ValueError:
+            pass
+
+    if date_to:
+        try:
+            date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
+            incidents = incidents.filter(incident_datetime__date__lte=date_to)
+        except ValueError:
+            pass
+
+    # Ordering and additional processing
+    incidents = incidents.order_by('-incident_datetime')
+
+    # Get service users based on filtered incidents
+    service_users = ServiceUser.objects.filter(
+        id__in=incidents.values_list('service_user', flat=True).distinct()
+    ).order_by('first_name')
+
+    # Add image preview flag
+    for incident in incidents:
+        incident.has_images = any([
+            incident.image1,
+            incident.image2,
+            incident.image3
+        ])
+
+    return render(request, 'forms/incident_report_list.html', {
+        'incidents': incidents,
+        'service_users': service_users,
+        'search_params': request.GET
+    })
+
+
+def view_incident_report(request, pk):
+    incident = get_object_or_404(IncidentReport, pk=pk)
+
+    context = {
+        'data': {
+            'id': incident.id,
+            'staff': incident.staff,
+            'service_user': incident.service_user,
+            'carehome': incident.carehome,
+            'incident_datetime': incident.incident_datetime.strftime('%Y-%m-%d %H:%M'),
+            'location': incident.location,
+            'dob': incident.dob.strftime('%Y-%m-%d'),
+            'staff_involved': incident.staff_involved,
+            'prior_description': incident.prior_description,
+            'incident_description': incident.incident_description,
+            'user_response': incident.user_response,
+            'contacted_manager': incident.contacted_manager,
+            'manager_contact_date': incident.manager_contact_date.strftime(
+                '%Y-%m-%d %H:%M') if incident.manager_contact_date else None,
+            'manager_contact_comment': incident.manager_contact_comment,
+            'contacted_police': incident.contacted_police,
+            'police_contact_date': incident.police_contact_date.strftime(
+                '%Y-%m-%d %H:%M') if incident.police_contact_date else None,
+            'police_contact_comment': incident.police_contact_comment,
+            'contacted_paramedics': incident.contacted_paramedics,
+            'paramedics_contact_date': incident.paramedics_contact_date.strftime(
+                '%Y-%m-%d %H:%M') if incident.paramedics_contact_date else None,
+            'paramedics_contact_comment': incident.paramedics_contact_comment,
+            'contacted_other': incident.contacted_other,
+            'other_contact_name': incident.other_contact_name,
+            'other_contact_date': incident.other_contact_date.strftime(
+                '%Y-%m-%d %H:%M') if incident.other_contact_date else None,
+            'other_contact_comment': incident.other_contact_comment,
+            'prn_administered': incident.prn_administered,
+            'prn_by_whom': incident.prn_by_whom,
+            'injuries_detail': incident.injuries_detail,
+            'property_damage': incident.property_damage,
+            'pdf_file': incident.pdf_file,
+            # Add these image fields
+            'image1': incident.image1,
+            'image2': incident.image2,
+            'image3': incident.image3,
+            'get_images': [img for img in [incident.image1, incident.image2, incident.image3] if img]
+        },
+        'can_edit': request.user.has_perm('core.change_incidentreport')
+    }
+    return render(request, 'core/incident_report_template.html', context)
+
+
+def download_incident_pdf(request, form_id):
+    form_data = get_object_or_404(IncidentReport, id=form_id)
+
+    html_string = render_to_string('pdf_templates/incident_pdf.html', {
+        'data': form_data,
+        'request': request  # Important for media URL resolution
+    })
+
+    base_url = request.build_absolute_uri('/')
+    pdf_file = html_to_pdf(html_string, base_url=base_url)
+
+    response = HttpResponse(pdf_file, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="incident_report_{form_id}.pdf"'
+    return response
@@ -0,0 +1,410 @@
+"""Shift logs: creating, filling, locking and viewing daily log entries"""
+
+import logging
+from datetime import datetime, timedelta, date, time
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db import transaction
+from django.http import HttpResponseForbidden, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from core import outbox
+from core.archive import get_log_entries
+from core.compliance import heatmap
+from core.warehouse import report
+from core.utils import generate_shift_times
+from core.models import CustomUser, LatestLogEntry, Mapping, MissedLog, CareHome, ServiceUser, LogEntry
+from .common import is_manager_or_teamlead
+
+logger = logging.getLogger(__name__)
+
+
+def coerce_to_time(val):
+    if isinstance(val, datetime.time):
+        return val
+    if isinstance(val, str):
+        h, m = map(int, val.split(":"))
+        return datetime.time(h, m)
+    return None
+
+
+def generate_time_slots(start_time, end_time):
+    """Generate hourly time slots between start and end times"""
+    time_slots = []
+    current_time = start_time
+
+    while current_time < end_time:
+        time_slots.append(current_time)
+        # Add one hour
+        current_time = (datetime.combine(date.today(), current_time) + timedelta(hours=1)).time()
+
+    return time_slots
+
+
+@login_required
+def create_log_view(request):
+    try:
+        mapping = Mapping.objects.get(staff=request.user)
+    except Mapping.DoesNotExist:
+        messages.error(request,
+                       "Your account is not mapped to any carehomes or service users. Please contact your administrator.")
+        return redirect('admin-dashboard')  # Or wherever makes sense in your app
+
+    if request.method == "POST":
+        # Get form data
+        carehome_id = request.POST.get("carehome")
+        service_user_id = request.POST.get("service_user")
+
+        if not carehome_id or not service_user_id:
+            messages.error(request, "Please select both a carehome and service user")
+            return redirect('create_log_view')
+
+        try:
+            carehome = mapping.carehomes.get(id=carehome_id)
+            service_user = mapping.service_users.get(id=service_user_id)
+        except (CareHome.DoesNotExist, ServiceUser.DoesNotExist):
+            messages.error(request,
+                           "Invalid selection - you can only create logs for mapped carehomes and service users")
+            return redirect('create_log_view')
+
+        shift = request.POST.get("shift", "").lower()
+        if shift not in ['morning', 'night']:
+            messages.error(request, "Please select a valid shift")
+            return redirect('create_log_view')
+
+        today = timezone.localdate()
+
+        # Check if log already exists
+        existing_log = LatestLogEntry.objects.filter(
+            user=request.user,
+            carehome=carehome,
+            service_user=service_user,
+            shift=shift,
+            date=today
+        ).first()
+
+        if existing_log:
+            messages.info(request, "You've already created a log for this shift today")
+            return redirect('log_detail_view', pk=existing_log.id)
+
+        # Create new log
+        new_log = LatestLogEntry.objects.create(
+            user=request.user,
+            carehome=carehome,
+            service_user=service_user,
+            shift=shift,
+            date=today,
+            status='incomplete'
+        )
+        messages.success(request, "New log created successfully")
+        return redirect('log-entry-form', latest_log_id=new_log.id)
+
+    # GET request - show selection form
+    return render(request, 'logs/log_entry_create.html', {
+        "carehomes": mapping.carehomes.all(),
+        "service_users": mapping.service_users.all(),
+        "shifts": ['Morning', 'Night'],  # Display names
+        "shift_values": ['morning', 'night']  # Actual values
+    })
+
+
+@login_required
+def log_entry_form(request, latest_log_id):
+    latest_log = get_object_or_404(LatestLogEntry, id=latest_log_id)
+    shift = latest_log.shift.lower()
+    carehome = latest_log.carehome
+    service_user = latest_log.service_user
+    today = latest_log.date
+
+    # Permission check - staff can only edit their own logs
+    if request.user.role == 'staff' and latest_log.user != request.user:
+        messages.error(request, "You can only edit your own logs")
+        return redirect('staff-dashboard')
+
+    # For staff users - redirect to view if log is already completed
+    if (request.user.role == 'staff' and
+            latest_log.status == 'completed' and
+            not request.GET.get('force_edit')):
+        messages.info(request, "Viewing completed log. Use 'Edit' button to make changes.")
+        return redirect('log-detail-view', latest_log_id=latest_log.id)
+
+    # Archived shifts have no hourly rows left to edit
+    if latest_log.archived_at:
+        messages.info(request, "This log has been archived and can only be viewed.")
+        return redirect('log_detail_view', pk=latest_log.id)
+
+    # Dynamically choose shift start time
+    if shift == "morning":
+        base_start_time = carehome.morning_shift_start or time(8, 0)
+    elif shift == "night":
+        base_start_time = carehome.night_shift_start or time(20, 0)
+    else:
+        base_start_time = time(8, 0)  # fallback
+
+    time_slots = generate_shift_times(base_start_time)
+
+    # Get or create log entries
+    log_entries = []
+    for slot in time_slots:
+        entry, created = LogEntry.objects.get_or_create(
+            user=latest_log.user,
+            carehome=latest_log.carehome,
+            service_user=latest_log.service_user,
+            shift=latest_log.shift,
+            date=latest_log.date,
+            time_slot=slot,
+            defaults={'latest_log': latest_log}
+        )
+        log_entries.append(entry)
+
+    # Sort entries by time slot if needed
+    log_entries.sort(key=lambda x: x.time_slot)
+
+    return render(request, 'forms/log_entry_form.html', {
+        'log_entries': log_entries,
+        'latest_log': latest_log,
+        'shift': latest_log.shift,
+        'carehome': carehome,
+        'service_user': service_user,
+        'today': today,
+        'can_edit': True,  # Since we got here, editing is allowed
+        'is_update': True,
+        "user_role": request.user.role,  # Flag to show this is an update
+        'force_edit_param': 'force_edit=true'  # For edit buttons in template
+    })
+
+
+@require_POST
+@login_required
+def save_log_entry(request, entry_id):
+    entry = get_object_or_404(LogEntry, id=entry_id)
+    content = request.POST.get('content', '').strip()
+
+    if not content:
+        return JsonResponse({'success': False, 'error': 'Content cannot be empty'})
+
+    try:
+        with transaction.atomic():
+            # REMOVED THE is_locked CHECK
+            entry.content = content
+            entry.save()
+
+            if entry.latest_log_id:
+                # Re-rendered by the outbox worker after commit, once per burst of saves
+                outbox.enqueue('log.render_pdf', coalesce=True, latest_log_id=entry.latest_log_id)
+
+        return JsonResponse({'success': True})
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@login_required
+def lock_log_entries(request, latest_log_id):
+    try:
+        # Get the log entry with proper permission checking
+        latest_log = get_object_or_404(
+            LatestLogEntry,
+            id=latest_log_id,
+            user=request.user  # Ensures user owns this log
+        )
+
+        # Only the row updates happen here; the PDF, missed-log resolution and
+        # notifications run in the outbox worker once this has committed
+        with transaction.atomic():
+            # Update log status (save() also points this shift's entries at the log)
+            latest_log.status = 'locked'
+            latest_log.save()
+
+            # Lock all related entries
+            updated = LogEntry.objects.filter(
+                latest_log=latest_log,
+                is_locked=False  # Only lock unlocked entries
+            ).update(is_locked=True)
+
+            outbox.enqueue('log.render_pdf', latest_log_id=latest_log.pk)
+            outbox.enqueue('log.resolve_missed', latest_log_id=latest_log.pk)
+            outbox.enqueue('log.notify_locked', latest_log_id=latest_log.pk)
+
+        messages.success(request, f"Successfully locked log with {updated} entries")
+        return redirect('staff-dashboard')
+
+    except Exception as e:
+        messages.error(request, f"Error locking log: {str(e)}")
+        return redirect('staff-dashboard')
+
+
+@login_required
+def edit_log_entry_by_admin(request, latest_log_id):
+    log = get_object_or_404(LatestLogEntry, id=latest_log_id)
+
+    if request.user.role not in ['team_lead', 'manager'] and not request.user.is_superuser:
+        return HttpResponseForbidden("Permission denied.")
+
+    # Archived shifts have no hourly rows left to edit
+    if log.archived_at:
+        messages.info(request, "This log has been archived and can only be viewed.")
+        return redirect('log_detail_view', pk=log.id)
+
+    entries = LogEntry.objects.filter(latest_log=log)
+    return render(request, 'forms/log_entry_form.html', {
+        'log_entries': entries,
+        'latest_log': log,
+        'admin_edit': True
+    })
+
+
+@login_required
+def log_detail_view(request, pk):
+    latest_log = get_object_or_404(LatestLogEntry, pk=pk)
+    user = request.user
+
+    # Permission logic
+    is_owner = latest_log.user == user
+    is_superuser = user.is_superuser
+    is_manager = user.role == 'manager'
+    is_team_lead = user.role == 'team_lead'
+
+    # Determine access rights
+    can_view = False
+    can_edit = False
+
+    if is_superuser or is_manager:
+        # Managers/superusers can view/edit all logs
+        can_view = True
+        can_edit = not latest_log.status == 'locked'
+
+    elif is_team_lead:
+        # Team leads can view/edit logs from their carehome
+        if latest_log.carehome == user.carehome:
+            can_view = True
+            can_edit = (is_owner or not latest_log.status == 'locked')
+
+    elif is_owner:
+        # Owners can always view their own logs
+        can_view = True
+        can_edit = not latest_log.status == 'locked'
+
+    else:
+        # Regular staff can only view if they're assigned to the same carehome
+        if hasattr(user, 'carehome') and latest_log.carehome == user.carehome:
+            can_view = True
+
+    if not can_view:
+        return HttpResponseForbidden("You don't have permission to view this log")
+
+    # Get log entries (falls back to the compressed archive for old shifts)
+    log_entries = get_log_entries(latest_log)
+
+    context = {
+        'latest_log': latest_log,
+        'log_entries': log_entries,
+        'can_edit': can_edit,
+        'user_role': user.role
+    }
+
+    return render(request, 'logs/log_detail.html', context)
+
+
+@login_required
+def view_latest_log_detail(request, pk):
+    log = get_object_or_404(LatestLogEntry, id=pk)
+
+    if request.user.role not in ['team_lead'] and not request.user.is_superuser:
+        return HttpResponseForbidden("You are not allowed to view this log.")
+
+    if log.log_pdf:
+        # render PDF into HTML form OR show download
+        return render(request, 'forms/log_entry_from_pdf.html', {'log': log})
+    else:
+        # fallback to show log data
+        return redirect('log-entry-form')
+
+
+@login_required
+def staff_latest_logs_view(request):
+    user = request.user
+
+    if user.is_superuser:
+        # Manager view: show all staff logs sorted by latest
+        logs = LatestLogEntry.objects.all().order_by('-date', '-created_at')
+
+    elif user.role == 'team_lead':
+        # Team Lead view: show logs of staff in same carehome
+        staff_users = CustomUser.objects.filter(role='staff', carehome=user.carehome)
+        logs = LatestLogEntry.objects.filter(user__in=staff_users).order_by('-date', '-created_at')
+
+    else:
+        # Staff: only own logs
+        logs = LatestLogEntry.objects.filter(user=user).order_by('-date', '-created_at')
+
+    logs = logs.select_related('service_user', 'carehome')
+    return render(request, 'forms/staff_latest_logs.html', {'logs': logs})
+
+
+@login_required
+def missed_shifts_view(request):
+    # Calculate date range (last 6 months)
+    today = timezone.localdate()
+    six_months_ago = today - timedelta(days=180)
+
+    # Get all unresolved missed logs in this period
+    missed_logs = MissedLog.objects.filter(
+        date__gte=six_months_ago,
+        resolved_at__isnull=True
+    ).select_related('carehome', 'service_user').order_by('-date')
+
+    total_missed = missed_logs.count()
+    logger.debug("Found %s missed logs between %s and %s", total_missed, six_months_ago, today)
+
+    context = {
+        'missing_entries': missed_logs,
+        'total_missed': total_missed,
+        'date_range': f"{six_months_ago.strftime('%b %d, %Y')} to {today.strftime('%b %d, %Y')}"
+    }
+
+    return render(request, 'core/missed_logs.html', context)
+
+
+@login_required
+@user_passes_test(is_manager_or_teamlead)
+def api_compliance_heatmap(request):
+    """Missed shifts per resident and day for one care home, with compliance percentages"""
+    carehomes = CareHome.objects.all() if request.user.is_superuser else request.user.get_managed_carehomes()
+    today = timezone.localdate()
+    try:
+        carehome = get_object_or_404(carehomes, pk=int(request.GET.get('carehome', '')))
+        date_to = request.GET.get('date_to')
+        date_to = min(datetime.strptime(date_to, '%Y-%m-%d').date(), today) if date_to else today
+        date_from = request.GET.get('date_from')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else date_to - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid filter value'}, status=400)
+    if not date_to - timedelta(days=365) <= date_from <= date_to:
+        return JsonResponse({'error': 'date_from must be on or before date_to, at most a year earlier'}, status=400)
+
+    return JsonResponse(heatmap(carehome, date_from, date_to))
+
+
+@login_required
+@user_passes_test(is_manager_or_teamlead)
+def api_analytics(request):
+    """One report from the analytics warehouse, for the care homes this user manages"""
+    carehomes = CareHome.objects.all() if request.user.is_superuser else request.user.get_managed_carehomes()
+    carehome_ids = set(carehomes.values_list('pk', flat=True))
+    today = timezone.localdate()
+    try:
+        if request.GET.get('carehome'):
+            carehome_ids &= {int(request.GET['carehome'])}
+        date_to = request.GET.get('date_to')
+        date_to = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else today
+        date_from = request.GET.get('date_from')
+        date_from = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else date_to - timedelta(days=364)
+        data = report(request.GET.get('report', 'shift_logs'), carehome_ids, date_from, date_to,
+                      by=request.GET.get('by', 'month'))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc) or 'Invalid filter value'}, status=400)
+    return JsonResponse(data)
@@ -0,0 +1,189 @@
+"""Rota matrix and rota approval endpoints"""
+
+import json
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+
+from core.models import Rota, Shift
+from .common import api_ok, api_error, is_manager_or_teamlead
+
+
+@login_required
+@user_passes_test(is_manager_or_teamlead)
+def carehome_shift_matrix(request):
+    # Example context
+    return render(request, 'core/carehome_shift_matrix.html', {})
+
+
+def approve_rota(request, rota_id):
+    rota = Rota.objects.get(id=rota_id)
+    rota.status = "Published"
+    rota.save()
+
+    # notify all staff assigned
+    for staff in rota.assigned_staff.all():
+        send_notification(
+            user=staff,
+            title="Rota Published",
+            message="A new rota has been published. Please review your schedule."
+        )
+
+
+def reject_rota(request, rota_id):
+    rota = Rota.objects.get(id=rota_id)
+    rota.status = "Returned"
+    rota.save()
+
+    send_notification(
+        user=rota.created_by,
+        title="Rota Rejected",
+        message="Manager rejected your rota. Please make the required changes."
+    )
+
+
+@csrf_exempt
+@login_required
+def api_rota_submit(request):
+    try:
+        data = json.loads(request.body.decode())
+    except:
+        return api_error("Invalid JSON")
+
+    rota_id = data.get("rota_id")
+    if not rota_id:
+        return api_error("rota_id required")
+
+    try:
+        rota = Rota.objects.get(id=rota_id)
+    except Rota.DoesNotExist:
+        return api_error("Rota not found")
+
+    rota.status = "Submitted"
+    rota.save()
+
+    return api_ok({"status": rota.status})
+
+
+@csrf_exempt
+@login_required
+def api_rota_reject(request):
+    try:
+        data = json.loads(request.body.decode())
+    except:
+        return api_error("Invalid JSON")
+
+    rota_id = data.get("rota_id")
+    comment = data.get("comment", "")
+
+    if not rota_id:
+        return api_error("rota_id required")
+
+    try:
+        rota = Rota.objects.get(id=rota_id)
+    except Rota.DoesNotExist:
+        return api_error("Rota not found")
+
+    rota.status = "Rejected"
+    rota.manager_message = comment
+    rota.save()
+
+    return api_ok({"status": rota.status})
+
+
+@csrf_exempt
+@login_required
+def api_rota_publish(request):
+
+    try:
+        data = json.loads(request.body.decode())
+    except:
+        return api_error("Invalid JSON")
+
+    rota_id = data.get("rota_id")
+    if not rota_id:
+        return api_error("rota_id required")
+
+    try:
+        rota = Rota.objects.get(id=rota_id)
+    except Rota.DoesNotExist:
+        return api_error("Rota not found")
+
+    rota.status = "Published"
+    rota.approved_by = request.user
+    rota.save()
+
+    return api_ok({"status": rota.status})
+
+
+@csrf_exempt
+@login_required
+def api_rota_save_draft(request):
+    try:
+        data = json.loads(request.body.decode())
+    except:
+        return api_error("Invalid JSON")
+
+    carehome_id = data.get("carehome_id")
+    week_start = data.get("week_start")
+
+    if not carehome_id or not week_start:
+        return api_error("carehome_id and week_start required")
+
+    rota, created = Rota.objects.get_or_create(
+        carehome_id=carehome_id,
+        week_start=week_start,
+        defaults={"created_by": request.user}
+    )
+
+    rota.status = "Draft"
+    rota.save()
+
+    return api_ok({"rota_id": rota.id, "status": rota.status})
+
+
+@csrf_exempt
+@login_required
+def api_shifts_list(request):
+
+    if request.method not in ["POST", "PUT"]:
+        return api_error("Method not allowed", status=405)
+
+    try:
+        data = json.loads(request.body.decode())
+    except:
+        return api_error("Invalid JSON format")
+
+    # Validate required fields
+    required = ["rota_id", "date", "shift_type"]
+    if not all(k in data for k in required):
+        return api_error("Missing required fields")
+
+    rota_id = data.get("rota_id")
+
+    try:
+        rota = Rota.objects.get(id=rota_id)
+    except Rota.DoesNotExist:
+        return api_error("Rota not found")
+
+    # If PUT → update existing shift
+    shift_id = data.get("id")
+    if request.method == "PUT" and shift_id:
+        try:
+            shift = Shift.objects.get(id=shift_id)
+        except Shift.DoesNotExist:
+            return api_error("Shift not found")
+    else:
+        shift = Shift(rota=rota)
+
+    # Assign fields
+    shift.date = data.get("date")
+    shift.shift_type = data.get("shift_type")
+    shift.staff_id = data.get("staff_id")
+    shift.service_user_id = data.get("service_user_id")
+    shift.notes = data.get("notes", "")
+
+    shift.save()
+
+    return api_ok({"shift_id": shift.id})
@@ -0,0 +1,30 @@
+"""Full-text search"""
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from core.search import search_documents
+from core.utils import get_filtered_queryset
+from core.models import SearchDocument
+
+
+@login_required
+@require_GET
+def search_view(request):
+    """Full-text search over log entries, incident reports and ABC forms"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'q parameter is required'}, status=400)
+
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+
+    documents = get_filtered_queryset(SearchDocument, request.user)
+    kind = request.GET.get('kind')
+    if kind:
+        documents = documents.filter(kind=kind)
+
+    return JsonResponse(search_documents(documents, query, page=page))
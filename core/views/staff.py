@@ -0,0 +1,296 @@
+"""Login, dashboards, staff accounts and staff/service user mappings"""
+
+import logging
+
+from django.contrib import messages
+from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.views.generic import DetailView, FormView
+
+from core.listcache import carehome_list
+from core.utils import get_filtered_queryset
+from core.models import CustomUser, LatestLogEntry, Mapping, ABCForm, IncidentReport, CareHome, LogEntry
+from core.forms import StaffCreationForm, MappingForm, ContactEmailPasswordResetForm
+
+logger = logging.getLogger(__name__)
+
+
+def login_view(request):
+    if request.method == 'POST':
+        email = request.POST.get('username')
+        password = request.POST.get('password')
+
+        user = authenticate(request, username=email, password=password)
+
+        if user is not None:
+            login(request, user)
+
+            # Update last active safely
+            user.last_active = timezone.now()
+            user.save(update_fields=["last_active"])
+
+            if user.is_superuser or user.role == CustomUser.Manager:
+                return redirect('admin-dashboard')
+            else:
+                return redirect('staff-dashboard')
+
+        logger.info("Failed login", extra={'email': email})
+        return render(request, 'core/login.html', {
+            'error': 'Invalid email or password'
+        })
+
+    return render(request, 'core/login.html')
+
+
+def logout_view(request):
+    logout(request)
+    return redirect('login')
+
+
+@login_required
+def dashboard(request):
+    user = request.user
+
+    if user.is_superuser or user.role == CustomUser.Manager:
+        context = {
+            "active_users_count": CustomUser.objects.filter(is_active=True).count(),
+            "incident_reports_count": IncidentReport.objects.count(),
+            "abc_forms_count": ABCForm.objects.count(),
+            "latest_logs_count": LatestLogEntry.objects.count(),
+            "missed_logs_count": LogEntry.objects.filter(is_locked=False, content="",
+                                                         date__lt=timezone.localdate()).count(),
+            "recent_carehomes": CareHome.objects.order_by("-created_at")[:5],
+            "can_add_carehome": True,  # Show 'Add New Carehome' button
+        }
+        return render(request, "core/dashboard.html", context)
+
+    elif user.role == CustomUser.TEAM_LEAD:
+        # carehome = user.carehome
+        # staff_users = CustomUser.objects.filter(role='staff', carehome=carehome)
+        # latest_logs_qs = LatestLogEntry.objects.filter(user__in=staff_users)
+        #
+        # context = {
+        #     "active_users_count": staff_users.filter(is_active=True).count(),
+        #     "incident_reports_count": IncidentReport.objects.filter(carehome=carehome).count(),
+        #     "abc_forms_count": ABCForm.objects.filter(service_user__carehome=carehome).count(),
+        #     "latest_logs_count": latest_logs_qs.count(),
+        #     "missed_logs_count": LogEntry.objects.filter(
+        #         user__in=staff_users,
+        #         is_locked=False,
+        #         content="",
+        #         date__lt=timezone.localdate()
+        #     ).count(),
+        #     "recent_carehomes": CareHome.objects.filter(id=carehome.id),
+        #     "can_add_carehome": False,
+        # }
+        # return render(request, "core/dashboard.html", context)
+        context = {
+            "incident_reports_count": IncidentReport.objects.filter(staff=user).count(),
+            "abc_forms_count": ABCForm.objects.filter(created_by=user).count(),
+            "latest_logs_count": LatestLogEntry.objects.filter(user=user).count(),
+            "missed_logs_count": LogEntry.objects.filter(user=user, is_locked=False, content="",
+                                                         date__lt=timezone.localdate()).count(),
+        }
+        return render(request, "core/staff_dashboard.html", context)
+
+
+
+    elif user.role == CustomUser.STAFF:
+        context = {
+            "incident_reports_count": IncidentReport.objects.filter(staff=user).count(),
+            "abc_forms_count": ABCForm.objects.filter(created_by=user).count(),
+            "latest_logs_count": LatestLogEntry.objects.filter(user=user).count(),
+            "missed_logs_count": LogEntry.objects.filter(user=user, is_locked=False, content="",
+                                                         date__lt=timezone.localdate()).count(),
+        }
+        return render(request, "core/staff_dashboard.html", context)
+
+    return redirect("login")
+
+
+@login_required
+def create_staff(request):
+    carehomes = carehome_list()
+
+    if request.method == 'POST':
+        form = StaffCreationForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                staff = form.save(commit=False)
+
+                if 'image' in request.FILES:
+                    logger.debug("Uploading staff image %s", request.FILES['image'].name)
+                    staff.image = request.FILES['image']
+
+                if staff.role == CustomUser.TEAM_LEAD:
+                    staff.is_staff = True
+
+                staff.save()
+                messages.success(request, 'Staff member created successfully!')
+                return redirect('staff-dashboard')
+
+            except Exception as e:
+                messages.error(request, f'Error saving staff: {str(e)}')
+                logger.error(f"Staff creation error: {str(e)}")
+        else:
+            for field, errors in form.errors.items():
+                for error in errors:
+                    messages.error(request, f"{field}: {error}")
+
+    form = form if request.method == 'POST' else StaffCreationForm()
+    return render(request, 'staff/create.html', {
+        'form': form,
+        'carehomes': carehomes,
+        'edit_mode': False
+    })
+
+
+@login_required
+def edit_staff(request, pk):
+    staff = get_object_or_404(CustomUser, pk=pk)
+    carehomes = carehome_list()
+
+    if request.method == 'POST':
+        form = StaffCreationForm(request.POST, request.FILES, instance=staff)
+        if form.is_valid():
+            staff = form.save(commit=False)
+            if staff.role == CustomUser.TEAM_LEAD:
+                staff.is_staff = True
+            else:
+                staff.is_staff = False
+            staff.save()
+            return redirect('staff-dashboard')
+    else:
+        form = StaffCreationForm(instance=staff)
+
+    return render(request, 'staff/create.html', {
+        'form': form,
+        'carehomes': carehomes,
+        'edit_mode': True
+    })
+
+
+@login_required
+def toggle_staff_status(request, pk):
+    staff = get_object_or_404(CustomUser, pk=pk)
+    staff.is_active = not staff.is_active
+    staff.save()
+    return redirect('staff-dashboard')
+
+
+@login_required
+def staff_dashboard(request):
+    if request.user.role == CustomUser.TEAM_LEAD:
+        staff_list = CustomUser.objects.filter(carehome=request.user.carehome)
+    elif request.user.is_superuser:
+        staff_list = CustomUser.objects.all()
+    else:
+        staff_list = CustomUser.objects.filter(pk=request.user.pk)
+
+    return render(request, 'staff/dashboard.html', {'staff_list': staff_list})
+
+
+@login_required
+def active_users_view(request):
+    staff_list = get_filtered_queryset(CustomUser, request.user).select_related('carehome')
+    return render(request, 'core/active_users.html', {'staff_list': staff_list})
+
+
+def create_mapping(request):
+    if request.method == 'POST':
+        form = MappingForm(request.POST)
+        if form.is_valid():
+            form.save()
+            return redirect('mapping_success')  # or your desired success route
+    else:
+        form = MappingForm()
+    return render(request, 'core/staff_mapping.html', {'form': form})
+
+
+def staff_mapping_view(request):
+    mappings = Mapping.objects.select_related('staff').prefetch_related('carehomes', 'service_users__carehome')
+    form = MappingForm()
+    mapping_id = request.GET.get('edit', None)
+    mapping_instance = None
+
+    if mapping_id:
+        mapping_instance = get_object_or_404(Mapping, id=mapping_id)
+
+    if request.method == "POST":
+        if mapping_instance:
+            form = MappingForm(request.POST, instance=mapping_instance)
+        else:
+            form = MappingForm(request.POST)
+
+        if form.is_valid():
+            form.save()
+            return redirect('staff-mapping')
+
+    context = {
+        'form': form,
+        'mappings': mappings,
+        'show_form': request.method == "POST" or 'show_form' in request.GET or mapping_id,
+        'editing': mapping_instance is not None,
+        'mapping_instance': mapping_instance
+    }
+    return render(request, 'core/staff_mapping.html', context)
+
+
+def delete_mapping(request, pk):
+    mapping = get_object_or_404(Mapping, id=pk)
+    if request.method == 'POST':
+        mapping.delete()
+        return redirect('staff-mapping')
+    return redirect('staff-mapping')
+
+
+def id_card_preview(request, user_id):
+    staff = get_object_or_404(CustomUser, pk=user_id)
+
+    # Calculate expiry = date_of_joining + 1 year
+    if staff.date_of_joining:
+        expiry_date = staff.date_of_joining + relativedelta(years=1)
+        expiry_str = expiry_date.strftime("%m/%Y")
+    else:
+        expiry_str = "12/2025"  # fallback if no joining date
+
+    qr_code_value = f"PCMS{staff.first_name}{staff.last_name}{expiry_str}"
+
+    context = {
+        "first_name": staff.first_name,
+        "last_name": staff.last_name,
+        "role": staff.get_role_display(),
+        "photo": staff.image.url if staff.image else "/static/img/default-profile.png",
+        "id": staff.id,
+        "qr_code_value": qr_code_value,
+    }
+
+    return render(request, "staff/new_id_card_preview.html", context)
+
+
+class ProfileView(LoginRequiredMixin, DetailView):
+    model = CustomUser
+    template_name = "profile/profile.html"
+    context_object_name = "user_profile"
+
+    def get_object(self, queryset=None):
+        return self.request.user
+
+
+class ContactEmailPasswordResetView(FormView):
+    template_name = "core/password_reset_form.html"
+    success_url = reverse_lazy("password_reset_done")
+    form_class = ContactEmailPasswordResetForm
+
+    def form_valid(self, form):
+        form.send_reset_email(
+            self.request,
+            subject_template_name="core/password_reset_subject.txt",
+            email_template_name="core/password_reset_email.html"
+        )
+        messages.success(self.request, "If your details match, a reset link has been sent to your personal email.")
+        return super().form_valid(form)
@@ -0,0 +1,519 @@
+"""
+Analytics warehouse: a separate SQLite file (ANALYTICS_DB_PATH) that reporting
+dashboards read instead of the live tables, so reports never compete with care
+staff writing logs. `manage.py sync_warehouse` fills it; core.scheduler runs it
+nightly.
+
+Facts are loaded incrementally. Each run reads the source rows changed since the
+previous run started, less ANALYTICS_OVERLAP_MINUTES to catch transactions that
+committed late, and upserts them. It then drops facts whose source row no longer
+exists, comparing ids a chunk at a time. Dimensions are small, so they are
+reloaded whole. A run writes everything in one transaction. The file is in WAL
+mode, so dashboards keep reading the previous load while a sync runs and never
+wait for it. The ETL reads from the replica when one is configured.
+
+Facts, one row per source row, dated by date_key ('YYYY-MM-DD', local time):
+  fact_shift_log      LatestLogEntry, with its hourly slots and how many were filled
+  fact_incident       IncidentReport
+  fact_abc_form       ABCForm
+  fact_abc_behaviour  one row per target behaviour on an ABC form
+  fact_missed_log     MissedLog
+  fact_shift          rota Shift
+Dimensions: dim_date, dim_carehome, dim_service_user, dim_staff.
+"""
+import logging
+import os
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .archive import unpack_entries
+from .models import (
+    ABCForm, CareHome, CustomUser, IncidentReport, LatestLogEntry, LogArchive, LogEntry, MissedLog, ServiceUser,
+    Shift,
+)
+from .routers import REPLICA, replica_configured
+
+logger = logging.getLogger(__name__)
+
+# Bump when SCHEMA changes: an older file is rebuilt from scratch on the next sync
+SCHEMA_VERSION = 1
+CHUNK_SIZE = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS etl_state (
+    table_name TEXT PRIMARY KEY, watermark TEXT NOT NULL, row_count INTEGER NOT NULL, synced_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dim_date (
+    date_key TEXT PRIMARY KEY, year INTEGER, month TEXT, iso_week TEXT, weekday INTEGER, is_weekend INTEGER
+);
+CREATE TABLE IF NOT EXISTS dim_carehome (id INTEGER PRIMARY KEY, name TEXT, postcode TEXT);
+CREATE TABLE IF NOT EXISTS dim_service_user (id INTEGER PRIMARY KEY, carehome_id INTEGER, name TEXT);
+CREATE TABLE IF NOT EXISTS dim_staff (
+    id INTEGER PRIMARY KEY, carehome_id INTEGER, name TEXT, role TEXT, is_active INTEGER
+);
+CREATE TABLE IF NOT EXISTS fact_shift_log (
+    id INTEGER PRIMARY KEY, carehome_id INTEGER, service_user_id INTEGER, staff_id INTEGER, date_key TEXT,
+    shift TEXT, status TEXT, slots INTEGER, filled INTEGER, archived INTEGER, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS fact_incident (
+    id INTEGER PRIMARY KEY, carehome_id INTEGER, service_user_id INTEGER, staff_id INTEGER, date_key TEXT,
+    hour INTEGER, location TEXT, contacted_manager INTEGER, contacted_police INTEGER,
+    contacted_paramedics INTEGER, contacted_other INTEGER, prn_administered INTEGER, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS fact_abc_form (
+    id INTEGER PRIMARY KEY, carehome_id INTEGER, service_user_id INTEGER, created_by_id INTEGER, date_key TEXT,
+    hour INTEGER, behaviours INTEGER, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS fact_abc_behaviour (
+    form_id INTEGER, behaviour TEXT, carehome_id INTEGER, service_user_id INTEGER, date_key TEXT,
+    PRIMARY KEY (form_id, behaviour)
+);
+CREATE TABLE IF NOT EXISTS fact_missed_log (
+    id INTEGER PRIMARY KEY, carehome_id INTEGER, service_user_id INTEGER, date_key TEXT, shift TEXT,
+    created_at TEXT, resolved_at TEXT
+);
+CREATE TABLE IF NOT EXISTS fact_shift (
+    id INTEGER PRIMARY KEY, rota_id INTEGER, carehome_id INTEGER, date_key TEXT, shift_type TEXT,
+    staff_id INTEGER, service_user_id INTEGER, rota_status TEXT, updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS fact_shift_log_home_date ON fact_shift_log (carehome_id, date_key);
+CREATE INDEX IF NOT EXISTS fact_incident_home_date ON fact_incident (carehome_id, date_key);
+CREATE INDEX IF NOT EXISTS fact_abc_form_home_date ON fact_abc_form (carehome_id, date_key);
+CREATE INDEX IF NOT EXISTS fact_abc_behaviour_home_date ON fact_abc_behaviour (carehome_id, date_key);
+CREATE INDEX IF NOT EXISTS fact_missed_log_home_date ON fact_missed_log (carehome_id, date_key);
+CREATE INDEX IF NOT EXISTS fact_shift_home_date ON fact_shift (carehome_id, date_key);
+"""
+
+
+def _path(path=None):
+    return str(path or settings.ANALYTICS_DB_PATH)
+
+
+def connect(path=None, readonly=False):
+    """A connection to the warehouse; read-only ones raise sqlite3.OperationalError if it isn't built yet"""
+    path = _path(path)
+    if readonly:
+        return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    db = sqlite3.connect(path, isolation_level=None)  # transactions are managed explicitly
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    if db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        tables = db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        for (table,) in tables:
+            db.execute(f'DROP TABLE "{table}"')
+        db.executescript(SCHEMA)
+        db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    return db
+
+
+def _source():
+    return REPLICA if replica_configured() else 'default'
+
+
+def _date_key(value):
+    return value.isoformat() if value else None
+
+
+def _moment(value):
+    return value.isoformat() if value else None
+
+
+def _batches(rows, size=CHUNK_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------------------------------------------------------------------------
+# Facts
+# ---------------------------------------------------------------------------
+
+class Fact:
+    table = None
+    model = None
+    columns = ()
+    children = ()  # tables keyed by form_id that are rewritten with their parent row
+
+    def changed(self, since):
+        return Q(updated_at__gte=since)
+
+    def values(self, queryset):
+        raise NotImplementedError
+
+    def rows(self, batch, using):
+        """(fact rows, {child table: rows}) for a batch of source dicts"""
+        raise NotImplementedError
+
+    def source(self, using, since):
+        queryset = self.model._default_manager.using(using).order_by()
+        if since is not None:
+            queryset = queryset.filter(self.changed(since))
+        return self.values(queryset).iterator(chunk_size=CHUNK_SIZE)
+
+
+class ShiftLogFact(Fact):
+    table = 'fact_shift_log'
+    model = LatestLogEntry
+    columns = ('id', 'carehome_id', 'service_user_id', 'staff_id', 'date_key', 'shift', 'status', 'slots',
+               'filled', 'archived', 'created_at', 'updated_at')
+
+    def changed(self, since):
+        # Filling in a slot saves the LogEntry, not the log, so open logs are re-read every run;
+        # auto-lock closes them within days, which keeps that set small
+        return Q(updated_at__gte=since) | Q(status='incomplete')
+
+    def values(self, queryset):
+        return queryset.values(
+            'id', 'carehome_id', 'service_user_id', 'user_id', 'date', 'shift', 'status', 'archived_at',
+            'created_at', 'updated_at',
+        )
+
+    def _slots(self, batch, using):
+        """{log id: (slots, filled)}, from the hourly rows or from the archive once they've moved there"""
+        live = [row['id'] for row in batch if not row['archived_at']]
+        counts = {
+            row['latest_log_id']: (row['slots'], row['filled'])
+            for row in LogEntry.objects.using(using).filter(latest_log_id__in=live).order_by().values(
+                'latest_log_id'
+            ).annotate(slots=Count('id'), filled=Count('id', filter=~Q(content='')))
+        }
+        archived = {row['id']: row for row in batch if row['archived_at']}
+        if archived:
+            blobs = LogArchive.objects.using(using).filter(latest_log_id__in=archived).values_list(
+                'latest_log_id', 'data'
+            )
+            for latest_log_id, data in blobs:
+                entries = unpack_entries(LatestLogEntry(date=archived[latest_log_id]['date']), data)
+                counts[latest_log_id] = (len(entries), sum(1 for entry in entries if entry.content))
+        return counts
+
+    def rows(self, batch, using):
+        slots = self._slots(batch, using)
+        return [
+            (row['id'], row['carehome_id'], row['service_user_id'], row['user_id'], _date_key(row['date']),
+             row['shift'], row['status'], *slots.get(row['id'], (0, 0)), int(bool(row['archived_at'])),
+             _moment(row['created_at']), _moment(row['updated_at']))
+            for row in batch
+        ], {}
+
+
+class IncidentFact(Fact):
+    table = 'fact_incident'
+    model = IncidentReport
+    columns = ('id', 'carehome_id', 'service_user_id', 'staff_id', 'date_key', 'hour', 'location',
+               'contacted_manager', 'contacted_police', 'contacted_paramedics', 'contacted_other',
+               'prn_administered', 'updated_at')
+
+    def values(self, queryset):
+        return queryset.values(
+            'id', 'service_user_id', 'staff_id', 'incident_datetime', 'location', 'contacted_manager',
+            'contacted_police', 'contacted_paramedics', 'contacted_other', 'prn_administered', 'updated_at',
+            home=Coalesce('carehome_id', 'service_user__carehome_id'),
+        )
+
+    def rows(self, batch, using):
+        facts = []
+        for row in batch:
+            happened = timezone.localtime(row['incident_datetime'])
+            facts.append((
+                row['id'], row['home'], row['service_user_id'], row['staff_id'], _date_key(happened.date()),
+                happened.hour, row['location'], row['contacted_manager'], row['contacted_police'],
+                row['contacted_paramedics'], row['contacted_other'], row['prn_administered'],
+                _moment(row['updated_at']),
+            ))
+        return facts, {}
+
+
+class ABCFormFact(Fact):
+    table = 'fact_abc_form'
+    model = ABCForm
+    columns = ('id', 'carehome_id', 'service_user_id', 'created_by_id', 'date_key', 'hour', 'behaviours',
+               'updated_at')
+    children = ('fact_abc_behaviour',)
+
+    def values(self, queryset):
+        return queryset.values(
+            'id', 'service_user_id', 'service_user__carehome_id', 'created_by_id', 'date_time',
+            'target_behaviours', 'updated_at',
+        )
+
+    def rows(self, batch, using):
+        facts, behaviours = [], []
+        for row in batch:
+            happened = timezone.localtime(row['date_time'])
+            date_key = _date_key(happened.date())
+            targets = sorted(set(row['target_behaviours'] or []))
+            facts.append((
+                row['id'], row['service_user__carehome_id'], row['service_user_id'], row['created_by_id'],
+                date_key, happened.hour, len(targets), _moment(row['updated_at']),
+            ))
+            behaviours += [
+                (row['id'], behaviour, row['service_user__carehome_id'], row['service_user_id'], date_key)
+                for behaviour in targets
+            ]
+        return facts, {'fact_abc_behaviour': behaviours}
+
+
+class MissedLogFact(Fact):
+    table = 'fact_missed_log'
+    model = MissedLog
+    columns = ('id', 'carehome_id', 'service_user_id', 'date_key', 'shift', 'created_at', 'resolved_at')
+
+    def changed(self, since):
+        return Q(created_at__gte=since) | Q(resolved_at__gte=since)
+
+    def values(self, queryset):
+        return queryset.values('id', 'carehome_id', 'service_user_id', 'date', 'shift', 'created_at', 'resolved_at')
+
+    def rows(self, batch, using):
+        return [
+            (row['id'], row['carehome_id'], row['service_user_id'], _date_key(row['date']), row['shift'],
+             _moment(row['created_at']), _moment(row['resolved_at']))
+            for row in batch
+        ], {}
+
+
+class ShiftFact(Fact):
+    table = 'fact_shift'
+    model = Shift
+    columns = ('id', 'rota_id', 'carehome_id', 'date_key', 'shift_type', 'staff_id', 'service_user_id',
+               'rota_status', 'updated_at')
+
+    def changed(self, since):
+        # Publishing or archiving a rota changes its shifts' status here
+        return Q(updated_at__gte=since) | Q(rota__updated_at__gte=since)
+
+    def values(self, queryset):
+        return queryset.values(
+            'id', 'rota_id', 'rota__carehome_id', 'date', 'shift_type', 'staff_id', 'service_user_id',
+            'rota__status', 'updated_at',
+        )
+
+    def rows(self, batch, using):
+        return [
+            (row['id'], row['rota_id'], row['rota__carehome_id'], _date_key(row['date']), row['shift_type'],
+             row['staff_id'], row['service_user_id'], row['rota__status'], _moment(row['updated_at']))
+            for row in batch
+        ], {}
+
+
+FACTS = (ShiftLogFact(), IncidentFact(), ABCFormFact(), MissedLogFact(), ShiftFact())
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+def _upsert(db, table, columns, rows):
+    if rows:
+        marks = ', '.join('?' * len(columns))
+        db.executemany(f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) VALUES ({marks})', rows)
+
+
+def _delete(db, fact, ids):
+    marks = ', '.join('?' * len(ids))
+    db.execute(f'DELETE FROM {fact.table} WHERE id IN ({marks})', ids)
+    for child in fact.children:
+        db.execute(f'DELETE FROM {child} WHERE form_id IN ({marks})', ids)
+
+
+def load_fact(db, fact, using, since):
+    """Upsert the rows changed since ``since`` (all of them if None). Returns how many."""
+    loaded = 0
+    for batch in _batches(fact.source(using, since)):
+        facts, children = fact.rows(batch, using)
+        ids = [row['id'] for row in batch]
+        if fact.children:
+            _delete(db, fact, ids)
+        _upsert(db, fact.table, fact.columns, facts)
+        for child, rows in children.items():
+            _upsert(db, child, ('form_id', 'behaviour', 'carehome_id', 'service_user_id', 'date_key'), rows)
+        loaded += len(batch)
+    return loaded
+
+
+def drop_deleted(db, fact, using):
+    """Remove facts whose source row is gone; one source query per CHUNK_SIZE facts"""
+    dropped, last = 0, 0
+    manager = fact.model._default_manager.using(using)
+    while True:
+        ids = [row[0] for row in db.execute(
+            f'SELECT id FROM {fact.table} WHERE id > ? ORDER BY id LIMIT ?', (last, CHUNK_SIZE)
+        )]
+        if not ids:
+            return dropped
+        last = ids[-1]
+        gone = set(ids) - set(manager.filter(pk__in=ids).values_list('pk', flat=True))
+        if gone:
+            _delete(db, fact, sorted(gone))
+            dropped += len(gone)
+
+
+def load_dimensions(db, using):
+    db.execute('DELETE FROM dim_carehome')
+    _upsert(db, 'dim_carehome', ('id', 'name', 'postcode'),
+            list(CareHome.objects.using(using).order_by().values_list('id', 'name', 'postcode')))
+
+    db.execute('DELETE FROM dim_service_user')
+    residents = ServiceUser.objects.using(using).order_by().values_list('id', 'carehome_id', 'first_name', 'last_name')
+    _upsert(db, 'dim_service_user', ('id', 'carehome_id', 'name'), [
+        (pk, carehome_id, f"{first_name} {last_name}") for pk, carehome_id, first_name, last_name in residents
+    ])
+
+    db.execute('DELETE FROM dim_staff')
+    staff = CustomUser.objects.using(using).order_by().values_list(
+        'id', 'carehome_id', 'first_name', 'last_name', 'email', 'role', 'is_active'
+    )
+    _upsert(db, 'dim_staff', ('id', 'carehome_id', 'name', 'role', 'is_active'), [
+        (pk, carehome_id, f"{first_name} {last_name}".strip() or email, role, is_active)
+        for pk, carehome_id, first_name, last_name, email, role, is_active in staff
+    ])
+
+    # Every date any fact falls on, so reports can always join dim_date
+    spans = ' UNION ALL '.join(
+        f'SELECT MIN(date_key), MAX(date_key) FROM {fact.table}' for fact in FACTS
+    )
+    bounds = [row for row in db.execute(spans) if row[0]]
+    if not bounds:
+        return
+    day = datetime.strptime(min(low for low, _ in bounds), '%Y-%m-%d').date()
+    last = datetime.strptime(max(high for _, high in bounds), '%Y-%m-%d').date()
+    dates = []
+    while day <= last:
+        year, week, _ = day.isocalendar()
+        dates.append((day.isoformat(), day.year, day.strftime('%Y-%m'), f'{year}-W{week:02d}',
+                      day.weekday(), int(day.weekday() >= 5)))
+        day += timedelta(days=1)
+    db.executemany('INSERT OR IGNORE INTO dim_date VALUES (?, ?, ?, ?, ?, ?)', dates)
+
+
+def sync(path=None, full=False, now=None, progress=None):
+    """
+    Bring the warehouse up to date. ``full`` reloads every fact.
+    Returns {fact table: {'loaded', 'deleted'}}.
+    """
+    now = now or timezone.now()
+    using = _source()
+    overlap = timedelta(minutes=settings.ANALYTICS_OVERLAP_MINUTES)
+    db = connect(path)
+    totals = {}
+    try:
+        db.execute('BEGIN IMMEDIATE')
+        watermarks = dict(db.execute('SELECT table_name, watermark FROM etl_state'))
+        for fact in FACTS:
+            watermark = None if full else watermarks.get(fact.table)
+            since = datetime.fromisoformat(watermark) - overlap if watermark else None
+            loaded = load_fact(db, fact, using, since)
+            deleted = drop_deleted(db, fact, using)
+            row_count = db.execute(f'SELECT COUNT(*) FROM {fact.table}').fetchone()[0]
+            db.execute('INSERT OR REPLACE INTO etl_state VALUES (?, ?, ?, ?)',
+                       (fact.table, now.isoformat(), row_count, timezone.now().isoformat()))
+            totals[fact.table] = {'loaded': loaded, 'deleted': deleted}
+            if progress:
+                progress(fact.table, totals[fact.table])
+        load_dimensions(db, using)
+        db.execute('COMMIT')
+    except BaseException:
+        if db.in_transaction:
+            db.execute('ROLLBACK')
+        raise
+    finally:
+        db.close()
+
+    logger.info("Warehouse sync: %s", ", ".join(
+        f"{table} {counts['loaded']} loaded/{counts['deleted']} deleted" for table, counts in totals.items()
+    ))
+    return totals
+
+
+# ---------------------------------------------------------------------------
+# Queries for dashboards
+# ---------------------------------------------------------------------------
+
+Report = namedtuple('Report', 'table measures where groups')
+
+TIME_GROUPS = ('day', 'week', 'month', 'carehome', 'service_user')
+
+REPORTS = {
+    'shift_logs': Report('fact_shift_log', {
+        'logs': 'COUNT(*)', 'locked': "SUM(f.status = 'locked')", 'slots': 'SUM(f.slots)', 'filled': 'SUM(f.filled)',
+    }, '', TIME_GROUPS),
+    'incidents': Report('fact_incident', {
+        'incidents': 'COUNT(*)', 'police': 'SUM(f.contacted_police)', 'paramedics': 'SUM(f.contacted_paramedics)',
+        'prn': 'SUM(f.prn_administered)',
+    }, '', TIME_GROUPS),
+    'abc_forms': Report('fact_abc_form', {
+        'forms': 'COUNT(*)', 'behaviours': 'SUM(f.behaviours)',
+    }, '', TIME_GROUPS),
+    'behaviours': Report('fact_abc_behaviour', {
+        'forms': 'COUNT(*)',
+    }, '', TIME_GROUPS + ('behaviour',)),
+    'missed_logs': Report('fact_missed_log', {
+        'missed': 'COUNT(*)', 'unresolved': 'SUM(f.resolved_at IS NULL)',
+    }, '', TIME_GROUPS),
+    'shifts': Report('fact_shift', {
+        'shifts': 'COUNT(*)', 'unassigned': 'SUM(f.staff_id IS NULL)',
+    }, "AND f.rota_status = 'published'", TIME_GROUPS),
+}
+
+# by: (key, label, join)
+GROUPS = {
+    'day': ('d.date_key', 'd.date_key', ''),
+    'week': ('d.iso_week', 'd.iso_week', ''),
+    'month': ('d.month', 'd.month', ''),
+    'carehome': ('f.carehome_id', 'c.name', 'LEFT JOIN dim_carehome c ON c.id = f.carehome_id'),
+    'service_user': ('f.service_user_id', 's.name', 'LEFT JOIN dim_service_user s ON s.id = f.service_user_id'),
+    'behaviour': ('f.behaviour', 'f.behaviour', ''),
+}
+
+
+def last_synced(db):
+    row = db.execute('SELECT MAX(synced_at) FROM etl_state').fetchone()
+    return row[0] if row else None
+
+
+def report(name, carehome_ids, date_from, date_to, by='month', path=None):
+    """
+    One report's measures for ``carehome_ids`` between two dates, grouped ``by``.
+    Returns {'report', 'by', 'measures', 'rows': [{'key', 'label', measure: value}], 'synced_at'};
+    no rows and synced_at None before the first sync. Raises ValueError for an unknown report or grouping.
+    """
+    if name not in REPORTS:
+        raise ValueError(f"Unknown report {name!r}")
+    spec = REPORTS[name]
+    if by not in spec.groups:
+        raise ValueError(f"{name} can't be grouped by {by!r}")
+    result = {'report': name, 'by': by, 'measures': list(spec.measures), 'rows': [], 'synced_at': None}
+    carehome_ids = list(carehome_ids)
+    if not carehome_ids or not os.path.exists(_path(path)):
+        return result
+
+    key, label, join = GROUPS[by]
+    measures = ', '.join(f'{sql} AS {measure}' for measure, sql in spec.measures.items())
+    homes = ', '.join('?' * len(carehome_ids))
+    sql = f"""
+        SELECT {key} AS key, {label} AS label, {measures}
+        FROM {spec.table} f JOIN dim_date d ON d.date_key = f.date_key {join}
+        WHERE f.carehome_id IN ({homes}) AND f.date_key BETWEEN ? AND ? {spec.where}
+        GROUP BY {key} ORDER BY {key}
+    """
+    db = connect(path, readonly=True)
+    try:
+        cursor = db.execute(sql, [*carehome_ids, date_from.isoformat(), date_to.isoformat()])
+        columns = [column[0] for column in cursor.description]
+        result['rows'] = [dict(zip(columns, row)) for row in cursor]
+        result['synced_at'] = last_synced(db)
+    finally:
+        db.close()
+    return result
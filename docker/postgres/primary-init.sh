@@ -0,0 +1,10 @@
+#!/bin/bash
+# Runs once when the primary's data directory is initialised: adds the role the
+# replica streams WAL with and lets it connect for replication.
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD '${REPLICATION_PASSWORD}';
+EOSQL
+
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,16 @@
+#!/bin/bash
+# Hot standby for local testing: clones the primary with pg_basebackup on first
+# start (-R writes the standby settings), then follows it.
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until PGPASSWORD="$REPLICATION_PASSWORD" pg_basebackup -h "$PRIMARY_HOST" -U replicator \
+            -D "$PGDATA" -Fp -Xs -R; do
+        echo "waiting for primary at $PRIMARY_HOST..."
+        rm -rf "${PGDATA:?}"/*
+        sleep 2
+    done
+    chmod 0700 "$PGDATA"
+fi
+
+exec postgres -c hot_standby=on
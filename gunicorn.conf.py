@@ -0,0 +1,35 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Serve the ASGI app so the async API views don't each hold a worker thread
+wsgi_app = "carehome_project.asgi:application"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn_worker.UvicornWorker")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:" + os.environ.get("PORT", "8000"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+# Prometheus multi-process mode: every worker writes its samples to this directory
+# and /metrics adds them up. Set here so the workers inherit it from the master.
+prometheus_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "carehome_prometheus")
+)
+
+# Workers share the picker-list cache through the filesystem (core/listcache.py)
+os.environ.setdefault("CACHE_BACKEND", "file")
+cache_dir = os.environ.setdefault("CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "carehome_cache"))
+
+
+def on_starting(server):
+    # Samples from a previous run would be counted again
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+    # Lists cached by a previous run may predate a restore or a bulk import
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)